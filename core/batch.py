@@ -0,0 +1,374 @@
+"""
+Module docstring: This module contains the transactional batch mutation executor.
+
+A batch is a list of create/update/delete operations on tags, photos and
+videos. Every operation is permission checked and validated first, with the
+targets of all updates and deletes loaded in one query per model. The batch
+is then applied in a single transaction: updates are written with one
+``bulk_update`` per model, tag changes with one delete and one insert on
+each through table, and deletes with one query per model. Signal handlers
+(refcounts, co-occurrence, related media, ...) are notified as if each row
+had been saved individually.
+"""
+
+from collections import defaultdict
+
+from django.core.exceptions import FieldDoesNotExist
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import IntegrityError, models, router, transaction
+from django.db.models.signals import m2m_changed, post_save
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .sync import buffered_changes
+from .tag_snapshots import with_tags
+
+OPERATIONS = ("create", "update", "delete")
+
+
+class Operation:
+    """
+    One entry of a batch and its outcome.
+    """
+
+    def __init__(self, index, raw):
+        self.index = index
+        self.raw = raw if isinstance(raw, dict) else {}
+        self.op = self.raw.get("op")
+        self.model_name = self.raw.get("model")
+        self.pk = self.raw.get("id")
+        self.data = self.raw.get("data") or {}
+        self.instance = None
+        self.serializer = None
+        self.status = None
+        self.errors = None
+
+    def fail(self, status_code, errors):
+        self.status = status_code
+        self.errors = errors
+
+    def result(self, data=None):
+        result = {"index": self.index, "op": self.op, "model": self.model_name}
+        if self.pk is not None:
+            result["id"] = self.pk
+        if self.status is not None:
+            result["status"] = self.status
+        if self.errors is not None:
+            result["errors"] = self.errors
+        if data is not None:
+            result["data"] = data
+        return result
+
+
+class BatchMutation:
+    """
+    Validate and apply a batch of operations.
+
+    ``resources`` maps a model name to ``(serializer_class, create_view,
+    detail_view)``; the views' permission classes are applied to each
+    operation exactly as the individual endpoints apply them.
+    """
+
+    def __init__(self, request, resources):
+        self.request = request
+        self.resources = resources
+
+    def run(self, raw_operations):
+        """
+        Return ``(http_status, body)`` for a list of raw operations.
+
+        Nothing is written unless every operation is valid and permitted;
+        the status of a failed batch is that of its first failed operation.
+        """
+        operations = [Operation(index, raw) for index, raw in enumerate(raw_operations)]
+        self._prepare(operations)
+        failed = [operation for operation in operations if operation.errors is not None]
+        if failed:
+            return failed[0].status, {
+                "results": [operation.result() for operation in operations]
+            }
+        try:
+            with transaction.atomic(), buffered_changes():
+                self._apply(operations)
+                # Built before commit, so a failure here rolls the batch back.
+                results = self._results(operations)
+        except IntegrityError as exc:
+            # e.g. two creates in one batch with the same unique name.
+            return status.HTTP_400_BAD_REQUEST, {"detail": f"Batch rolled back: {exc}"}
+        return status.HTTP_200_OK, {"results": results}
+
+    # Validation
+
+    def _view(self, view_class, operation):
+        return view_class(
+            request=self.request,
+            args=(),
+            kwargs={"pk": operation.pk},
+            format_kwarg=None,
+        )
+
+    def _prepare(self, operations):
+        targets = defaultdict(set)
+        for operation in operations:
+            if operation.op not in OPERATIONS:
+                operation.fail(
+                    status.HTTP_400_BAD_REQUEST,
+                    {"op": [f"Must be one of: {', '.join(OPERATIONS)}."]},
+                )
+            elif operation.model_name not in self.resources:
+                operation.fail(
+                    status.HTTP_400_BAD_REQUEST,
+                    {"model": [f"Must be one of: {', '.join(sorted(self.resources))}."]},
+                )
+            elif operation.op != "create":
+                model = self._model(operation)
+                try:
+                    targets[operation.model_name].add(model._meta.pk.to_python(operation.pk))
+                except DjangoValidationError:
+                    operation.fail(status.HTTP_404_NOT_FOUND, {"detail": "Not found."})
+
+        self._reject_conflicts(operations)
+        loaded = {
+            name: self.resources[name][0].Meta.model.objects.in_bulk(ids)
+            for name, ids in targets.items()
+        }
+        for operation in operations:
+            if operation.errors is None:
+                try:
+                    self._check(operation, loaded)
+                except APIException as exc:
+                    operation.fail(exc.status_code, exc.detail)
+
+    def _reject_conflicts(self, operations):
+        """
+        Fail operations on an object that another operation of the batch deletes.
+
+        Several updates of one object are merged, but an update or a second
+        delete of a deleted object has no meaningful result.
+        """
+        deleted = {}
+        for operation in operations:
+            if operation.errors is None and operation.op == "delete":
+                deleted.setdefault(self._target(operation), operation.index)
+        for operation in operations:
+            if operation.errors is not None or operation.op == "create":
+                continue
+            key = self._target(operation)
+            if key in deleted and deleted[key] != operation.index:
+                operation.fail(
+                    status.HTTP_400_BAD_REQUEST,
+                    {"id": [f"Conflicts with the delete in operation {deleted[key]}."]},
+                )
+
+    def _target(self, operation):
+        return operation.model_name, self._model(operation)._meta.pk.to_python(operation.pk)
+
+    def _model(self, operation):
+        return self.resources[operation.model_name][0].Meta.model
+
+    def _check(self, operation, loaded):
+        serializer_class, create_view, detail_view = self.resources[operation.model_name]
+        if operation.op == "create":
+            view = self._view(create_view, operation)
+            view.check_permissions(self.request)
+            operation.serializer = serializer_class(
+                data=operation.data, context={"request": self.request, "view": view}
+            )
+        else:
+            view = self._view(detail_view, operation)
+            view.check_permissions(self.request)
+            model = self._model(operation)
+            operation.instance = loaded[operation.model_name].get(
+                model._meta.pk.to_python(operation.pk)
+            )
+            if operation.instance is None:
+                operation.fail(status.HTTP_404_NOT_FOUND, {"detail": "Not found."})
+                return
+            view.check_object_permissions(self.request, operation.instance)
+            if operation.op == "delete":
+                return
+            operation.serializer = serializer_class(
+                operation.instance,
+                data=operation.data,
+                partial=True,
+                context={"request": self.request, "view": view},
+            )
+        if not operation.serializer.is_valid():
+            operation.fail(status.HTTP_400_BAD_REQUEST, operation.serializer.errors)
+            return
+        file_fields = [
+            name
+            for name in operation.serializer.validated_data
+            if isinstance(model_field(self._model(operation), name), models.FileField)
+        ]
+        if file_fields:
+            operation.fail(
+                status.HTTP_400_BAD_REQUEST,
+                {name: ["Files cannot be uploaded in a batch."] for name in file_fields},
+            )
+
+    # Writes
+
+    def _apply(self, operations):
+        for operation in operations:
+            if operation.op == "create":
+                operation.instance = operation.serializer.save()
+                operation.status = status.HTTP_201_CREATED
+
+        updates = defaultdict(list)
+        deletes = defaultdict(list)
+        for operation in operations:
+            if operation.op == "update":
+                updates[operation.model_name].append(operation)
+            elif operation.op == "delete":
+                deletes[operation.model_name].append(operation)
+
+        for group in updates.values():
+            self._bulk_update(self._model(group[0]), group)
+        for group in deletes.values():
+            model = self._model(group[0])
+            model.objects.filter(pk__in={op.instance.pk for op in group}).delete()
+            for operation in group:
+                operation.status = status.HTTP_204_NO_CONTENT
+
+    def _results(self, operations):
+        updated = defaultdict(set)
+        for operation in operations:
+            if operation.op == "update":
+                updated[operation.model_name].add(operation.instance.pk)
+        refreshed = {}
+        for name, ids in updated.items():
+            model = self.resources[name][0].Meta.model
+            queryset = model.objects.all()
+            if model._meta.many_to_many:
+                queryset = with_tags(queryset)
+            refreshed[name] = queryset.in_bulk(ids)
+        results = []
+        for operation in operations:
+            data = None
+            if operation.op == "create":
+                data = operation.serializer.data
+            elif operation.op == "update":
+                instance = refreshed[operation.model_name][operation.instance.pk]
+                serializer_class = self.resources[operation.model_name][0]
+                data = serializer_class(instance, context=operation.serializer.context).data
+            results.append(operation.result(data))
+        return results
+
+    def _bulk_update(self, model, group):
+        m2m_names = {field.name for field in model._meta.many_to_many}
+        instances = {}
+        fields = set()
+        m2m_values = defaultdict(dict)
+        for operation in group:
+            instance = instances.setdefault(operation.instance.pk, operation.instance)
+            for name, value in operation.serializer.validated_data.items():
+                if name in m2m_names:
+                    m2m_values[name][instance.pk] = {item.pk for item in value}
+                else:
+                    setattr(instance, name, value)
+                    fields.add(name)
+            operation.status = status.HTTP_200_OK
+
+        objects = list(instances.values())
+        if fields:
+            fields.update(touch_auto_now(model, objects))
+            for instance in objects:
+                if hasattr(instance, "apply_defaults"):
+                    instance.apply_defaults()
+            model.objects.bulk_update(objects, sorted(fields))
+            send_post_save(model, objects, created=False, update_fields=fields)
+        for name, wanted in m2m_values.items():
+            set_many_to_many(model, name, {pk: instances[pk] for pk in wanted}, wanted)
+
+
+def model_field(model, name):
+    try:
+        return model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+
+
+def touch_auto_now(model, instances):
+    """
+    Set the ``auto_now`` fields that ``bulk_update()`` would leave stale.
+
+    Returns the names of the fields set.
+    """
+    now = timezone.now()
+    names = set()
+    for field in model._meta.concrete_fields:
+        if getattr(field, "auto_now", False):
+            names.add(field.name)
+            for instance in instances:
+                setattr(instance, field.attname, now)
+    return names
+
+
+def send_post_save(model, instances, created, update_fields=None):
+    """
+    Send ``post_save`` for rows written in bulk, as ``save()`` would.
+    """
+    using = router.db_for_write(model)
+    for instance in instances:
+        post_save.send(
+            sender=model,
+            instance=instance,
+            created=created,
+            update_fields=frozenset(update_fields) if update_fields else None,
+            raw=False,
+            using=using,
+        )
+
+
+def set_many_to_many(model, name, instances, wanted):
+    """
+    Replace the related ids of many instances with one DELETE and one INSERT.
+
+    ``wanted`` maps instance pk to the set of related pks it should have.
+    ``m2m_changed`` is sent per instance, as ``relation.set()`` would.
+    """
+    field = model._meta.get_field(name)
+    through = field.remote_field.through
+    source = field.m2m_field_name()
+    target = field.m2m_reverse_field_name()
+    related_model = field.related_model
+    using = router.db_for_write(through)
+
+    current = defaultdict(dict)
+    for pk, source_id, target_id in through.objects.filter(
+        **{f"{source}__in": list(wanted)}
+    ).values_list("pk", f"{source}_id", f"{target}_id"):
+        current[source_id][target_id] = pk
+
+    removed = {pk: set(current[pk]) - targets for pk, targets in wanted.items()}
+    added = {pk: targets - set(current[pk]) for pk, targets in wanted.items()}
+
+    def send(action, changes):
+        for pk, pk_set in changes.items():
+            if pk_set:
+                m2m_changed.send(
+                    sender=through,
+                    action=action,
+                    instance=instances[pk],
+                    reverse=False,
+                    model=related_model,
+                    pk_set=set(pk_set),
+                    using=using,
+                )
+
+    send("pre_remove", removed)
+    through.objects.filter(
+        pk__in=[current[pk][target_id] for pk, targets in removed.items() for target_id in targets]
+    ).delete()
+    send("post_remove", removed)
+    send("pre_add", added)
+    through.objects.bulk_create(
+        [
+            through(**{f"{source}_id": pk, f"{target}_id": target_id})
+            for pk, targets in added.items()
+            for target_id in targets
+        ]
+    )
+    send("post_add", added)
@@ -0,0 +1,351 @@
+"""
+Module docstring: This module contains the NDJSON export and import of the media catalog.
+
+Each line is one tag, photo or video in the layout of ``dumpdata``::
+
+    {"model": "photo", "pk": "...", "fields": {"title": "...", "tags": [1, 2]}}
+
+Tags are written first so an import can link media to them. Export reads
+each model in primary key order one page at a time (keyset pagination,
+``pk > last``), with the tag links of a page in one extra query, so memory
+stays constant however large the catalog is. File fields hold storage
+names; the files themselves are copied separately.
+
+Import validates every value against its field (type, null, length,
+choices) and reports failures as line errors. It upserts: every batch is
+checked against the database with one query per model, new rows are
+written with ``bulk_create`` and existing ones with ``bulk_update``, and
+tag links are replaced with one delete and one insert. Signal handlers
+(refcounts, co-occurrence, change log, ...) are notified as if each row
+had been saved. Every batch commits on its own, and the number of lines
+committed is reported as a checkpoint from which an interrupted import
+can be resumed; re-importing a batch is harmless.
+
+"""
+
+import io
+import json
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+
+from .batch import send_post_save, set_many_to_many, touch_auto_now
+from .models import Tag
+from .sync import MODEL_NAMES, SYNC_MODELS, buffered_changes
+
+CATALOG_MODELS = ("tag", "photo", "video")
+# Columns derived from the tag links, recomputed on import.
+DERIVED_FIELDS = ("tag_snapshot",)
+
+
+def _m2m_field(model):
+    fields = model._meta.many_to_many
+    return fields[0] if fields else None
+
+
+def _data_fields(model):
+    return [
+        field
+        for field in model._meta.concrete_fields
+        if not field.primary_key and field.name not in DERIVED_FIELDS
+    ]
+
+
+def export_rows(name, batch_size):
+    """
+    Yield the records of model ``name`` in primary key order.
+    """
+    model = SYNC_MODELS[name]
+    pk_name = model._meta.pk.attname
+    columns = [field.attname for field in _data_fields(model)]
+    m2m = _m2m_field(model)
+    last = None
+    while True:
+        queryset = model.objects.order_by("pk")
+        if last is not None:
+            queryset = queryset.filter(pk__gt=last)
+        page = list(queryset.values(pk_name, *columns)[:batch_size])
+        if not page:
+            return
+        last = page[-1][pk_name]
+        links = {}
+        if m2m is not None:
+            through = m2m.remote_field.through
+            source = f"{m2m.m2m_field_name()}_id"
+            target = f"{m2m.m2m_reverse_field_name()}_id"
+            pks = [row[pk_name] for row in page]
+            for source_id, target_id in (
+                through.objects.filter(**{f"{source}__in": pks})
+                .order_by(source, target)
+                .values_list(source, target)
+            ):
+                links.setdefault(source_id, []).append(target_id)
+        for row in page:
+            pk = row.pop(pk_name)
+            if m2m is not None:
+                row[m2m.name] = links.get(pk, [])
+            yield {"model": name, "pk": pk, "fields": row}
+
+
+def export_catalog(models=CATALOG_MODELS, batch_size=None):
+    """
+    Yield the catalog as NDJSON lines (bytes).
+    """
+    batch_size = batch_size or settings.CATALOG_BATCH_SIZE
+    encoder = DjangoJSONEncoder(separators=(",", ":"))
+    for name in CATALOG_MODELS:
+        if name in models:
+            for record in export_rows(name, batch_size):
+                yield (encoder.encode(record) + "\n").encode()
+
+
+def read_lines(stream, start=0):
+    """
+    Yield ``(line number, record)`` from an NDJSON stream, from line ``start``.
+
+    Blank lines count towards the numbering but are skipped; a line that
+    is not valid JSON is yielded as ``(number, ValueError)``.
+    """
+    if isinstance(stream.read(0), bytes):
+        stream = io.TextIOWrapper(stream, encoding="utf-8")
+    for number, line in enumerate(islice(stream, start, None), start=start + 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError as exc:
+            yield number, exc
+
+
+class CatalogImporter:
+    """
+    Upsert catalog records in batches.
+
+    ``checkpoint`` is called with the number of lines committed after each
+    batch.
+    """
+
+    def __init__(self, batch_size=None, checkpoint=None):
+        self.batch_size = batch_size or settings.CATALOG_BATCH_SIZE
+        self.checkpoint = checkpoint
+        self.result = {
+            "created": 0,
+            "updated": 0,
+            "errors": [],
+            "line": 0,
+            "rows": 0,
+            "seconds": 0.0,
+            "rows_per_second": 0.0,
+        }
+        self._created_tags = False
+
+    def run(self, lines):
+        """
+        Import ``(line number, record)`` pairs and return a summary dict.
+        """
+        started = time.monotonic()
+        pending = {name: [] for name in CATALOG_MODELS}
+        count = 0
+        line = self.result["line"]
+        for line, record in lines:
+            instance = self._build(line, record)
+            if instance is None:
+                continue
+            pending[record["model"]].append((line, instance))
+            count += 1
+            if count >= self.batch_size:
+                self._flush(pending, line)
+                count = 0
+        self._flush(pending, line)
+        if self._created_tags:
+            self._reset_sequences()
+        seconds = time.monotonic() - started
+        rows = self.result["created"] + self.result["updated"]
+        self.result["errors"].sort(key=lambda error: error["line"])
+        self.result.update(
+            rows=rows,
+            seconds=round(seconds, 3),
+            rows_per_second=round(rows / seconds, 1) if seconds else 0.0,
+        )
+        return self.result
+
+    def _error(self, line, error):
+        self.result["errors"].append({"line": line, "error": error})
+
+    def _build(self, line, record):
+        """
+        Return an unsaved instance for a record, or None if it is invalid.
+        """
+        if isinstance(record, Exception):
+            self._error(line, f"Invalid JSON: {record}")
+            return None
+        if not isinstance(record, dict) or record.get("model") not in CATALOG_MODELS:
+            self._error(line, "Expected an object with a tag, photo or video model.")
+            return None
+        fields = record.get("fields")
+        if not isinstance(fields, dict) or record.get("pk") is None:
+            self._error(line, "Expected pk and fields.")
+            return None
+        model = SYNC_MODELS[record["model"]]
+        m2m = _m2m_field(model)
+        links = fields.get(m2m.name, []) if m2m is not None else []
+        if not isinstance(links, list):
+            self._error(line, f"{m2m.name} must be a list of ids.")
+            return None
+        values = {}
+        try:
+            values[model._meta.pk.attname] = model._meta.pk.to_python(record["pk"])
+            for key, value in fields.items():
+                if m2m is not None and key == m2m.name:
+                    continue
+                field = model._meta.get_field(key)
+                if not field.concrete or field.primary_key or key in DERIVED_FIELDS:
+                    raise ValidationError(f"{key} cannot be imported.")
+                values[field.attname] = self._clean(field, value)
+        except ValidationError as exc:
+            self._error(line, exc.messages[0])
+            return None
+        except FieldDoesNotExist as exc:
+            self._error(line, str(exc))
+            return None
+        instance = model(**values)
+        instance._imported_links = links
+        return instance
+
+    @staticmethod
+    def _clean(field, value):
+        """
+        Convert and validate one imported value the way a model form would.
+
+        Empty values are only refused where the column is not nullable, so
+        rows written without a form (e.g. a tag with no description) still
+        round-trip.
+        """
+        try:
+            value = None if value is None else field.to_python(value)
+            if value is None:
+                if not field.null:
+                    raise ValidationError(field.error_messages["null"])
+            elif value not in field.empty_values:
+                field.validate(value, None)
+                field.run_validators(value)
+        except ValidationError as exc:
+            raise ValidationError(f"{field.name}: {exc.messages[0]}") from exc
+        return value
+
+    def _flush(self, pending, line):
+        with transaction.atomic(), buffered_changes():
+            for name in CATALOG_MODELS:
+                if pending[name]:
+                    self._upsert(SYNC_MODELS[name], pending[name])
+        for rows in pending.values():
+            rows.clear()
+        self.result["line"] = line
+        if self.checkpoint is not None:
+            self.checkpoint(line)
+
+    def _upsert(self, model, rows):
+        # The last record of a row in the batch wins.
+        instances = {}
+        for line, instance in rows:
+            instances.pop(instance.pk, None)
+            instances[instance.pk] = (line, instance)
+
+        if model is Tag:
+            instances = self._drop_name_conflicts(instances)
+        existing = model.objects.in_bulk(list(instances))
+        created, updated = [], []
+        for pk, (_, instance) in instances.items():
+            if hasattr(instance, "apply_defaults"):
+                instance.apply_defaults()
+            stored = existing.get(pk)
+            if stored is None:
+                if hasattr(instance, "_stored_media_name"):
+                    # A new row takes a reference to its file.
+                    instance._stored_media_name = ""
+                created.append(instance)
+            else:
+                # Hand over what the signal handlers remembered about the
+                # stored row (file name, counted day and size), as if the
+                # instance had been loaded and then changed.
+                for name, value in vars(stored).items():
+                    if name.startswith("_stored_"):
+                        setattr(instance, name, value)
+                updated.append(instance)
+
+        touch_auto_now(model, created + updated)
+        fields = [field.name for field in _data_fields(model)]
+        if created:
+            model.objects.bulk_create(created, batch_size=self.batch_size)
+            send_post_save(model, created, created=True)
+            self._created_tags |= model is Tag
+        if updated:
+            model.objects.bulk_update(updated, fields, batch_size=self.batch_size)
+            send_post_save(model, updated, created=False, update_fields=fields)
+        self.result["created"] += len(created)
+        self.result["updated"] += len(updated)
+
+        m2m = _m2m_field(model)
+        if m2m is not None:
+            self._link(model, m2m, instances)
+
+    def _drop_name_conflicts(self, instances):
+        """
+        Skip tags whose unique name belongs to another tag.
+        """
+        names = {instance.name: pk for pk, (_, instance) in instances.items()}
+        taken = Tag.objects.filter(name__in=list(names)).exclude(pk__in=list(instances))
+        for pk, name in taken.values_list("pk", "name"):
+            line, _ = instances.pop(names[name])
+            self._error(line, f"Tag name {name!r} is used by tag {pk}.")
+        return instances
+
+    def _link(self, model, m2m, instances):
+        related = m2m.related_model
+        wanted = {}
+        referenced = set()
+        for pk, (line, instance) in instances.items():
+            try:
+                ids = {related._meta.pk.to_python(value) for value in instance._imported_links}
+            except (ValidationError, TypeError):
+                self._error(line, f"{m2m.name} must be a list of ids.")
+                continue
+            wanted[pk] = ids
+            referenced |= ids
+        known = set(related.objects.filter(pk__in=list(referenced)).values_list("pk", flat=True))
+        for pk, ids in wanted.items():
+            missing = ids - known
+            if missing:
+                self._error(
+                    instances[pk][0],
+                    f"Unknown {MODEL_NAMES[related]} ids {sorted(missing)} were not linked.",
+                )
+                ids -= missing
+        set_many_to_many(
+            model, m2m.name, {pk: instances[pk][1] for pk in wanted}, wanted
+        )
+
+    def _reset_sequences(self):
+        """
+        Move the tag id sequence past imported ids (PostgreSQL, Oracle).
+        """
+        statements = connection.ops.sequence_reset_sql(no_style(), [Tag])
+        if statements:
+            with connection.cursor() as cursor:
+                for statement in statements:
+                    cursor.execute(statement)
+
+
+def import_catalog(stream, start=0, batch_size=None, checkpoint=None):
+    """
+    Import an NDJSON catalog stream from line ``start`` and return a summary dict.
+    """
+    importer = CatalogImporter(batch_size=batch_size, checkpoint=checkpoint)
+    importer.result["line"] = start
+    return importer.run(read_lines(stream, start))
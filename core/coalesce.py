@@ -0,0 +1,246 @@
+"""
+Module docstring: This module contains request coalescing for read-only API views.
+
+When many identical GETs arrive together, the first one (the leader) runs
+the view and the others wait for its result instead of repeating the same
+queries and serialization. Requests are identical when they share the
+scheme, host, path, query string (parameter order ignored), negotiated
+media type and auth scope (see ``CoalescedGetMixin.get_coalesce_scope``).
+Absolute URLs in the responses (e.g. pagination links) depend on the
+scheme and host.
+Only successful responses are shared; a waiter whose leader fails, or
+takes longer than COALESCE_TIMEOUT seconds, runs the view itself.
+With read replicas, only requests under ``replica_reads()`` coalesce: a
+client pinned to the primary after a write (see
+``core.middleware.ReplicaRoutingMiddleware``) must see that write, which a
+flight read from a replica or started before the commit may not.
+
+Within a process waiters block on the leader's thread. With
+``COALESCE_BACKEND = "file"`` leaders in different worker processes also
+coordinate: each key hashes to one of COALESCE_LOCK_SLOTS lock files in
+COALESCE_LOCK_DIR, the leader holds an exclusive ``flock`` on it while it
+works and writes the result into it, and leaders in other workers wait
+for the lock and read the result back. The holder records its key in the
+file first, so a worker whose key merely shares the slot runs the view
+itself instead of waiting.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode
+
+from django.conf import settings
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .db_router import replica_reads_active
+
+# Polling interval while waiting for another worker's lock.
+LOCK_POLL_SECONDS = 0.005
+
+
+class Flight:
+    """
+    A request being computed by a leader, which waiters block on.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+
+class Coalescer:
+    """
+    Runs one computation per key at a time and shares its result.
+
+    ``compute()`` returns ``(response, shared)`` where ``shared`` is a
+    JSON-serializable snapshot for the waiters, or None if the response
+    must not be shared. ``rebuild(shared)`` turns a snapshot back into a
+    response.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flights = {}
+
+    def run(self, key, compute, rebuild):
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = Flight()
+        if not leader:
+            if flight.done.wait(settings.COALESCE_TIMEOUT) and flight.result is not None:
+                return rebuild(flight.result)
+            return compute()[0]
+        try:
+            if settings.COALESCE_BACKEND == "file":
+                response, flight.result = self._lead_across_workers(key, compute, rebuild)
+            else:
+                response, flight.result = compute()
+            return response
+        finally:
+            with self.lock:
+                del self.flights[key]
+            flight.done.set()
+
+    def _lead_across_workers(self, key, compute, rebuild):
+        import fcntl
+
+        os.makedirs(settings.COALESCE_LOCK_DIR, exist_ok=True)
+        digest = hashlib.sha1(key.encode()).hexdigest()
+        slot = int(digest[:8], 16) % settings.COALESCE_LOCK_SLOTS
+        path = os.path.join(str(settings.COALESCE_LOCK_DIR), f"{slot}.lock")
+        arrived = time.time()
+        with open(path, "a+", encoding="utf-8") as handle:
+            if try_lock(handle, fcntl):
+                try:
+                    write_holder(handle, digest)
+                    response, shared = compute()
+                    if shared is not None:
+                        write_result(handle, digest, shared)
+                    return response, shared
+                finally:
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+            if wait_lock(handle, fcntl, settings.COALESCE_TIMEOUT, digest):
+                try:
+                    shared = read_result(handle, digest, arrived)
+                finally:
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+                if shared is not None:
+                    return rebuild(shared), shared
+        return compute()
+
+
+def try_lock(handle, fcntl):
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
+
+
+def wait_lock(handle, fcntl, timeout, digest):
+    """
+    Wait for the slot lock while its holder computes ``digest``.
+
+    Gives up after ``timeout`` seconds, or as soon as the holder turns out
+    to be computing another key.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if try_lock(handle, fcntl):
+            return True
+        if read_holder(handle) != digest:
+            return False
+        time.sleep(LOCK_POLL_SECONDS)
+    return False
+
+
+def write_holder(handle, digest):
+    handle.seek(0)
+    handle.truncate()
+    json.dump({"key": digest}, handle)
+    handle.flush()
+
+
+def read_holder(handle):
+    """
+    Return the key digest last written to a slot, or None if unreadable.
+    """
+    handle.seek(0)
+    try:
+        return json.loads(handle.read() or "{}").get("key")
+    except ValueError:
+        return None
+
+
+def write_result(handle, digest, shared):
+    handle.seek(0)
+    handle.truncate()
+    json.dump({"key": digest, "finished": time.time(), "result": shared}, handle, cls=JSONEncoder)
+    handle.flush()
+
+
+def read_result(handle, digest, arrived):
+    """
+    Return the result stored for ``digest`` if it was finished after ``arrived``.
+    """
+    handle.seek(0)
+    try:
+        stored = json.loads(handle.read() or "{}")
+    except ValueError:
+        return None
+    if stored.get("key") != digest or stored.get("finished", 0) < arrived:
+        return None
+    return stored["result"]
+
+
+coalescer = Coalescer()
+
+
+def normalize_query(query_string):
+    """
+    Return a query string with its parameters in a canonical order.
+    """
+    return urlencode(sorted(parse_qsl(query_string, keep_blank_values=True)))
+
+
+class CoalescedGetMixin:
+    """
+    Mixin coalescing identical concurrent GETs on a DRF view.
+
+    Authentication and permission checks run for every request before it
+    joins a flight, so a waiter only receives a result it may see.
+    """
+
+    def get_coalesce_scope(self, request):
+        """
+        Return the part of the key describing who is asking.
+
+        The data of these views does not depend on the user, only on
+        whether the permissions let them read it.
+        """
+        return "authenticated" if request.user and request.user.is_authenticated else "anonymous"
+
+    def get_coalesce_key(self, request):
+        return "|".join(
+            [
+                request.scheme,
+                request.get_host(),
+                request.path,
+                normalize_query(request.META.get("QUERY_STRING", "")),
+                request.accepted_media_type or "",
+                self.get_coalesce_scope(request),
+            ]
+        )
+
+    def should_coalesce(self, request):
+        """
+        Return whether this request may share a result with others.
+        """
+        if not settings.COALESCE_REQUESTS:
+            return False
+        if "no-cache" in request.headers.get("Cache-Control", ""):
+            return False
+        return not settings.DATABASE_REPLICAS or replica_reads_active()
+
+    def get(self, request, *args, **kwargs):
+        handler = super().get
+        if not self.should_coalesce(request):
+            return handler(request, *args, **kwargs)
+
+        def compute():
+            response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response, None
+            return response, {"data": response.data, "headers": dict(response.items())}
+
+        def rebuild(shared):
+            return Response(shared["data"], headers=shared["headers"])
+
+        return coalescer.run(self.get_coalesce_key(request), compute, rebuild)
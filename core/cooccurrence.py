@@ -0,0 +1,191 @@
+"""
+Module docstring: This module contains the tag co-occurrence index.
+
+TagCooccurrence holds, for every ordered pair of tags, how many photos and
+videos carry both. Both directions are stored so the tags related to one
+tag are a single indexed lookup on ``tag``. The counts are kept up to date
+from ``m2m_changed``/``pre_delete`` (see core.signals) and can be rebuilt
+from the through tables with ``rebuild_tag_cooccurrence``.
+"""
+
+from collections import Counter, defaultdict
+from itertools import combinations, islice
+
+from django.db import connection, transaction
+from django.db.models import F
+
+from .models import Photo, TagCooccurrence, Video
+
+MEDIA_MODELS = (Photo, Video)
+
+# Pairs per write batch; keeps IN lists under SQLite's parameter limit.
+PAIR_BATCH_SIZE = 400
+
+
+def pair_deltas(groups, sign):
+    """
+    Count the unordered tag pairs affected by a change.
+
+    ``groups`` holds one ``(changed, others)`` tuple of tag id sets per
+    photo or video: ``changed`` are the tags being added or removed and
+    ``others`` the tags it keeps.
+    """
+    deltas = Counter()
+    for changed, others in groups:
+        for tag_id in changed:
+            for other_id in others:
+                deltas[tuple(sorted((tag_id, other_id)))] += sign
+        for pair in combinations(sorted(changed), 2):
+            deltas[pair] += sign
+    return deltas
+
+
+def apply_pair_deltas(deltas):
+    """
+    Add ``deltas`` (unordered pair -> change) to the stored counts.
+    """
+    rows = {}
+    for (tag_id, other_id), delta in deltas.items():
+        if delta:
+            rows[(tag_id, other_id)] = delta
+            rows[(other_id, tag_id)] = delta
+    items = iter(rows.items())
+    while True:
+        batch = dict(islice(items, PAIR_BATCH_SIZE))
+        if not batch:
+            return
+        _apply_batch(batch)
+
+
+def _apply_batch(rows):
+    # Missing rows are created at zero first so every change is an atomic
+    # UPDATE ... SET count = count + n, which is safe under concurrency.
+    TagCooccurrence.objects.bulk_create(
+        [
+            TagCooccurrence(tag_id=tag_id, other_id=other_id, count=0)
+            for (tag_id, other_id), delta in rows.items()
+            if delta > 0
+        ],
+        ignore_conflicts=True,
+    )
+    existing = TagCooccurrence.objects.filter(
+        tag_id__in={tag_id for tag_id, _ in rows},
+        other_id__in={other_id for _, other_id in rows},
+    ).values_list("pk", "tag_id", "other_id")
+    by_delta = defaultdict(list)
+    for pk, tag_id, other_id in existing:
+        if (tag_id, other_id) in rows:
+            by_delta[rows[(tag_id, other_id)]].append(pk)
+    for delta, pks in by_delta.items():
+        TagCooccurrence.objects.filter(pk__in=pks).update(count=F("count") + delta)
+    if any(delta < 0 for delta in by_delta):
+        TagCooccurrence.objects.filter(
+            pk__in=[pk for delta, pks in by_delta.items() if delta < 0 for pk in pks],
+            count__lte=0,
+        ).delete()
+
+
+def media_tags(through, column, media_ids):
+    """
+    Return {media id: set of tag ids} for the given photos or videos.
+
+    ``media_ids`` is a collection of ids or a subquery.
+    """
+    tags = defaultdict(set)
+    if isinstance(media_ids, (list, set, tuple)):
+        media_ids = list(media_ids)
+        chunks = [
+            media_ids[start:start + PAIR_BATCH_SIZE]
+            for start in range(0, len(media_ids), PAIR_BATCH_SIZE)
+        ]
+    else:
+        chunks = [media_ids]
+    for chunk in chunks:
+        rows = through.objects.filter(**{f"{column}__in": chunk}).values_list(
+            column, "tag_id"
+        )
+        for media_id, tag_id in rows:
+            tags[media_id].add(tag_id)
+    return tags
+
+
+def record_tag_change(through, column, instance, action, reverse, pk_set):
+    """
+    Update the counts for an ``m2m_changed`` signal on a tag through table.
+
+    Additions are counted on ``post_add``; removals on ``pre_remove`` and
+    ``pre_clear``, while the tags being removed can still be read.
+    """
+    if action == "post_add":
+        sign = 1
+    elif action in ("pre_remove", "pre_clear"):
+        sign = -1
+    else:
+        return
+    if not reverse:
+        current = media_tags(through, column, [instance.pk])[instance.pk]
+        if action == "pre_clear":
+            changed = current
+        elif action == "pre_remove":
+            changed = set(pk_set) & current
+        else:
+            changed = set(pk_set)
+        groups = [(changed, current - changed)]
+    else:
+        tag_id = instance.pk
+        if action == "pre_clear":
+            media_ids = through.objects.filter(tag_id=tag_id).values(column)
+        else:
+            media_ids = list(pk_set)
+        groups = [
+            ({tag_id}, tags - {tag_id})
+            for tags in media_tags(through, column, media_ids).values()
+            if tag_id in tags
+        ]
+    apply_pair_deltas(pair_deltas(groups, sign))
+
+
+def record_media_delete(instance):
+    """
+    Remove the pairs of a photo or video that is being deleted.
+    """
+    through = type(instance).tags.through
+    column = f"{instance._meta.model_name}_id"
+    tags = media_tags(through, column, [instance.pk])[instance.pk]
+    apply_pair_deltas(pair_deltas([(tags, set())], -1))
+
+
+def rebuild_cooccurrence():
+    """
+    Recompute every count from the photo and video through tables.
+    """
+    quote = connection.ops.quote_name
+    selects = []
+    for model in MEDIA_MODELS:
+        through = model.tags.through
+        table = quote(through._meta.db_table)
+        column = quote(f"{model._meta.model_name}_id")
+        selects.append(
+            f"SELECT a.tag_id AS tag_id, b.tag_id AS other_id FROM {table} a "
+            f"JOIN {table} b ON a.{column} = b.{column} AND a.tag_id <> b.tag_id"
+        )
+    sql = (
+        "SELECT tag_id, other_id, COUNT(*) FROM ("
+        + " UNION ALL ".join(selects)
+        + ") pairs GROUP BY tag_id, other_id"
+    )
+    with transaction.atomic():
+        TagCooccurrence.objects.all().delete()
+        with connection.cursor() as cursor:
+            cursor.execute(sql)
+            count = 0
+            while True:
+                rows = cursor.fetchmany(1000)
+                if not rows:
+                    break
+                TagCooccurrence.objects.bulk_create(
+                    TagCooccurrence(tag_id=tag_id, other_id=other_id, count=total)
+                    for tag_id, other_id, total in rows
+                )
+                count += len(rows)
+    return count
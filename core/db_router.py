@@ -0,0 +1,141 @@
+"""
+Module docstring: This module contains the read-replica database router.
+
+Reads are only sent to a replica while ``replica_reads()`` is active, which
+``core.middleware.ReplicaRoutingMiddleware`` does for safe-method requests
+from clients that are not pinned to the primary. Everything else, including
+management commands and reads inside a transaction, uses ``default``.
+"""
+
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+
+_replica_reads = ContextVar("replica_reads", default=False)
+
+
+@contextmanager
+def replica_reads():
+    """
+    Allow reads in this context to be served by a replica.
+    """
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def replica_reads_active():
+    """
+    Return whether reads in this context may be served by a replica.
+    """
+    return _replica_reads.get()
+
+
+class ReplicaPool:
+    """
+    Weighted replica selection with health-aware failover.
+
+    A replica whose connection fails is skipped for ``cooldown`` seconds.
+    """
+
+    def __init__(self, weights, cooldown=30):
+        self.weights = {alias: weight for alias, weight in weights.items() if weight > 0}
+        self.cooldown = cooldown
+        self._down_until = {}
+        self._lock = threading.Lock()
+
+    def mark_down(self, alias):
+        """
+        Take a replica out of rotation for the cooldown period.
+        """
+        with self._lock:
+            self._down_until[alias] = time.monotonic() + self.cooldown
+
+    def healthy(self):
+        """
+        Return the aliases that are not cooling down.
+        """
+        now = time.monotonic()
+        return [
+            alias
+            for alias in self.weights
+            if self._down_until.get(alias, 0) <= now
+        ]
+
+    def is_reachable(self, alias):
+        """
+        Open (or reuse) the replica connection, marking it down on failure.
+        """
+        try:
+            connections[alias].ensure_connection()
+        except OperationalError:
+            self.mark_down(alias)
+            return False
+        return True
+
+    def choose(self):
+        """
+        Pick a reachable replica by weight, or None to fall back to the primary.
+        """
+        candidates = self.healthy()
+        while candidates:
+            alias = random.choices(
+                candidates, weights=[self.weights[alias] for alias in candidates]
+            )[0]
+            if self.is_reachable(alias):
+                return alias
+            candidates.remove(alias)
+        return None
+
+
+class ReplicaRouter:
+    """
+    Route reads to ``settings.DATABASE_REPLICAS`` and writes to the primary.
+    """
+
+    def __init__(self):
+        self.pool = ReplicaPool(
+            getattr(settings, "DATABASE_REPLICAS", {}),
+            cooldown=getattr(settings, "REPLICA_HEALTH_COOLDOWN", 30),
+        )
+
+    def db_for_read(self, model, **hints):
+        """
+        Use a replica only for replica-safe reads outside transactions.
+        """
+        if not self.pool.weights or not _replica_reads.get():
+            return None
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db:
+            # Follow the database the related instance was loaded from.
+            return instance._state.db
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return self.pool.choose()
+
+    def db_for_write(self, model, **hints):
+        """
+        All writes go to the primary.
+        """
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """
+        Replicas hold the same data as the primary.
+        """
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        """
+        Replicas receive schema changes through replication.
+        """
+        if db in self.pool.weights:
+            return False
+        return None
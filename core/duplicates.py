@@ -0,0 +1,150 @@
+"""
+Module docstring: This module contains the near-duplicate photo search.
+
+Photos are compared by the Hamming distance of their 64-bit perceptual
+hashes (``Photo.phash``). A single photo's duplicates are found in the
+database with a multi-index hash lookup: the hash is split into four
+indexed 16-bit bands, and by the pigeonhole principle any hash within
+distance ``d`` has at least one band within ``d // 4`` bits of ours. All
+band values within that radius are looked up in one query, and only those
+candidates are compared in full. Clustering the whole catalog uses an
+in-memory BK-tree, so each photo is compared with a small part of the
+others instead of all of them.
+"""
+
+from itertools import combinations
+
+from django.db.models import Q
+
+from .media import PHASH_BAND_BITS, PHASH_BANDS, phash_bands
+from .models import Photo
+
+
+def hamming(a, b):
+    """
+    Return the number of differing bits between two hashes.
+    """
+    return bin(a ^ b).count("1")
+
+
+def band_neighbours(value, radius):
+    """
+    Return every band value within ``radius`` bits of ``value``.
+    """
+    values = [value]
+    for distance in range(1, radius + 1):
+        for bits in combinations(range(PHASH_BAND_BITS), distance):
+            flipped = value
+            for bit in bits:
+                flipped ^= 1 << bit
+            values.append(flipped)
+    return values
+
+
+def candidate_filter(value, distance):
+    """
+    Return a Q matching every photo that may be within ``distance`` of ``value``.
+    """
+    radius = distance // PHASH_BANDS
+    query = Q()
+    for field, band in zip(Photo.PHASH_BAND_FIELDS, phash_bands(value)):
+        query |= Q(**{f"{field}__in": band_neighbours(band, radius)})
+    return query
+
+
+def near_duplicates(photo, distance, queryset=None):
+    """
+    Return ``[(photo, distance)]`` for photos within ``distance`` of ``photo``,
+    nearest first.
+    """
+    if not photo.phash:
+        return []
+    value = int(photo.phash, 16)
+    queryset = Photo.objects.all() if queryset is None else queryset
+    candidates = queryset.filter(candidate_filter(value, distance)).exclude(pk=photo.pk)
+    matches = []
+    for candidate in candidates:
+        candidate_distance = hamming(value, int(candidate.phash, 16))
+        if candidate_distance <= distance:
+            matches.append((candidate, candidate_distance))
+    matches.sort(key=lambda match: match[1])
+    return matches
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree over hashes under the Hamming distance.
+
+    Each node keeps its children by their distance to it; a search within
+    ``d`` of a query only descends into children whose edge lies within
+    ``d`` of the query's distance to the node (triangle inequality).
+    """
+
+    def __init__(self):
+        self.root = None
+
+    def add(self, value, item):
+        node = self.root
+        if node is None:
+            self.root = [value, [item], {}]
+            return
+        while True:
+            distance = hamming(value, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, [item], {}]
+                return
+            node = child
+
+    def search(self, value, distance):
+        """
+        Return ``[(item, distance)]`` for every item within ``distance``.
+        """
+        found = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            node_distance = hamming(value, node[0])
+            if node_distance <= distance:
+                found.extend((item, node_distance) for item in node[1])
+            for edge, child in node[2].items():
+                if node_distance - distance <= edge <= node_distance + distance:
+                    stack.append(child)
+        return found
+
+
+def cluster_hashes(hashes, distance):
+    """
+    Group ``{item: hash}`` into clusters of items linked within ``distance``.
+
+    Returns the clusters with more than one item, largest first.
+    """
+    tree = BKTree()
+    for item, value in hashes.items():
+        tree.add(value, item)
+
+    parent = {item: item for item in hashes}
+
+    def find(item):
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    for item, value in hashes.items():
+        for other, _ in tree.search(value, distance):
+            root, other_root = find(item), find(other)
+            if root != other_root:
+                parent[other_root] = root
+
+    clusters = {}
+    for item in hashes:
+        clusters.setdefault(find(item), []).append(item)
+    return sorted(
+        (members for members in clusters.values() if len(members) > 1),
+        key=len,
+        reverse=True,
+    )
@@ -0,0 +1,526 @@
+"""
+Module docstring: This module contains the server-sent event stream of media changes.
+
+``GET /events/`` is served by a plain ASGI application routed in
+``ideal/asgi.py``, in its own process (gunicorn_events.conf.py); Django 3.2
+would iterate a streaming response synchronously and block the event loop
+for as long as a client listens. No Django middleware runs, so the CORS
+headers are those django-cors-headers would add (``cors_headers``).
+
+Events are read from the sync change log (see core.sync), so an event id
+is a ChangeLog ``seq`` and a client reconnecting with ``Last-Event-ID``
+(or ``?last_event_id=``) is replayed whatever it missed. Each process runs
+one broker task that reads new entries once, serializes them once and
+fans them out to its subscribers. The broker is woken when a write in
+this process commits, by the optional cross-worker bridge
+(``EVENTS_BRIDGE``: ``socket`` or ``postgres``), and otherwise every
+EVENTS_POLL_SECONDS.
+
+Every subscriber has a bounded queue. A client too slow to drain it is
+disconnected instead of buffering without limit; its EventSource then
+reconnects and resumes from the last event it received.
+"""
+
+import asyncio
+import glob
+import json
+import os
+import re
+import select
+import socket
+import threading
+from collections import namedtuple
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from corsheaders.conf import conf as cors_conf
+from django.conf import settings
+from django.db import close_old_connections, connection, connections
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import ChangeLog
+from .sync import SYNC_MODELS, latest_cursor, load_rows, settled_before
+
+EVENT_STREAM_PATH = "/events/"
+POSTGRES_CHANNEL = "ideal_changes"
+
+Event = namedtuple("Event", ["seq", "model", "tags", "frame"])
+
+
+def serializers():
+    """
+    Return the serializer class of each synced model.
+    """
+    from .serializers import PhotoSerializer, TagSerializer, VideoSerializer
+
+    return {"tag": TagSerializer, "photo": PhotoSerializer, "video": VideoSerializer}
+
+
+def frame(seq, name, data):
+    """
+    Return one event in the text/event-stream format.
+    """
+    payload = json.dumps(data, cls=JSONEncoder, separators=(",", ":"))
+    return f"id: {seq}\nevent: {name}\ndata: {payload}\n\n".encode()
+
+
+def build_events(entries):
+    """
+    Turn change log entries ``(seq, model, object_id, action)`` into events.
+
+    Only the last change of each row is kept. ``Event.tags`` is the set of
+    tag ids an event matters to for tag-filtered subscriptions, or None
+    for events every subscriber receives (deletes).
+    """
+    latest = {}
+    for seq, model, object_id, action in entries:
+        if model in SYNC_MODELS:
+            latest.pop((model, object_id), None)
+            latest[(model, object_id)] = (seq, action)
+
+    upserts = {name: [] for name in SYNC_MODELS}
+    for (model, object_id), (_, action) in latest.items():
+        if action == ChangeLog.UPSERT:
+            upserts[model].append(object_id)
+    classes = serializers()
+    rows = {}
+    for name, ids in upserts.items():
+        for row in classes[name](load_rows(name, ids), many=True).data:
+            rows[(name, str(row["id"]))] = row
+
+    events = []
+    for (model, object_id), (seq, action) in latest.items():
+        if action == ChangeLog.DELETE:
+            events.append(
+                Event(seq, model, None, frame(seq, f"{model}.delete", {"id": object_id}))
+            )
+        elif (model, object_id) in rows:
+            row = rows[(model, object_id)]
+            tags = {row["id"]} if model == "tag" else set(row.get("tags", ()))
+            events.append(Event(seq, model, tags, frame(seq, f"{model}.upsert", row)))
+    return events
+
+
+def matches(tags, event):
+    """
+    Return whether an event passes a subscription's tag filter.
+    """
+    return tags is None or event.tags is None or bool(tags & event.tags)
+
+
+class Subscription:
+    """
+    One connected client and its bounded queue of pending events.
+    """
+
+    def __init__(self, tags, size):
+        self.tags = tags
+        self.queue = asyncio.Queue(size)
+        self.overflowed = False
+
+    def offer(self, event):
+        """
+        Queue an event without waiting; a full queue ends the subscription.
+        """
+        if self.overflowed or not matches(self.tags, event):
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+
+class Broker:
+    """
+    Reads the change log for the subscribers of this process.
+
+    ``cursor`` is the newest seq below which every entry has been sent and
+    has settled (see core.sync); entries above it that were already sent
+    are remembered in ``sent``, so an entry that commits late is still
+    delivered once.
+    """
+
+    def __init__(self):
+        self.loop = None
+        self.subscribers = set()
+        self.wakeup = None
+        self.task = None
+        self.cursor = 0
+        self.sent = set()
+        self.bridge = None
+
+    async def subscribe(self, tags):
+        """
+        Register a client and start the broker task if it is not running.
+        """
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            self.stop()
+            self.loop, self.wakeup, self.task = loop, asyncio.Event(), None
+        subscription = Subscription(tags, settings.EVENTS_QUEUE_SIZE)
+        self.subscribers.add(subscription)
+        if self.task is None:
+            self.cursor, self.sent = await sync_to_async(latest_cursor)(), set()
+            self.bridge = start_bridge(self)
+            self.task = loop.create_task(self.run())
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """
+        Forget a client; the broker task ends with the last one.
+        """
+        self.subscribers.discard(subscription)
+        if not self.subscribers and self.wakeup is not None:
+            self.wakeup.set()
+
+    def wake(self):
+        """
+        Make the broker read the log now; safe to call from any thread.
+        """
+        loop, wakeup = self.loop, self.wakeup
+        if loop is None or wakeup is None:
+            return
+        try:
+            loop.call_soon_threadsafe(wakeup.set)
+        except RuntimeError:  # the loop has been closed
+            pass
+
+    def stop(self):
+        """
+        Abandon the task and bridge of a previous event loop.
+        """
+        try:
+            if self.bridge is not None:
+                self.bridge.close()
+            if self.task is not None:
+                self.task.cancel()
+        except RuntimeError:  # that loop has been closed
+            pass
+        self.bridge = self.task = None
+
+    async def run(self):
+        try:
+            while self.subscribers:
+                try:
+                    await asyncio.wait_for(
+                        self.wakeup.wait(), timeout=settings.EVENTS_POLL_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    pass
+                self.wakeup.clear()
+                if not self.subscribers:
+                    break
+                events, more = await sync_to_async(self.read)()
+                for event in events:
+                    for subscription in list(self.subscribers):
+                        subscription.offer(event)
+                if more:
+                    self.wakeup.set()
+        finally:
+            if self.task is asyncio.current_task():
+                self.task = None
+                if self.bridge is not None:
+                    self.bridge.close()
+                    self.bridge = None
+
+    def read(self):
+        """
+        Return the events not sent yet, and whether more are waiting.
+        """
+        close_old_connections()
+        limit = settings.EVENTS_BATCH_SIZE
+        entries = list(
+            ChangeLog.objects.filter(seq__gt=self.cursor)
+            .order_by("seq")
+            .values_list("seq", "model", "object_id", "action", "changed_at")[:limit]
+        )
+        fresh = [entry[:4] for entry in entries if entry[0] not in self.sent]
+        self.sent.update(entry[0] for entry in fresh)
+
+        settled = settled_before()
+        for seq, _, _, _, changed_at in entries:
+            if changed_at > settled:
+                break
+            self.cursor = seq
+        self.sent = {seq for seq in self.sent if seq > self.cursor}
+        return build_events(fresh), len(fresh) == limit
+
+
+broker = Broker()
+
+
+def announce():
+    """
+    Tell the brokers of every process that the change log has grown.
+    """
+    broker.wake()
+    if settings.EVENTS_BRIDGE == "socket":
+        SocketBridge.announce()
+    elif settings.EVENTS_BRIDGE == "postgres":
+        with connection.cursor() as cursor:
+            cursor.execute(f"NOTIFY {POSTGRES_CHANNEL}")
+
+
+def start_bridge(target):
+    """
+    Start listening for announcements from other processes, if configured.
+    """
+    if settings.EVENTS_BRIDGE == "socket":
+        return SocketBridge(target)
+    if settings.EVENTS_BRIDGE == "postgres":
+        return PostgresBridge(target)
+    return None
+
+
+class SocketBridge:
+    """
+    Wakes the broker on datagrams sent to this process's Unix socket.
+
+    Every listening process binds ``<EVENTS_SOCKET_DIR>/<pid>.sock``;
+    announcing sends one empty datagram to each socket in the directory.
+    """
+
+    def __init__(self, target):
+        os.makedirs(settings.EVENTS_SOCKET_DIR, exist_ok=True)
+        self.path = self.socket_path(os.getpid())
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.socket.bind(self.path)
+        self.socket.setblocking(False)
+        self.loop = target.loop
+        self.loop.add_reader(self.socket.fileno(), self.receive, target)
+
+    @staticmethod
+    def socket_path(pid):
+        return os.path.join(str(settings.EVENTS_SOCKET_DIR), f"{pid}.sock")
+
+    def receive(self, target):
+        try:
+            while True:
+                self.socket.recv(64)
+        except (BlockingIOError, InterruptedError):
+            pass
+        target.wakeup.set()
+
+    def close(self):
+        self.loop.remove_reader(self.socket.fileno())
+        self.socket.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    @classmethod
+    def announce(cls):
+        own = cls.socket_path(os.getpid())
+        pattern = os.path.join(str(settings.EVENTS_SOCKET_DIR), "*.sock")
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sender:
+            sender.setblocking(False)
+            for path in glob.glob(pattern):
+                if path == own:
+                    continue
+                try:
+                    sender.sendto(b"", path)
+                except ConnectionRefusedError:
+                    # Left behind by a process that died.
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                except OSError:
+                    # Full buffer: that broker already has a wake-up pending.
+                    pass
+
+
+class PostgresBridge:
+    """
+    Wakes the broker on ``NOTIFY`` from any process sharing the database.
+
+    Listens on a dedicated connection in a daemon thread.
+    """
+
+    def __init__(self, target):
+        import psycopg2
+
+        params = connections["default"].get_connection_params()
+        self.connection = psycopg2.connect(**params)
+        self.connection.set_session(autocommit=True)
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"LISTEN {POSTGRES_CHANNEL}")
+        self.closed = threading.Event()
+        self.thread = threading.Thread(target=self.listen, args=(target,), daemon=True)
+        self.thread.start()
+
+    def listen(self, target):
+        while not self.closed.is_set():
+            try:
+                ready, _, _ = select.select([self.connection], [], [], 1)
+                if not ready:
+                    continue
+                self.connection.poll()
+            except Exception:  # pylint: disable=broad-except
+                if self.closed.is_set():
+                    return
+                raise
+            if self.connection.notifies:
+                del self.connection.notifies[:]
+                target.wake()
+
+    def close(self):
+        self.closed.set()
+        self.connection.close()
+
+
+def parse_request(scope, headers):
+    """
+    Return ``(tags, last_event_id)`` for a stream request.
+
+    Raises:
+        ValueError: If the tag filter or event id is not a number.
+    """
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    tags = None
+    if query.get("tags"):
+        tags = {int(tag) for tag in query["tags"][0].split(",") if tag}
+    last_event_id = headers.get(b"last-event-id", b"").decode("latin-1")
+    if not last_event_id and query.get("last_event_id"):
+        last_event_id = query["last_event_id"][0]
+    return tags, int(last_event_id) if last_event_id else None
+
+
+def replay(last_event_id, tags):
+    """
+    Return the events after ``last_event_id``, or None if there are too many.
+    """
+    close_old_connections()
+    limit = settings.EVENTS_REPLAY_LIMIT
+    entries = list(
+        ChangeLog.objects.filter(seq__gt=last_event_id)
+        .order_by("seq")
+        .values_list("seq", "model", "object_id", "action")[: limit + 1]
+    )
+    if len(entries) > limit:
+        return None
+    return [event for event in build_events(entries) if matches(tags, event)]
+
+
+def cors_headers(headers):
+    """
+    Return the CORS response headers for the request's ``Origin``.
+
+    Follows the CORS_* settings of django-cors-headers, like the API.
+    """
+    origin = headers.get(b"origin", b"").decode("latin-1")
+    if not origin:
+        return []
+    allowed = (
+        cors_conf.CORS_ALLOW_ALL_ORIGINS
+        or origin in cors_conf.CORS_ALLOWED_ORIGINS
+        or any(re.match(pattern, origin) for pattern in cors_conf.CORS_ALLOWED_ORIGIN_REGEXES)
+    )
+    if not allowed:
+        return []
+    if cors_conf.CORS_ALLOW_ALL_ORIGINS and not cors_conf.CORS_ALLOW_CREDENTIALS:
+        return [(b"access-control-allow-origin", b"*")]
+    result = [(b"access-control-allow-origin", origin.encode("latin-1")), (b"vary", b"Origin")]
+    if cors_conf.CORS_ALLOW_CREDENTIALS:
+        result.append((b"access-control-allow-credentials", b"true"))
+    return result
+
+
+async def event_stream(scope, receive, send):
+    """
+    ASGI application streaming change events to one client.
+    """
+    headers = dict(scope.get("headers", ()))
+    try:
+        tags, last_event_id = parse_request(scope, headers)
+    except ValueError:
+        await send_error(send, 400, b"Invalid tags or last event id.")
+        return
+    if scope["method"] != "GET":
+        await send_error(send, 405, b"Method not allowed.")
+        return
+
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"text/event-stream"),
+                (b"cache-control", b"no-cache"),
+                (b"x-accel-buffering", b"no"),
+                *cors_headers(headers),
+            ],
+        }
+    )
+    retry = int(settings.EVENTS_RETRY_SECONDS * 1000)
+    await send_body(send, f"retry: {retry}\n\n".encode())
+
+    subscription = await broker.subscribe(tags)
+    disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+    try:
+        replayed = set()
+        if last_event_id is not None:
+            replayed = await send_replay(send, last_event_id, tags)
+        while replayed is not None and not disconnected.done():
+            pending = asyncio.ensure_future(subscription.queue.get())
+            done, _ = await asyncio.wait(
+                {pending, disconnected},
+                timeout=settings.EVENTS_HEARTBEAT_SECONDS,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if pending not in done:
+                pending.cancel()
+                if not done:
+                    await send_body(send, b": ping\n\n")
+                continue
+            event = pending.result()
+            if event is None:
+                break
+            if event.seq not in replayed:
+                await send_body(send, event.frame)
+    finally:
+        broker.unsubscribe(subscription)
+        disconnected.cancel()
+    await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+async def send_replay(send, last_event_id, tags):
+    """
+    Send the events a resuming client missed and return their ids.
+
+    Returns None after sending a ``reset`` event if the client is too far
+    behind; it should catch up with ``/sync/?since=<last event id>``.
+    """
+    events = await sync_to_async(replay)(last_event_id, tags)
+    if events is None:
+        await send_body(send, frame(last_event_id, "reset", {"cursor": last_event_id}))
+        return None
+    for event in events:
+        await send_body(send, event.frame)
+    return {event.seq for event in events}
+
+
+async def send_body(send, body):
+    await send({"type": "http.response.body", "body": body, "more_body": True})
+
+
+async def wait_for_disconnect(receive):
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def send_error(send, status, body):
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"text/plain; charset=utf-8")],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,215 @@
+"""
+Module docstring: This module contains the store behind ``Idempotency-Key`` support.
+
+A client retrying a POST sends the same ``Idempotency-Key`` header with
+every attempt. The first attempt claims the key by inserting an
+IdempotencyKey row and runs the view; if it succeeds (2xx) its response
+is stored, compressed, for IDEMPOTENCY_TTL seconds and every later attempt
+gets that response back without running the view. An attempt arriving
+while the first is still running waits on the row for up to
+IDEMPOTENCY_LOCK_TIMEOUT seconds. Failed attempts release the key so the
+client can retry.
+
+Keys are scoped by who sends them (see core.middleware), and a key reused
+for a different request is refused. The request fingerprint covers the
+method, path, query string and content type, plus a hash of the body for
+JSON and form posts. Multipart bodies differ between attempts in their
+random boundary, so they are parsed first (uploads streamed to temporary
+files, as the photo views do) and their fields and file contents hashed
+instead.
+
+Expired rows are deleted by whichever request next claims a key, at most
+once every IDEMPOTENCY_PRUNE_INTERVAL seconds per process.
+"""
+
+import hashlib
+import json
+import time
+import zlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler, TemporaryFileUploadHandler
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse
+from django.http.multipartparser import MultiPartParserError
+from django.utils import timezone
+
+from .image_validation import upload_too_large
+from .models import IdempotencyKey
+
+# Polling interval while waiting for a duplicate in progress.
+LOCK_POLL_SECONDS = 0.05
+REPLAY_HEADER = "Idempotent-Replayed"
+
+_last_prune = 0.0
+
+
+class IdempotencyError(Exception):
+    """
+    Raised when a request cannot be run or replayed under its key.
+    """
+
+    def __init__(self, status_code, detail):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def record_key(scope, key):
+    return hashlib.sha256(f"{scope}\n{key}".encode()).hexdigest()
+
+
+class ContentHashUploadHandler(FileUploadHandler):
+    """
+    Upload handler hashing the files of a multipart body as they stream past.
+
+    It hands every chunk on to the next handler, which stores the file.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.digest = hashlib.sha256()
+
+    def new_file(self, field_name, file_name, *args, **kwargs):
+        super().new_file(field_name, file_name, *args, **kwargs)
+        self.digest.update(f"{field_name}\n{file_name}\n".encode())
+
+    def receive_data_chunk(self, raw_data, start):
+        self.digest.update(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        self.digest.update(f"\n{file_size}\n".encode())
+
+
+def multipart_digest(request):
+    """
+    Parse a multipart ``request`` and hash its fields and file contents.
+
+    Raises:
+        IdempotencyError: If the body is too large or cannot be parsed.
+    """
+    if upload_too_large(request):
+        raise IdempotencyError(413, "The upload is too large.")
+    handler = ContentHashUploadHandler(request)
+    request.upload_handlers = [handler, TemporaryFileUploadHandler(request)]
+    try:
+        fields = sorted(request.POST.lists())
+    except MultiPartParserError as error:
+        raise IdempotencyError(400, f"Multipart form parse error - {error}") from error
+    digest = hashlib.sha256(json.dumps(fields).encode())
+    digest.update(handler.digest.digest())
+    return digest.hexdigest().encode()
+
+
+def fingerprint(request):
+    """
+    Return a digest identifying what ``request`` asks for.
+
+    Raises:
+        IdempotencyError: If a multipart body cannot be read.
+    """
+    content_type = request.META.get("CONTENT_TYPE", "")
+    if content_type.startswith("multipart/"):
+        body = multipart_digest(request)
+    else:
+        body = hashlib.sha256(request.body).hexdigest().encode()
+    digest = hashlib.sha256()
+    for part in (
+        request.method.encode(),
+        request.path.encode(),
+        request.META.get("QUERY_STRING", "").encode(),
+        content_type.split(";")[0].encode(),
+        body,
+    ):
+        digest.update(part + b"\n")
+    return digest.hexdigest()
+
+
+def prune_expired(force=False):
+    """
+    Delete expired keys, unless this process did so recently.
+
+    Returns the number of rows deleted.
+    """
+    global _last_prune
+    now = time.monotonic()
+    if not force and now - _last_prune < settings.IDEMPOTENCY_PRUNE_INTERVAL:
+        return 0
+    _last_prune = now
+    expired = IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).values_list(
+        "pk", flat=True
+    )[: settings.IDEMPOTENCY_PRUNE_BATCH_SIZE]
+    return IdempotencyKey.objects.filter(pk__in=list(expired)).delete()[0]
+
+
+def claim(key, request_fingerprint):
+    """
+    Claim ``key`` for a new request, or return the response stored for it.
+
+    Returns None when the caller should run the request and then call
+    ``store`` or ``release``. Raises IdempotencyError if the key belongs
+    to a different request or a duplicate is still running after
+    IDEMPOTENCY_LOCK_TIMEOUT seconds.
+    """
+    prune_expired()
+    deadline = time.monotonic() + settings.IDEMPOTENCY_LOCK_TIMEOUT
+    while True:
+        now = timezone.now()
+        try:
+            with transaction.atomic():
+                # An expired row, including one left by a crashed worker,
+                # no longer holds the key.
+                IdempotencyKey.objects.filter(key=key, expires_at__lte=now).delete()
+                IdempotencyKey.objects.create(
+                    key=key,
+                    fingerprint=request_fingerprint,
+                    expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_PENDING_SECONDS),
+                )
+            return None
+        except IntegrityError:
+            record = IdempotencyKey.objects.filter(key=key).first()
+        if record is None:
+            # Released in the meantime.
+            continue
+        if record.fingerprint != request_fingerprint:
+            raise IdempotencyError(
+                422, "This Idempotency-Key was already used for a different request."
+            )
+        if record.status_code is not None:
+            return replay(record)
+        if time.monotonic() >= deadline:
+            raise IdempotencyError(
+                409, "A request with this Idempotency-Key is still in progress."
+            )
+        time.sleep(LOCK_POLL_SECONDS)
+
+
+def store(key, response):
+    """
+    Keep ``response`` as the answer to ``key`` for IDEMPOTENCY_TTL seconds.
+    """
+    IdempotencyKey.objects.filter(key=key).update(
+        status_code=response.status_code,
+        content_type=response.get("Content-Type", ""),
+        body=zlib.compress(response.content),
+        expires_at=timezone.now() + timedelta(seconds=settings.IDEMPOTENCY_TTL),
+    )
+
+
+def release(key):
+    """
+    Give up ``key`` so a retry runs the request again.
+    """
+    IdempotencyKey.objects.filter(key=key, status_code__isnull=True).delete()
+
+
+def replay(record):
+    response = HttpResponse(
+        zlib.decompress(record.body),
+        status=record.status_code,
+        content_type=record.content_type or None,
+    )
+    response[REPLAY_HEADER] = "true"
+    return response
@@ -0,0 +1,228 @@
+"""
+Module docstring: This module contains the bounded validation of uploaded images.
+
+Django's ``ImageField`` validation has Pillow open and verify the whole
+upload in the web worker, so a decompression bomb or a huge image can take
+seconds of CPU and gigabytes of memory there. ``validate_image`` instead
+runs cheap checks first and stops at the first failure:
+
+1. the byte size, against IMAGE_UPLOAD_MAX_BYTES;
+2. the magic bytes, against the formats in IMAGE_SIGNATURES;
+3. the dimensions in the header (no pixels decoded), against
+   IMAGE_UPLOAD_MAX_PIXELS;
+4. with IMAGE_UPLOAD_FULL_DECODE, a full decode in a separate worker
+   process limited to IMAGE_DECODE_MEMORY_MB of address space and killed
+   after IMAGE_DECODE_TIMEOUT seconds.
+
+The decode worker reads the upload from disk; the photo views stream
+uploads to temporary files (see ``TemporaryUploadMixin`` in core.views).
+"""
+
+import atexit
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import warnings
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+
+# (offset, magic bytes, Pillow format) of the accepted image formats.
+IMAGE_SIGNATURES = (
+    (0, b"\xff\xd8\xff", "JPEG"),
+    (0, b"\x89PNG\r\n\x1a\n", "PNG"),
+    (0, b"GIF87a", "GIF"),
+    (0, b"GIF89a", "GIF"),
+    (8, b"WEBP", "WEBP"),
+)
+SIGNATURE_BYTES = 16
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def sniff_format(file):
+    """
+    Return the Pillow format named by the first bytes of ``file``, or None.
+    """
+    file.seek(0)
+    head = file.read(SIGNATURE_BYTES)
+    file.seek(0)
+    return sniff_head(head)
+
+
+def sniff_head(head):
+    """
+    Return the Pillow format named by the first SIGNATURE_BYTES bytes, or None.
+    """
+    return next(
+        (
+            name
+            for offset, magic, name in IMAGE_SIGNATURES
+            if head[offset:offset + len(magic)] == magic
+        ),
+        None,
+    )
+
+
+def header_size(file, image_format):
+    """
+    Return ``(width, height)`` from the image header, without decoding pixels.
+    """
+    from PIL import Image
+
+    file.seek(0)
+    try:
+        with warnings.catch_warnings():
+            # The pixel limit is checked below; a bomb warning is not an error here.
+            warnings.simplefilter("ignore", Image.DecompressionBombWarning)
+            with Image.open(file, formats=[image_format]) as image:
+                return image.size
+    except Image.DecompressionBombError as exc:
+        # Pillow refuses sizes far above its own limit while opening.
+        raise ValidationError(
+            f"The image is too large; at most {settings.IMAGE_UPLOAD_MAX_PIXELS} "
+            "pixels are allowed."
+        ) from exc
+    except (OSError, ValueError, SyntaxError) as exc:
+        raise ValidationError("Upload a valid image. The header could not be read.") from exc
+    finally:
+        file.seek(0)
+
+
+def limit_worker(memory_mb):
+    """
+    Pool initializer capping the worker's address space.
+    """
+    try:
+        import resource
+    except ImportError:  # Not available on Windows.
+        return
+    if memory_mb:
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def decode_image(path, image_format, max_pixels):
+    """
+    Fully decode the image at ``path``; return an error message or None.
+
+    Runs in a worker process.
+    """
+    from PIL import Image
+
+    Image.MAX_IMAGE_PIXELS = max_pixels
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", Image.DecompressionBombWarning)
+            with Image.open(path, formats=[image_format]) as image:
+                image.load()
+    except MemoryError:
+        return "The image needs too much memory to decode."
+    except Exception as exc:  # pylint: disable=broad-except
+        return f"The image could not be decoded: {exc}"
+    return None
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawned rather than forked: the web worker may be threaded.
+            _pool = multiprocessing.get_context("spawn").Pool(
+                settings.IMAGE_DECODE_WORKERS,
+                initializer=limit_worker,
+                initargs=(settings.IMAGE_DECODE_MEMORY_MB,),
+                maxtasksperchild=settings.IMAGE_DECODE_MAX_TASKS,
+            )
+        return _pool
+
+
+def reset_pool():
+    """
+    Kill the decode workers, e.g. after one timed out; the next decode starts new ones.
+    """
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.terminate()
+        pool.join()
+
+
+atexit.register(reset_pool)
+
+
+def decode_in_worker(file, image_format):
+    """
+    Decode ``file`` in the worker pool within IMAGE_DECODE_TIMEOUT seconds.
+
+    Raises:
+        ValidationError: If decoding fails or takes too long.
+    """
+    if hasattr(file, "temporary_file_path"):
+        path, copy = file.temporary_file_path(), None
+    else:
+        # Small uploads kept in memory are spilled for the worker.
+        copy = tempfile.NamedTemporaryFile(suffix=".upload", delete=False)
+        file.seek(0)
+        with copy:
+            shutil.copyfileobj(file, copy)
+        file.seek(0)
+        path = copy.name
+    try:
+        result = get_pool().apply_async(
+            decode_image, (path, image_format, settings.IMAGE_UPLOAD_MAX_PIXELS)
+        )
+        try:
+            error = result.get(settings.IMAGE_DECODE_TIMEOUT)
+        except multiprocessing.TimeoutError as exc:
+            reset_pool()
+            raise ValidationError("The image took too long to decode.") from exc
+    finally:
+        if copy is not None:
+            os.unlink(copy.name)
+    if error:
+        raise ValidationError(error)
+
+
+def upload_too_large(request):
+    """
+    Return whether the Content-Length of ``request`` rules out any acceptable upload.
+    """
+    try:
+        length = int(request.META.get("CONTENT_LENGTH") or 0)
+    except ValueError:
+        length = 0
+    return length > settings.IMAGE_UPLOAD_MAX_BYTES + settings.DATA_UPLOAD_MAX_MEMORY_SIZE
+
+
+def validate_image(file):
+    """
+    Check an uploaded image within fixed CPU and memory bounds.
+
+    Returns the Pillow format name.
+
+    Raises:
+        ValidationError: If the image is too large, not a supported format,
+            or cannot be decoded.
+    """
+    max_bytes = settings.IMAGE_UPLOAD_MAX_BYTES
+    if file.size > max_bytes:
+        raise ValidationError(f"The image is larger than {max_bytes} bytes.")
+    image_format = sniff_format(file)
+    if image_format is None:
+        raise ValidationError(
+            "Upload a valid image. Supported formats are JPEG, PNG, GIF and WebP."
+        )
+    width, height = header_size(file, image_format)
+    if width * height > settings.IMAGE_UPLOAD_MAX_PIXELS:
+        raise ValidationError(
+            f"The image is {width}x{height} pixels; at most "
+            f"{settings.IMAGE_UPLOAD_MAX_PIXELS} pixels are allowed."
+        )
+    if settings.IMAGE_UPLOAD_FULL_DECODE:
+        decode_in_worker(file, image_format)
+    return image_format
@@ -0,0 +1,181 @@
+"""
+Module docstring: This module contains the WebP/AVIF variants of uploaded photos.
+
+A photo is transcoded at most once per format and quality. The variant is
+written next to the original as ``<digest>.q<quality>.<format>``, so it
+shares the original's content address and is removed by ``gc_media``
+together with it. Pillow is imported only when a variant is built.
+"""
+
+import io
+import logging
+import os
+import re
+import tempfile
+from functools import lru_cache
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Format name -> (MIME type, Pillow format, file extension, quality setting)
+FORMATS = {
+    "avif": ("image/avif", "AVIF", "avif", "PHOTO_AVIF_QUALITY"),
+    "webp": ("image/webp", "WEBP", "webp", "PHOTO_WEBP_QUALITY"),
+}
+
+# Originals that are worth transcoding; GIFs may be animated.
+TRANSCODABLE_TYPES = ("image/jpeg", "image/png")
+
+VARIANT_NAME = re.compile(r"^(?P<stem>.+)\.q\d+\.(?:%s)$" % "|".join(FORMATS))
+
+
+class TranscodeError(Exception):
+    """
+    The original cannot be transcoded and is served as it is.
+    """
+
+
+@lru_cache(maxsize=None)
+def encoder_available(fmt):
+    """
+    Return whether the installed Pillow can write ``fmt``.
+    """
+    from PIL import Image, features
+
+    if fmt == "avif":
+        try:
+            if features.check("avif"):
+                return True
+        except ValueError:  # Pillow older than 11.3 has no AVIF feature
+            pass
+        Image.init()
+        return "AVIF" in Image.SAVE
+    return bool(features.check(fmt))
+
+
+def enabled_formats():
+    """
+    Return the configured output formats the encoder supports, best first.
+    """
+    return [
+        fmt
+        for fmt in settings.PHOTO_IMAGE_FORMATS
+        if fmt in FORMATS and encoder_available(fmt)
+    ]
+
+
+def parse_accept(header):
+    """
+    Return {media type: q} for an ``Accept`` header.
+    """
+    accepted = {}
+    for item in (header or "").split(","):
+        parts = [part.strip() for part in item.split(";")]
+        if not parts[0]:
+            continue
+        quality = 1.0
+        for param in parts[1:]:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[parts[0].lower()] = quality
+    return accepted
+
+
+def negotiate_format(accept_header, mime_type):
+    """
+    Return the best variant format the client accepts, or None for the original.
+
+    Only formats the client lists explicitly count: ``image/*`` and ``*/*``
+    do not tell whether a client can decode WebP or AVIF.
+    """
+    if mime_type not in TRANSCODABLE_TYPES:
+        return None
+    accepted = parse_accept(accept_header)
+    candidates = [
+        fmt for fmt in enabled_formats() if accepted.get(FORMATS[fmt][0], 0) > 0
+    ]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda fmt: accepted[FORMATS[fmt][0]])
+
+
+def variant_name(name, fmt):
+    """
+    Return the storage name of the ``fmt`` variant of ``name``.
+    """
+    quality = getattr(settings, FORMATS[fmt][3])
+    return f"{os.path.splitext(name)[0]}.q{quality}.{FORMATS[fmt][2]}"
+
+
+def original_stem(name):
+    """
+    Return the storage name of a variant without its extension, or None.
+    """
+    match = VARIANT_NAME.match(name)
+    return match.group("stem") if match else None
+
+
+def transcode(file, fmt):
+    """
+    Return the bytes of ``file`` encoded as ``fmt`` at the configured quality.
+
+    EXIF orientation is applied to the pixels, since the variant does not
+    carry the original's EXIF block. The decode runs in the web worker, so
+    images above the upload limit IMAGE_UPLOAD_MAX_PIXELS (see
+    core.image_validation) are refused from their header.
+
+    Raises:
+        TranscodeError: If the original is too large or cannot be decoded.
+    """
+    from PIL import Image, ImageOps
+
+    try:
+        with Image.open(file, formats=["JPEG", "PNG"]) as image:
+            width, height = image.size
+            if width * height > settings.IMAGE_UPLOAD_MAX_PIXELS:
+                raise TranscodeError(f"{width}x{height} pixels is above IMAGE_UPLOAD_MAX_PIXELS.")
+            image = ImageOps.exif_transpose(image)
+            if image.mode not in ("RGB", "RGBA"):
+                alpha = image.mode in ("LA", "PA") or "transparency" in image.info
+                image = image.convert("RGBA" if alpha else "RGB")
+            output = io.BytesIO()
+            image.save(output, FORMATS[fmt][1], quality=getattr(settings, FORMATS[fmt][3]))
+    except (OSError, ValueError, SyntaxError, MemoryError, Image.DecompressionBombError) as exc:
+        raise TranscodeError(str(exc)) from exc
+    return output.getvalue()
+
+
+def ensure_variant(storage, name, fmt):
+    """
+    Return the storage name of the ``fmt`` variant of ``name``, building it once.
+
+    The bytes are written to a temporary file and renamed into place, so a
+    concurrent request either sees the complete variant or builds its own.
+    Returns None if the original cannot be transcoded.
+    """
+    target = variant_name(name, fmt)
+    if storage.exists(target):
+        return target
+    try:
+        with storage.open(name, "rb") as file:
+            data = transcode(file, fmt)
+    except TranscodeError as exc:
+        logger.warning("Serving %s untranscoded: %s", name, exc)
+        return None
+    path = storage.path(target)
+    fd, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            handle.write(data)
+        os.chmod(temporary, 0o644)
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+    return target
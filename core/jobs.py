@@ -0,0 +1,162 @@
+"""
+Module docstring: This module contains the database-backed job runner.
+
+Handlers are registered by name with ``@register`` and jobs are queued with
+``Job.objects.enqueue``. Workers claim due jobs with
+``SELECT ... FOR UPDATE SKIP LOCKED`` where the database supports it and a
+conditional UPDATE per job otherwise (SQLite). Handlers must be idempotent:
+a job can run again after a worker dies mid-job or an attempt fails.
+"""
+
+import logging
+import random
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+FAILURE_HANDLERS = {}
+
+
+def register(kind, on_failure=None):
+    """
+    Register a job handler under ``kind``.
+
+    ``on_failure`` is called with the job payload once the job has used up
+    all its attempts. What the handler returns is kept as the job's result.
+    """
+
+    def decorator(func):
+        HANDLERS[kind] = func
+        if on_failure is not None:
+            FAILURE_HANDLERS[kind] = on_failure
+        return func
+
+    return decorator
+
+
+def retry_delay(attempts):
+    """
+    Return the exponential backoff (with jitter) before the next attempt.
+    """
+    delay = min(
+        settings.JOB_RETRY_BASE_DELAY * 2 ** max(attempts - 1, 0),
+        settings.JOB_RETRY_MAX_DELAY,
+    )
+    return timedelta(seconds=delay * random.uniform(0.5, 1.0))
+
+
+def claim_jobs(worker_id, limit=1):
+    """
+    Atomically mark up to ``limit`` due jobs as running for ``worker_id``.
+    """
+    now = timezone.now()
+    due = Job.objects.filter(status=Job.QUEUED, run_after__lte=now).order_by(
+        "run_after"
+    )
+    claim = {
+        "status": Job.RUNNING,
+        "locked_by": worker_id,
+        "locked_at": now,
+        "attempts": F("attempts") + 1,
+    }
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(
+                due.select_for_update(skip_locked=True).values_list("pk", flat=True)[
+                    :limit
+                ]
+            )
+            Job.objects.filter(pk__in=ids).update(**claim)
+    else:
+        # Without row locks, a job belongs to whichever worker's
+        # conditional UPDATE flips it out of the queued state first.
+        ids = [
+            pk
+            for pk in due.values_list("pk", flat=True)[:limit]
+            if Job.objects.filter(pk=pk, status=Job.QUEUED).update(**claim)
+        ]
+    return list(Job.objects.filter(pk__in=ids))
+
+
+def requeue_stale_jobs():
+    """
+    Put back jobs whose worker has held them longer than JOB_LOCK_TIMEOUT.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.JOB_LOCK_TIMEOUT)
+    return Job.objects.filter(status=Job.RUNNING, locked_at__lt=cutoff).update(
+        status=Job.QUEUED, locked_by="", locked_at=None
+    )
+
+
+def run_job(job):
+    """
+    Run a claimed job and record its outcome.
+    """
+    handler = HANDLERS.get(job.kind)
+    try:
+        if handler is None:
+            raise LookupError(f"No handler registered for job kind {job.kind!r}.")
+        result = handler(**job.payload)
+    except Exception as exc:  # pylint: disable=broad-except
+        logger.exception("Job %s failed (attempt %s).", job, job.attempts)
+        job.last_error = f"{type(exc).__name__}: {exc}"
+        job.locked_by = ""
+        job.locked_at = None
+        if job.attempts >= settings.JOB_MAX_ATTEMPTS:
+            job.status = Job.FAILED
+            on_failure = FAILURE_HANDLERS.get(job.kind)
+            if on_failure is not None:
+                try:
+                    on_failure(**job.payload)
+                except Exception:  # pylint: disable=broad-except
+                    logger.exception("Failure handler of job %s failed.", job)
+        else:
+            job.status = Job.QUEUED
+            job.run_after = timezone.now() + retry_delay(job.attempts)
+        job.save(
+            update_fields=["status", "run_after", "last_error", "locked_by", "locked_at"]
+        )
+        return False
+    job.status = Job.DONE
+    job.result = result
+    job.save(update_fields=["status", "result"])
+    return True
+
+
+def run_pending_jobs(worker_id="inline", limit=None):
+    """
+    Run due jobs in this thread until none are left (or ``limit`` ran).
+    """
+    count = 0
+    while limit is None or count < limit:
+        jobs = claim_jobs(worker_id)
+        if not jobs:
+            break
+        for job in jobs:
+            run_job(job)
+            count += 1
+    return count
+
+
+def work(worker_id, stop_event=None, poll_interval=1.0, batch_size=1):
+    """
+    Worker loop: claim and run jobs until ``stop_event`` is set.
+    """
+    stop_event = stop_event or threading.Event()
+    while not stop_event.is_set():
+        close_old_connections()
+        requeue_stale_jobs()
+        jobs = claim_jobs(worker_id, limit=batch_size)
+        for job in jobs:
+            run_job(job)
+        if not jobs:
+            stop_event.wait(poll_interval)
@@ -0,0 +1,81 @@
+"""
+Management command for measuring the byte savings of WebP/AVIF photo delivery.
+"""
+
+import io
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.image_variants import FORMATS, TRANSCODABLE_TYPES, enabled_formats, transcode
+from core.models import Photo
+
+SAMPLE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+class Command(BaseCommand):
+    """
+    Transcode a sample corpus and compare output sizes with the originals.
+    """
+
+    help = "Report how many bytes WebP/AVIF delivery saves on a sample of photos."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--path",
+            help="Directory of JPEG/PNG files to use instead of the stored photos.",
+        )
+        parser.add_argument(
+            "--limit", type=int, default=100, help="Maximum number of images to sample."
+        )
+
+    def samples(self, path, limit):
+        if path:
+            names = sorted(
+                name
+                for name in os.listdir(path)
+                if name.lower().endswith(SAMPLE_EXTENSIONS)
+            )[:limit]
+            for name in names:
+                yield name, lambda name=name: open(os.path.join(path, name), "rb")
+            return
+        photos = Photo.objects.filter(mime_type__in=TRANSCODABLE_TYPES).exclude(image="")
+        for photo in photos.only("image")[:limit]:
+            yield photo.image.name, lambda photo=photo: photo.image.open("rb")
+
+    def handle(self, *args, **options):
+        formats = enabled_formats()
+        if not formats:
+            raise CommandError("The installed Pillow cannot write any of PHOTO_IMAGE_FORMATS.")
+        original_bytes = 0
+        totals = {fmt: {"bytes": 0, "seconds": 0.0} for fmt in formats}
+        count = 0
+        for name, opener in self.samples(options["path"], options["limit"]):
+            with opener() as file:
+                original = file.read()
+            results = {}
+            try:
+                for fmt in formats:
+                    start = time.perf_counter()
+                    size = len(transcode(io.BytesIO(original), fmt))
+                    results[fmt] = (size, time.perf_counter() - start)
+            except OSError as exc:
+                self.stderr.write(f"Skipping {name}: {exc}")
+                continue
+            for fmt, (size, seconds) in results.items():
+                totals[fmt]["bytes"] += size
+                totals[fmt]["seconds"] += seconds
+            original_bytes += len(original)
+            count += 1
+        if not count:
+            raise CommandError("No sample images found.")
+        self.stdout.write(f"{count} images, {original_bytes / 1024:.1f} KiB original.")
+        for fmt in formats:
+            saved = 1 - totals[fmt]["bytes"] / original_bytes
+            self.stdout.write(
+                f"{fmt:>5}: {totals[fmt]['bytes'] / 1024:.1f} KiB "
+                f"({saved:.1%} saved), "
+                f"{totals[fmt]['seconds'] * 1000 / count:.1f}ms per image "
+                f"to encode ({FORMATS[fmt][0]})"
+            )
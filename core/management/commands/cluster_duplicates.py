@@ -0,0 +1,71 @@
+"""
+Management command for grouping near-duplicate photos across the catalog.
+"""
+
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.duplicates import cluster_hashes
+from core.media import image_dhash
+from core.models import Photo
+
+
+class Command(BaseCommand):
+    """
+    Cluster photos whose perceptual hashes are within a Hamming distance.
+    """
+
+    help = "Find groups of near-duplicate photos by perceptual hash."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--distance",
+            type=int,
+            default=settings.PHASH_DUPLICATE_DISTANCE,
+            help="Maximum Hamming distance between duplicates.",
+        )
+        parser.add_argument(
+            "--compute-missing",
+            action="store_true",
+            help="First hash photos that have an image but no hash yet.",
+        )
+        parser.add_argument("--output", help="Write the clusters to this JSON file.")
+
+    def compute_missing(self):
+        from PIL import Image
+
+        count = 0
+        missing = Photo.objects.filter(phash="").exclude(image="").exclude(image=None)
+        for photo in missing.only("id", "image").iterator():
+            try:
+                with photo.image.open("rb") as file, Image.open(file) as image:
+                    photo.set_phash(image_dhash(image))
+            except (OSError, ValueError) as exc:
+                self.stderr.write(f"Skipping {photo.pk}: {exc}")
+                continue
+            photo.save(update_fields=["phash", *Photo.PHASH_BAND_FIELDS])
+            count += 1
+        return count
+
+    def handle(self, *args, **options):
+        if options["compute_missing"]:
+            self.stdout.write(f"Hashed {self.compute_missing()} photos.")
+        started = time.monotonic()
+        hashes = {
+            str(pk): int(phash, 16)
+            for pk, phash in Photo.objects.exclude(phash="").values_list("id", "phash").iterator()
+        }
+        clusters = cluster_hashes(hashes, options["distance"])
+        duplicates = sum(len(cluster) - 1 for cluster in clusters)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{len(hashes)} photos, {len(clusters)} clusters, {duplicates} "
+                f"near-duplicates in {time.monotonic() - started:.1f}s."
+            )
+        )
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as handle:
+                json.dump(clusters, handle, indent=2)
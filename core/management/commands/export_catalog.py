@@ -0,0 +1,59 @@
+"""
+Management command for exporting the media catalog as NDJSON.
+"""
+
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.catalog import CATALOG_MODELS, export_catalog
+
+
+class Command(BaseCommand):
+    """
+    Stream tags, photos and videos (with their tag links) to NDJSON.
+
+    Rows are read a page at a time in primary key order, so memory use
+    does not grow with the catalog. See core.catalog for the format.
+    """
+
+    help = "Export the tag/photo/video catalog as NDJSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", "-o", help="File to write; defaults to stdout.")
+        parser.add_argument(
+            "--models",
+            default=",".join(CATALOG_MODELS),
+            help="Comma-separated models to export (tag, photo, video).",
+        )
+        parser.add_argument("--batch-size", type=int, help="Rows per query.")
+
+    def handle(self, *args, **options):
+        models = [name.strip() for name in options["models"].split(",") if name.strip()]
+        unknown = set(models) - set(CATALOG_MODELS)
+        if unknown:
+            raise CommandError(f"Unknown models: {', '.join(sorted(unknown))}")
+
+        started = time.monotonic()
+        rows = 0
+        try:
+            output = open(options["output"], "wb") if options["output"] else sys.stdout.buffer
+        except OSError as exc:
+            raise CommandError(str(exc)) from exc
+        try:
+            for line in export_catalog(models, batch_size=options["batch_size"]):
+                output.write(line)
+                rows += 1
+        finally:
+            if options["output"]:
+                output.close()
+            else:
+                output.flush()
+
+        seconds = time.monotonic() - started
+        rate = rows / seconds if seconds else 0.0
+        # Progress goes to stderr so stdout can carry the export.
+        self.stderr.write(
+            self.style.SUCCESS(f"Exported {rows} rows in {seconds:.1f}s ({rate:.0f} rows/s).")
+        )
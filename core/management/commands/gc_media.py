@@ -0,0 +1,60 @@
+"""
+Management command for removing orphaned photo and video files.
+"""
+
+from django.core.management.base import BaseCommand
+
+from core.media_gc import MediaGarbageCollector
+
+
+class Command(BaseCommand):
+    """
+    Delete or quarantine media files that no Photo or Video references.
+    """
+
+    help = "Remove media files no longer referenced by any photo or video."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Only report what would be removed."
+        )
+        parser.add_argument(
+            "--grace-hours",
+            type=float,
+            default=24,
+            help="Keep files modified within this many hours.",
+        )
+        parser.add_argument(
+            "--quarantine", help="Move orphans into this directory instead of deleting."
+        )
+        parser.add_argument(
+            "--rate", type=float, default=0, help="Maximum files removed per second."
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=1000, help="Names checked per query."
+        )
+        parser.add_argument(
+            "--checkpoint", help="File recording progress so a run can be resumed."
+        )
+        parser.add_argument(
+            "--resume", action="store_true", help="Continue from the checkpoint file."
+        )
+
+    def handle(self, *args, **options):
+        collector = MediaGarbageCollector(
+            grace_seconds=options["grace_hours"] * 3600,
+            dry_run=options["dry_run"],
+            quarantine=options["quarantine"],
+            rate=options["rate"],
+            batch_size=options["batch_size"],
+            checkpoint=options["checkpoint"],
+        )
+        stats = collector.run(resume=options["resume"])
+        action = "Would remove" if options["dry_run"] else "Removed"
+        count = stats["orphans"] if options["dry_run"] else stats["removed"]
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Scanned {stats['scanned']} files. {action} {count} orphans "
+                f"({stats['bytes']} bytes)."
+            )
+        )
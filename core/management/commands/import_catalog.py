@@ -0,0 +1,65 @@
+"""
+Management command for importing an NDJSON media catalog.
+"""
+
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.catalog import import_catalog
+
+
+class Command(BaseCommand):
+    """
+    Upsert tags, photos and videos from an ``export_catalog`` file.
+
+    After every committed batch the number of lines done is written to the
+    checkpoint file (``<path>.checkpoint`` by default); ``--resume`` starts
+    from there. The checkpoint is removed once the import completes.
+    """
+
+    help = "Import (upsert) a tag/photo/video catalog from NDJSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="NDJSON file written by export_catalog.")
+        parser.add_argument("--batch-size", type=int, help="Rows per transaction.")
+        parser.add_argument("--checkpoint", help="Checkpoint file path.")
+        parser.add_argument(
+            "--resume", action="store_true", help="Continue from the checkpoint file."
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        checkpoint_path = options["checkpoint"] or f"{path}.checkpoint"
+        start = 0
+        if options["resume"] and os.path.exists(checkpoint_path):
+            with open(checkpoint_path, encoding="utf-8") as handle:
+                start = int(handle.read().strip() or 0)
+            self.stdout.write(f"Resuming after line {start}.")
+
+        def checkpoint(line):
+            with open(checkpoint_path, "w", encoding="utf-8") as handle:
+                handle.write(str(line))
+
+        try:
+            with open(path, "rb") as stream:
+                result = import_catalog(
+                    stream,
+                    start=start,
+                    batch_size=options["batch_size"],
+                    checkpoint=checkpoint,
+                )
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc)) from exc
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+
+        for error in result["errors"]:
+            self.stderr.write(f"line {error['line']}: {error['error']}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {result['created']}, updated {result['updated']}, "
+                f"{len(result['errors'])} errors in {result['seconds']:.1f}s "
+                f"({result['rows_per_second']:.0f} rows/s)."
+            )
+        )
@@ -0,0 +1,53 @@
+"""
+Management command for bulk importing users from CSV or NDJSON.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.user_import import detect_format, import_users
+
+
+class Command(BaseCommand):
+    """
+    Import users from a CSV or NDJSON file.
+
+    Columns/keys: email, username, first_name, last_name, and either
+    password (raw, hashed in a process pool) or password_hash (an existing
+    Django password hash, stored as is).
+    """
+
+    help = "Bulk import users from a CSV or NDJSON file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV or NDJSON file to import.")
+        parser.add_argument(
+            "--format", choices=["csv", "ndjson"], help="Defaults to the file extension."
+        )
+        parser.add_argument("--batch-size", type=int, help="Rows per INSERT.")
+        parser.add_argument("--workers", type=int, help="Password hashing processes.")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = options["format"] or detect_format(path)
+        started = time.monotonic()
+        try:
+            with open(path, "rb") as stream:
+                result = import_users(
+                    stream,
+                    fmt=fmt,
+                    batch_size=options["batch_size"],
+                    workers=options["workers"],
+                )
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc)) from exc
+
+        for error in result["errors"]:
+            self.stderr.write(f"row {error['row']}: {error['error']}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {result['created']} users, skipped {result['skipped']}, "
+                f"{len(result['errors'])} errors in {time.monotonic() - started:.1f}s."
+            )
+        )
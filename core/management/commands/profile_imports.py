@@ -0,0 +1,59 @@
+"""
+Management command for profiling the imports of a web process startup.
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.warmup import deferred_violations, profile_imports
+
+
+class Command(BaseCommand):
+    """
+    Report the slowest imports of a startup and heavy packages imported eagerly.
+    """
+
+    help = "Profile the imports of loading the WSGI application and URL conf."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--limit", type=int, default=20, help="Number of imports to list."
+        )
+        parser.add_argument(
+            "--sort",
+            choices=["cumulative", "self"],
+            default="cumulative",
+            help="Order by time including (cumulative) or excluding sub-imports.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            records = profile_imports()
+        except RuntimeError as exc:
+            raise CommandError(f"Startup failed: {exc}") from exc
+        key = "cumulative_us" if options["sort"] == "cumulative" else "self_us"
+        total = sum(record.self_us for record in records)
+        self.stdout.write(f"{len(records)} modules imported in {total / 1000:.1f}ms.")
+        self.stdout.write(f"{'self ms':>9} {'cumul ms':>9}  module")
+        for record in sorted(records, key=lambda r: getattr(r, key), reverse=True)[
+            : options["limit"]
+        ]:
+            self.stdout.write(
+                f"{record.self_us / 1000:9.1f} {record.cumulative_us / 1000:9.1f}  "
+                f"{record.module}"
+            )
+        violations = deferred_violations(records)
+        if violations:
+            self.stdout.write(
+                self.style.WARNING(
+                    "Imported at startup but listed in DEFERRED_IMPORTS "
+                    f"({', '.join(settings.DEFERRED_IMPORTS)}):"
+                )
+            )
+            for record in violations:
+                self.stdout.write(
+                    f"  {record.module} ({record.cumulative_us / 1000:.1f}ms), "
+                    f"imported by {record.parent or 'the startup script'}"
+                )
+        else:
+            self.stdout.write(self.style.SUCCESS("No deferred package is imported at startup."))
@@ -0,0 +1,24 @@
+"""
+Management command for compacting the sync change log.
+"""
+
+from django.core.management.base import BaseCommand
+
+from core.sync import prune_changelog
+
+
+class Command(BaseCommand):
+    """
+    Delete change log entries superseded by a later change to the same row.
+    """
+
+    help = "Remove superseded entries from the sync change log."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=1000, help="Entries deleted per query."
+        )
+
+    def handle(self, *args, **options):
+        removed = prune_changelog(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Removed {removed} superseded entries."))
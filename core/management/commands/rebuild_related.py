@@ -0,0 +1,39 @@
+"""
+Management command for recomputing related-media lists.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.related import MEDIA_MODELS, rebuild_related
+
+
+class Command(BaseCommand):
+    """
+    Recompute the related photos/videos of every item from their tags.
+    """
+
+    help = "Rebuild the related-media lists from tag similarity."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--type",
+            choices=sorted(MEDIA_MODELS),
+            action="append",
+            help="Media type to rebuild (default: all).",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=500, help="Items scored per matrix product."
+        )
+
+    def handle(self, *args, **options):
+        for media_type in options["type"] or sorted(MEDIA_MODELS):
+            started = time.monotonic()
+            count = rebuild_related(media_type, batch_size=options["batch_size"])
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Rebuilt related lists for {count} {media_type}s "
+                    f"in {time.monotonic() - started:.1f}s."
+                )
+            )
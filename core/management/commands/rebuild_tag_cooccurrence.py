@@ -0,0 +1,26 @@
+"""
+Management command for rebuilding the tag co-occurrence counts.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.cooccurrence import rebuild_cooccurrence
+
+
+class Command(BaseCommand):
+    """
+    Recompute the tag co-occurrence table from the photo and video tags.
+    """
+
+    help = "Rebuild the tag co-occurrence counts from scratch."
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        count = rebuild_cooccurrence()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Stored {count} tag pairs in {time.monotonic() - started:.1f}s."
+            )
+        )
@@ -0,0 +1,38 @@
+"""
+Management command for rebuilding the denormalized tag snapshots.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.tag_snapshots import rebuild_snapshots
+
+
+class Command(BaseCommand):
+    """
+    Recompute the tag snapshot of every photo and video.
+
+    Snapshots are maintained on every write; run this after writes that
+    bypass model signals, or to correct drift.
+    """
+
+    help = "Rebuild the tag snapshots of all photos and videos."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=None,
+            help="Rows per query (default: TAG_SNAPSHOT_BATCH_SIZE).",
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        rebuilt = rebuild_snapshots(batch_size=options["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt {rebuilt['photo']} photo and {rebuilt['video']} video snapshots "
+                f"in {time.monotonic() - started:.1f}s."
+            )
+        )
@@ -0,0 +1,107 @@
+"""
+Management command for running background job workers.
+"""
+
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core.jobs import run_pending_jobs, work
+
+
+def _raise_interrupt(*args):
+    raise KeyboardInterrupt
+
+
+def _process_worker(worker_id, poll_interval, batch_size):
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *args: stop_event.set())
+    signal.signal(signal.SIGINT, lambda *args: stop_event.set())
+    work(worker_id, stop_event, poll_interval, batch_size)
+
+
+class Command(BaseCommand):
+    """
+    Run background job workers in processes or threads.
+    """
+
+    help = "Run background job workers."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency", type=int, default=os.cpu_count() or 1, help="Number of workers."
+        )
+        parser.add_argument(
+            "--mode",
+            choices=["process", "thread"],
+            default="process",
+            help="Run workers as processes (CPU-bound work) or threads (I/O-bound work).",
+        )
+        parser.add_argument(
+            "--poll-interval", type=float, default=1.0, help="Seconds to sleep when idle."
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=1, help="Jobs claimed per query."
+        )
+        parser.add_argument(
+            "--once", action="store_true", help="Run due jobs in this process and exit."
+        )
+
+    def handle(self, *args, **options):
+        signal.signal(signal.SIGTERM, _raise_interrupt)
+        prefix = f"{socket.gethostname()}:{os.getpid()}"
+        if options["once"]:
+            count = run_pending_jobs(worker_id=prefix)
+            self.stdout.write(self.style.SUCCESS(f"Ran {count} jobs."))
+            return
+
+        worker_args = [
+            (f"{prefix}:{index}", options["poll_interval"], options["batch_size"])
+            for index in range(options["concurrency"])
+        ]
+        if options["mode"] == "thread":
+            self._run_threads(worker_args)
+        else:
+            self._run_processes(worker_args)
+
+    def _run_threads(self, worker_args):
+        stop_event = threading.Event()
+        threads = [
+            threading.Thread(target=work, args=(worker_id, stop_event, *rest))
+            for worker_id, *rest in worker_args
+        ]
+        for thread in threads:
+            thread.start()
+        self.stdout.write(f"Started {len(threads)} worker threads.")
+        try:
+            while any(thread.is_alive() for thread in threads):
+                for thread in threads:
+                    thread.join(timeout=1)
+        except KeyboardInterrupt:
+            stop_event.set()
+        for thread in threads:
+            thread.join()
+
+    def _run_processes(self, worker_args):
+        # Children must open their own database connections.
+        connections.close_all()
+        processes = [
+            multiprocessing.Process(target=_process_worker, args=args)
+            for args in worker_args
+        ]
+        for process in processes:
+            process.start()
+        self.stdout.write(f"Started {len(processes)} worker processes.")
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.join()
@@ -0,0 +1,140 @@
+"""
+Module docstring: This module contains helpers for reading media file metadata.
+
+Metadata is read once when a file is uploaded and stored on the row, so
+listing photos and videos never has to open the files again.
+"""
+
+import base64
+import mimetypes
+from datetime import datetime
+
+from django.utils import timezone
+
+EXIF_ORIENTATION = 0x0112
+EXIF_DATETIME = 0x0132
+EXIF_IFD = 0x8769
+EXIF_DATETIME_ORIGINAL = 0x9003
+
+PLACEHOLDER_GRID = 4
+
+# dHash: 8 rows of 8 left/right gradient bits, split into 16-bit bands.
+PHASH_SIZE = 8
+PHASH_BANDS = 4
+PHASH_BAND_BITS = 64 // PHASH_BANDS
+
+# (offset, magic bytes, MIME type) for common video containers.
+VIDEO_SIGNATURES = (
+    (4, b"ftypqt", "video/quicktime"),
+    (4, b"ftyp", "video/mp4"),
+    (0, b"\x1a\x45\xdf\xa3", "video/webm"),
+    (8, b"AVI ", "video/x-msvideo"),
+    (0, b"OggS", "video/ogg"),
+)
+
+
+def _parse_exif_datetime(value):
+    try:
+        parsed = datetime.strptime(str(value).strip("\x00 "), "%Y:%m:%d %H:%M:%S")
+    except ValueError:
+        return None
+    return timezone.make_aware(parsed, timezone.get_default_timezone())
+
+
+def image_placeholder(image):
+    """
+    Return a tiny base64 colour grid to show while the real image loads.
+
+    JPEGs are decoded in draft mode at a fraction of their size, so this is
+    far cheaper than a full decode.
+    """
+    image.draft("RGB", (PLACEHOLDER_GRID * 8, PLACEHOLDER_GRID * 8))
+    grid = image.convert("RGB").resize((PLACEHOLDER_GRID, PLACEHOLDER_GRID))
+    return base64.urlsafe_b64encode(grid.tobytes()).decode("ascii")
+
+
+def image_dhash(image):
+    """
+    Return the 64-bit difference hash of an image.
+
+    The image is shrunk to 9x8 greyscale and each bit records whether a
+    pixel is brighter than its right neighbour, so re-encodes, resizes and
+    small colour changes keep (nearly) the same hash. JPEGs are decoded in
+    draft mode.
+    """
+    image.draft("L", (PHASH_SIZE * 8, PHASH_SIZE * 8))
+    pixels = list(
+        image.convert("L").resize((PHASH_SIZE + 1, PHASH_SIZE)).getdata()
+    )
+    value = 0
+    for row in range(PHASH_SIZE):
+        for column in range(PHASH_SIZE):
+            left = pixels[row * (PHASH_SIZE + 1) + column]
+            right = pixels[row * (PHASH_SIZE + 1) + column + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def phash_bands(value):
+    """
+    Split a 64-bit hash into PHASH_BANDS integers, most significant first.
+    """
+    mask = (1 << PHASH_BAND_BITS) - 1
+    return [
+        (value >> (PHASH_BAND_BITS * (PHASH_BANDS - 1 - index))) & mask
+        for index in range(PHASH_BANDS)
+    ]
+
+
+def read_image_metadata(file, placeholder=True):
+    """
+    Return dimensions, size, MIME type and EXIF details of an image file.
+
+    Pillow only parses the header to open an image, so everything except
+    the placeholder is read without decoding pixels. Unreadable images
+    yield just the byte size.
+    """
+    from PIL import Image
+
+    metadata = {"file_size": file.size}
+    file.seek(0)
+    try:
+        with Image.open(file) as image:
+            exif = image.getexif()
+            taken_at = exif.get_ifd(EXIF_IFD).get(EXIF_DATETIME_ORIGINAL) or exif.get(
+                EXIF_DATETIME
+            )
+            metadata.update(
+                width=image.width,
+                height=image.height,
+                mime_type=image.get_format_mimetype() or "",
+                orientation=exif.get(EXIF_ORIENTATION),
+                taken_at=_parse_exif_datetime(taken_at) if taken_at else None,
+            )
+            if placeholder:
+                metadata["placeholder"] = image_placeholder(image)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        pass
+    finally:
+        file.seek(0)
+    return metadata
+
+
+def read_video_metadata(file):
+    """
+    Return the size and MIME type of a video file from its first bytes.
+    """
+    file.seek(0)
+    head = file.read(16)
+    file.seek(0)
+    mime_type = next(
+        (
+            mime
+            for offset, magic, mime in VIDEO_SIGNATURES
+            if head[offset:offset + len(magic)] == magic
+        ),
+        None,
+    )
+    if mime_type is None:
+        mime_type = mimetypes.guess_type(file.name or "")[0] or ""
+    return {"file_size": file.size, "mime_type": mime_type}
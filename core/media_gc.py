@@ -0,0 +1,197 @@
+"""
+Module docstring: This module contains the garbage collector for orphaned media files.
+
+Files under the photo and video upload directories that no row references
+any more (after a delete or a file replacement) are found by streaming the
+directory tree in sorted order and checking names against the database in
+batches, so memory use does not grow with the number of files.
+"""
+
+import os
+import shutil
+import time
+from itertools import islice
+
+from django.db.models import Q
+
+from .image_variants import original_stem
+from .models import MediaBlob, Photo, Video
+from .storage import media_storage
+
+MEDIA_FIELDS = ((Photo, "image"), (Video, "video_file"))
+
+
+def media_directories():
+    """
+    Return the storage directories that hold uploaded media.
+    """
+    return sorted(
+        {model._meta.get_field(field).upload_to.strip("/") for model, field in MEDIA_FIELDS}
+    )
+
+
+def _parts(name):
+    return tuple(name.split("/"))
+
+
+def iter_media_files(root, directories, after=None):
+    """
+    Yield (name, DirEntry) for files under ``directories`` in sorted order.
+
+    Names are storage names relative to ``root``. When ``after`` is given,
+    files up to and including it are skipped and directories that sort
+    entirely before it are not read at all.
+    """
+    after = _parts(after) if after else None
+
+    def walk(relative):
+        try:
+            entries = sorted(os.scandir(os.path.join(root, relative)), key=lambda e: e.name)
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            name = f"{relative}/{entry.name}"
+            parts = _parts(name)
+            if entry.is_dir(follow_symlinks=False):
+                if after is None or parts >= after[: len(parts)]:
+                    yield from walk(name)
+            elif entry.is_file(follow_symlinks=False):
+                if after is None or parts > after:
+                    yield name, entry
+
+    for directory in directories:
+        if after is None or _parts(directory) >= after[:1]:
+            yield from walk(directory)
+
+
+# Variant stems checked per query (one LIKE per stem).
+VARIANT_BATCH_SIZE = 100
+
+
+def referenced_names(names):
+    """
+    Return which of ``names`` are referenced by a Photo or Video row.
+
+    A transcoded photo variant (see core.image_variants) counts as
+    referenced while its original is.
+    """
+    referenced = set()
+    for model, field in MEDIA_FIELDS:
+        referenced.update(
+            model.objects.filter(**{f"{field}__in": names}).values_list(field, flat=True)
+        )
+    variants = {}
+    for name in names:
+        stem = original_stem(name)
+        if stem is not None:
+            variants.setdefault(stem, []).append(name)
+    stems = list(variants)
+    for start in range(0, len(stems), VARIANT_BATCH_SIZE):
+        query = Q()
+        for stem in stems[start:start + VARIANT_BATCH_SIZE]:
+            query |= Q(image__startswith=f"{stem}.")
+        for image in Photo.objects.filter(query).values_list("image", flat=True):
+            stem = os.path.splitext(image)[0]
+            referenced.update(variants.get(stem, ()))
+    return referenced
+
+
+class MediaGarbageCollector:
+    """
+    Delete or quarantine media files that no row references.
+
+    Args:
+        grace_seconds: Files modified more recently than this are kept, so
+            uploads whose row is not committed yet are never touched. The
+            storage refreshes the modification time when an upload reuses
+            an existing file.
+        dry_run: Only report what would be removed.
+        quarantine: Move orphans into this directory instead of deleting.
+        rate: Maximum number of files removed per second (0 for no limit).
+        batch_size: Names checked against the database per query.
+        checkpoint: File recording the last processed name, for resuming.
+    """
+
+    def __init__(
+        self,
+        grace_seconds=24 * 3600,
+        dry_run=False,
+        quarantine=None,
+        rate=0,
+        batch_size=1000,
+        checkpoint=None,
+        storage=media_storage,
+    ):
+        self.grace_seconds = grace_seconds
+        self.dry_run = dry_run
+        self.quarantine = quarantine
+        self.rate = rate
+        self.batch_size = batch_size
+        self.checkpoint = checkpoint
+        self.storage = storage
+        self.stats = {"scanned": 0, "orphans": 0, "removed": 0, "bytes": 0}
+        self._last_removal = 0.0
+
+    def read_checkpoint(self):
+        """
+        Return the last name processed by an interrupted run, if any.
+        """
+        if not self.checkpoint or not os.path.exists(self.checkpoint):
+            return None
+        with open(self.checkpoint, encoding="utf-8") as handle:
+            return handle.read().strip() or None
+
+    def write_checkpoint(self, name):
+        if not self.checkpoint or self.dry_run:
+            return
+        temporary = f"{self.checkpoint}.tmp"
+        with open(temporary, "w", encoding="utf-8") as handle:
+            handle.write(name)
+        os.replace(temporary, self.checkpoint)
+
+    def run(self, resume=False):
+        """
+        Scan the media directories and return the collected statistics.
+        """
+        root = self.storage.location
+        after = self.read_checkpoint() if resume else None
+        files = iter_media_files(root, media_directories(), after=after)
+        cutoff = time.time() - self.grace_seconds
+        while True:
+            batch = list(islice(files, self.batch_size))
+            if not batch:
+                break
+            self.stats["scanned"] += len(batch)
+            referenced = referenced_names([name for name, _ in batch])
+            removed = []
+            for name, entry in batch:
+                if name in referenced:
+                    continue
+                stat = entry.stat(follow_symlinks=False)
+                if stat.st_mtime > cutoff:
+                    continue
+                self.stats["orphans"] += 1
+                self.stats["bytes"] += stat.st_size
+                if not self.dry_run:
+                    self._remove(root, name)
+                    removed.append(name)
+            if removed:
+                MediaBlob.objects.filter(name__in=removed, refcount=0).delete()
+            self.write_checkpoint(batch[-1][0])
+        if self.checkpoint and not self.dry_run and os.path.exists(self.checkpoint):
+            os.remove(self.checkpoint)
+        return self.stats
+
+    def _remove(self, root, name):
+        if self.rate:
+            wait = self._last_removal + 1.0 / self.rate - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            self._last_removal = time.monotonic()
+        if self.quarantine:
+            target = os.path.join(self.quarantine, name)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.move(os.path.join(root, name), target)
+        else:
+            self.storage.delete(name)
+        self.stats["removed"] += 1
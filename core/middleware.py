@@ -0,0 +1,292 @@
+"""
+Module docstring: This module contains middleware for the core application.
+"""
+
+import cProfile
+import os
+import pstats
+import re
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+from django.http import JsonResponse
+from django.urls import Resolver404, resolve
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import idempotency
+from .db_router import replica_reads
+from .models import UserProfile
+from .querylog import SlowQueryWrapper, should_sample
+
+PIN_COOKIE_NAME = "primary_pin"
+
+
+def _bearer_user_id(request):
+    """
+    Return the user id claim of a valid bearer token, if any.
+    """
+    header = request.META.get(settings.SIMPLE_JWT["AUTH_HEADER_NAME"], "")
+    parts = header.split()
+    if len(parts) != 2 or parts[0] not in settings.SIMPLE_JWT["AUTH_HEADER_TYPES"]:
+        return None
+    try:
+        token = AccessToken(parts[1])
+    except TokenError:
+        return None
+    return token.get(settings.SIMPLE_JWT["USER_ID_CLAIM"])
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Serve safe-method requests from read replicas with read-your-writes.
+
+    After a successful write the client is pinned to the primary for
+    ``REPLICA_PIN_SECONDS``: through a cookie, and through the cache keyed by
+    the user id claim of its bearer token for clients that drop cookies.
+    The next request may reach another worker process, so the cache must be
+    shared (CACHE_BACKEND); a process-local one is refused at startup.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = bool(getattr(settings, "DATABASE_REPLICAS", {}))
+        self.pin_seconds = getattr(settings, "REPLICA_PIN_SECONDS", 5)
+        if (
+            self.enabled
+            and self.pin_seconds
+            and isinstance(caches["default"], (LocMemCache, DummyCache))
+        ):
+            raise ImproperlyConfigured(
+                "Read replicas need a cache shared by all workers for the primary "
+                "pins of bearer-token clients; set CACHE_BACKEND and CACHE_LOCATION."
+            )
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+        if request.method in SAFE_METHODS:
+            if self._is_pinned(request):
+                return self.get_response(request)
+            with replica_reads():
+                return self.get_response(request)
+
+        response = self.get_response(request)
+        if response.status_code < 400 and self.pin_seconds:
+            self._pin(request, response)
+        return response
+
+    def _is_pinned(self, request):
+        try:
+            if float(request.COOKIES.get(PIN_COOKIE_NAME, 0)) > time.time():
+                return True
+        except ValueError:
+            pass
+        if not request.META.get(settings.SIMPLE_JWT["AUTH_HEADER_NAME"]):
+            return False
+        user_id = _bearer_user_id(request)
+        return user_id is not None and cache.get(f"{PIN_COOKIE_NAME}:{user_id}") is not None
+
+    def _pin(self, request, response):
+        response.set_cookie(
+            PIN_COOKIE_NAME,
+            str(time.time() + self.pin_seconds),
+            max_age=self.pin_seconds,
+            httponly=True,
+            samesite="Lax",
+        )
+        user_id = _bearer_user_id(request)
+        if user_id is not None:
+            cache.set(f"{PIN_COOKIE_NAME}:{user_id}", True, self.pin_seconds)
+
+
+PROFILE_HEADER = "HTTP_X_PROFILE"
+PROFILE_PARAM = "_profile"
+
+
+class QueryRecorder:
+    """
+    ``execute_wrapper`` that records each SQL statement and its duration.
+    """
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append(
+                {
+                    "database": context["connection"].alias,
+                    "sql": sql,
+                    "ms": round((time.perf_counter() - start) * 1000, 3),
+                }
+            )
+
+
+class RequestProfilerMiddleware:
+    """
+    Profile a single request on demand, for admins only.
+
+    Sending ``X-Profile: summary`` (or ``?_profile=summary``) with an admin
+    bearer token replaces the response with a JSON summary of the slowest
+    functions (cProfile) and every SQL statement with its time.
+    ``X-Profile: file`` returns the normal response and writes the full
+    profile to REQUEST_PROFILE_DIR, named in the ``X-Profile-File`` header.
+    Requests without the flag only pay for one header and one query
+    parameter lookup.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = request.META.get(PROFILE_HEADER) or request.GET.get(PROFILE_PARAM)
+        if not mode or not self._is_admin(request):
+            return self.get_response(request)
+        mode = "file" if mode == "file" else "summary"
+
+        recorder = QueryRecorder()
+        profiler = cProfile.Profile()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            start = time.perf_counter()
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+            duration = time.perf_counter() - start
+
+        if mode == "file":
+            response["X-Profile-File"] = self._save(request, profiler)
+            return response
+        return JsonResponse(self._summary(request, response, profiler, recorder, duration))
+
+    def _is_admin(self, request):
+        user_id = _bearer_user_id(request)
+        if user_id is None:
+            return False
+        return UserProfile.objects.filter(
+            pk=user_id, is_active=True, is_admin=True, is_staff=True
+        ).exists()
+
+    def _save(self, request, profiler):
+        directory = settings.REQUEST_PROFILE_DIR
+        os.makedirs(directory, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9]+", "-", request.path).strip("-") or "root"
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{request.method}-{slug}-{os.getpid()}.prof"
+        profiler.dump_stats(os.path.join(directory, name))
+        return name
+
+    def _summary(self, request, response, profiler, recorder, duration):
+        stats = pstats.Stats(profiler)
+        functions = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)
+        return {
+            "method": request.method,
+            "path": request.get_full_path(),
+            "status": response.status_code,
+            "ms": round(duration * 1000, 3),
+            "sql": {
+                "count": len(recorder.queries),
+                "ms": round(sum(query["ms"] for query in recorder.queries), 3),
+                "queries": recorder.queries,
+            },
+            "functions": [
+                {
+                    "function": f"{os.path.basename(filename)}:{line}({name})",
+                    "calls": calls,
+                    "self_ms": round(self_time * 1000, 3),
+                    "cumulative_ms": round(cumulative * 1000, 3),
+                }
+                for (filename, line, name), (_, calls, self_time, cumulative, _) in functions[
+                    : settings.REQUEST_PROFILE_TOP_FUNCTIONS
+                ]
+            ],
+        }
+
+
+class SlowQueryMiddleware:
+    """
+    Time the SQL of every request for the slow query log.
+
+    See core.querylog; only a sample of requests feeds the per-shape
+    statistics.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        wrapper = SlowQueryWrapper(request, sampled=should_sample())
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(wrapper))
+            return self.get_response(request)
+
+
+class IdempotencyMiddleware:
+    """
+    Replay the stored response to a POST retried with the same ``Idempotency-Key``.
+
+    Applies to the views named in IDEMPOTENCY_URL_NAMES; see
+    core.idempotency. Keys are scoped by the user id claim of the bearer
+    token, so clients cannot read each other's responses. Anonymous keys
+    share a scope, and the body in the fingerprint (file contents included
+    for multipart) keeps their responses from being read by anyone who does
+    not already know the request.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        client_key = request.headers.get("Idempotency-Key")
+        if request.method != "POST" or client_key is None or not self._applies(request):
+            return self.get_response(request)
+        if not client_key or len(client_key) > settings.IDEMPOTENCY_MAX_KEY_LENGTH:
+            return JsonResponse(
+                {
+                    "detail": "Idempotency-Key must be 1 to "
+                    f"{settings.IDEMPOTENCY_MAX_KEY_LENGTH} characters."
+                },
+                status=400,
+            )
+
+        user_id = _bearer_user_id(request)
+        scope = "anonymous" if user_id is None else f"user:{user_id}"
+        key = idempotency.record_key(scope, client_key)
+        try:
+            stored = idempotency.claim(key, idempotency.fingerprint(request))
+        except idempotency.IdempotencyError as error:
+            return JsonResponse({"detail": error.detail}, status=error.status_code)
+        if stored is not None:
+            return stored
+
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            idempotency.release(key)
+            raise
+        if 200 <= response.status_code < 300 and not response.streaming:
+            idempotency.store(key, response)
+        else:
+            idempotency.release(key)
+        return response
+
+    def _applies(self, request):
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return False
+        return match.url_name in settings.IDEMPOTENCY_URL_NAMES
@@ -0,0 +1,28 @@
+# Generated by Django 3.2.25 on 2026-10-19 19:18
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_background_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedMedia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('media_type', models.CharField(choices=[('photo', 'Photo'), ('video', 'Video')], max_length=10)),
+                ('object_id', models.UUIDField()),
+                ('related', models.JSONField(default=list)),
+                ('computed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='relatedmedia',
+            constraint=models.UniqueConstraint(fields=('media_type', 'object_id'), name='unique_related_media'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 3.2.25 on 2026-10-19 19:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_related_media'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TagCooccurrence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.IntegerField(default=0)),
+                ('other', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.tag')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.tag')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='tagcooccurrence',
+            index=models.Index(fields=['tag', '-count'], name='tag_cooccurrence_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='tagcooccurrence',
+            constraint=models.UniqueConstraint(fields=('tag', 'other'), name='unique_tag_pair'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 3.2.25 on 2026-10-19 19:33
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def log_existing_rows(apps, schema_editor):
+    # Existing rows are logged once so a first sync from cursor 0 sees them.
+    ChangeLog = apps.get_model("core", "ChangeLog")
+    for name in ("tag", "photo", "video"):
+        model = apps.get_model("core", name)
+        ids = model.objects.values_list("pk", flat=True).iterator()
+        batch = []
+        for pk in ids:
+            batch.append(ChangeLog(model=name, object_id=str(pk), action="upsert"))
+            if len(batch) >= 1000:
+                ChangeLog.objects.bulk_create(batch)
+                batch = []
+        ChangeLog.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_photo_phash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLog',
+            fields=[
+                ('seq', models.BigAutoField(primary_key=True, serialize=False)),
+                ('model', models.CharField(max_length=20)),
+                ('object_id', models.CharField(max_length=36)),
+                ('action', models.CharField(choices=[('upsert', 'Created or updated'), ('delete', 'Deleted')], max_length=6)),
+                ('changed_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddIndex(
+            model_name='changelog',
+            index=models.Index(fields=['model', 'object_id', 'seq'], name='changelog_object_idx'),
+        ),
+        migrations.RunPython(log_existing_rows, migrations.RunPython.noop),
+    ]
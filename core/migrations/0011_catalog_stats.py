@@ -0,0 +1,102 @@
+# Generated by Django 3.2.25 on 2026-10-19 19:43
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def build_stats(apps, schema_editor):
+    # Existing rows have no recorded upload time; they count under the day
+    # this migration ran. Same aggregation as core.stats.rebuild_stats,
+    # written out so later changes to that module do not affect this
+    # migration.
+    MediaDailyStat = apps.get_model('core', 'MediaDailyStat')
+    TagStat = apps.get_model('core', 'TagStat')
+    daily_rows = []
+    tag_counts = {}
+    for model_name, media_type in (('Photo', 'photo'), ('Video', 'video')):
+        model = apps.get_model('core', model_name)
+        rows = (
+            model.objects.annotate(
+                day=TruncDate('created_at', tzinfo=django.utils.timezone.get_default_timezone())
+            )
+            .values('day')
+            .annotate(count=Count('pk'), bytes=Sum('file_size'))
+            .order_by()
+        )
+        daily_rows += [
+            MediaDailyStat(
+                media_type=media_type, day=row['day'], count=row['count'], bytes=row['bytes'] or 0
+            )
+            for row in rows
+        ]
+        through = model._meta.get_field('tags').remote_field.through
+        for row in through.objects.values('tag_id').annotate(count=Count('pk')).order_by():
+            tag_counts.setdefault(row['tag_id'], {'photo': 0, 'video': 0})[media_type] = row['count']
+    MediaDailyStat.objects.bulk_create(daily_rows, batch_size=500)
+    TagStat.objects.bulk_create(
+        [
+            TagStat(
+                tag_id=tag_id,
+                photo_count=counts['photo'],
+                video_count=counts['video'],
+                total=counts['photo'] + counts['video'],
+            )
+            for tag_id, counts in tag_counts.items()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_sync_changelog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaDailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('media_type', models.CharField(max_length=5)),
+                ('day', models.DateField()),
+                ('count', models.IntegerField(default=0)),
+                ('bytes', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TagStat',
+            fields=[
+                ('tag', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='core.tag')),
+                ('photo_count', models.IntegerField(default=0)),
+                ('video_count', models.IntegerField(default=0)),
+                ('total', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='created_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='created_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='tagstat',
+            index=models.Index(fields=['-total'], name='tag_stat_total_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mediadailystat',
+            index=models.Index(fields=['day'], name='media_daily_stat_day_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='mediadailystat',
+            constraint=models.UniqueConstraint(fields=('media_type', 'day'), name='unique_media_day'),
+        ),
+        migrations.RunPython(build_stats, migrations.RunPython.noop),
+    ]
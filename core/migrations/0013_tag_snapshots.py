@@ -0,0 +1,30 @@
+# Generated by Django 3.2.25 on 2026-10-19 19:52
+
+from django.db import migrations, models
+
+
+def build_snapshots(apps, schema_editor):
+    from core.tag_snapshots import rebuild_snapshots
+
+    rebuild_snapshots(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_idempotency_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photo',
+            name='tag_snapshot',
+            field=models.JSONField(default=list, editable=False),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='tag_snapshot',
+            field=models.JSONField(default=list, editable=False),
+        ),
+        migrations.RunPython(build_snapshots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 3.2.25 on 2026-10-19 19:56
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+SEARCH_COLUMNS = ('email', 'username', 'first_name', 'last_name')
+
+
+def lower_indexes(apps):
+    model = apps.get_model('core', 'UserProfile')
+    return model, [
+        models.Index(django.db.models.functions.text.Lower(column), name=f'user_{column}_lower_idx')
+        for column in SEARCH_COLUMNS
+    ]
+
+
+def create_indexes(apps, schema_editor):
+    # One index per column and backend. On PostgreSQL the LOWER() b-tree is
+    # built with the pattern operator class, since prefix LIKE cannot use a
+    # default one unless the database uses the C collation, and substring
+    # LIKE gets a trigram index. Elsewhere the model's plain LOWER() index.
+    model, indexes = lower_indexes(apps)
+    if schema_editor.connection.vendor != 'postgresql':
+        for index in indexes:
+            schema_editor.add_index(model, index)
+        return
+    table = schema_editor.quote_name(model._meta.db_table)
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for column in SEARCH_COLUMNS:
+        schema_editor.execute(
+            f'CREATE INDEX user_{column}_lower_idx ON {table} '
+            f'((LOWER({schema_editor.quote_name(column)})::text) text_pattern_ops)'
+        )
+        schema_editor.execute(
+            f'CREATE INDEX user_{column}_trgm_idx ON {table} '
+            f'USING gin ((LOWER({schema_editor.quote_name(column)})::text) gin_trgm_ops)'
+        )
+
+
+def drop_indexes(apps, schema_editor):
+    model, indexes = lower_indexes(apps)
+    if schema_editor.connection.vendor != 'postgresql':
+        for index in indexes:
+            schema_editor.remove_index(model, index)
+        return
+    for column in SEARCH_COLUMNS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS user_{column}_lower_idx')
+        schema_editor.execute(f'DROP INDEX IF EXISTS user_{column}_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_tag_snapshots'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='userprofile',
+                    index=models.Index(django.db.models.functions.text.Lower('email'), name='user_email_lower_idx'),
+                ),
+                migrations.AddIndex(
+                    model_name='userprofile',
+                    index=models.Index(django.db.models.functions.text.Lower('username'), name='user_username_lower_idx'),
+                ),
+                migrations.AddIndex(
+                    model_name='userprofile',
+                    index=models.Index(django.db.models.functions.text.Lower('first_name'), name='user_first_name_lower_idx'),
+                ),
+                migrations.AddIndex(
+                    model_name='userprofile',
+                    index=models.Index(django.db.models.functions.text.Lower('last_name'), name='user_last_name_lower_idx'),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(create_indexes, drop_indexes),
+            ],
+        ),
+    ]
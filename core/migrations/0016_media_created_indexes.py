@@ -0,0 +1,21 @@
+# Generated by Django 3.2.25 on 2026-10-19 20:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_job_result'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='photo',
+            index=models.Index(fields=['-created_at', 'id'], name='photo_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='video',
+            index=models.Index(fields=['-created_at', 'id'], name='video_created_idx'),
+        ),
+    ]
@@ -8,8 +8,13 @@ structures.
 """
 import uuid
 from django.db import models
+from django.db.models.functions import Lower
+from django.utils import timezone
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager
 
+from .media import phash_bands, read_image_metadata, read_video_metadata
+from .storage import media_storage
+
 
 # Custom manager for the UserProfile model
 class AccountManager(BaseUserManager):
@@ -17,7 +22,7 @@ class AccountManager(BaseUserManager):
     creating a user extending from baseUserMode which is django inbuild
     """
 
-    def create_user(self, email, username, password=None):
+    def create_user(self, email, username, password=None, **extra_fields):
         """
         # Check if email is provided
         """
@@ -31,6 +36,7 @@ class AccountManager(BaseUserManager):
         user = self.model(
             email=self.normalize_email(email),
             username=username,
+            **extra_fields,
         )
 
         # Set the user's password
@@ -80,6 +86,16 @@ class UserProfile(AbstractBaseUser):
 
     objects = AccountManager()  # Custom manager for the UserProfile model
 
+    class Meta:
+        # Case-insensitive lookups of the admin user search (core.user_search).
+        # Migration 0014 builds them with text_pattern_ops on PostgreSQL.
+        indexes = [
+            models.Index(Lower("email"), name="user_email_lower_idx"),
+            models.Index(Lower("username"), name="user_username_lower_idx"),
+            models.Index(Lower("first_name"), name="user_first_name_lower_idx"),
+            models.Index(Lower("last_name"), name="user_last_name_lower_idx"),
+        ]
+
     # Check if the user has a specific permission
     def has_perm(self):
         """
@@ -136,10 +152,17 @@ class Tag(models.Model):
 
     name = models.CharField(max_length=50, unique=True)
     description = models.TextField(null=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
-    def save(self, *args, **kwargs):
+    def apply_defaults(self):
+        """
+        Fill in derived field values; also used by bulk writes that skip save().
+        """
         if not self.description:
             self.description = self.name
+
+    def save(self, *args, **kwargs):
+        self.apply_defaults()
         super(Tag, self).save(*args, **kwargs)
 
     def __str__(self) -> str:
@@ -147,6 +170,18 @@ class Tag(models.Model):
 
 
 
+# Processing state of uploaded media files
+
+PROCESSING_PENDING = "pending"
+PROCESSING_READY = "ready"
+PROCESSING_FAILED = "failed"
+PROCESSING_STATUS_CHOICES = [
+    (PROCESSING_PENDING, "Pending"),
+    (PROCESSING_READY, "Ready"),
+    (PROCESSING_FAILED, "Failed"),
+]
+
+
 # Model for Photos
 
 
@@ -182,15 +217,88 @@ class Photo(models.Model):
         description (str): A description of the photo.
         image (ImageField): The image file for the photo.
         tags (ManyToManyField): Tags associated with the photo.
+        width, height, file_size, mime_type, orientation, taken_at, placeholder:
+            Metadata read from the image when it is uploaded.
+        phash: Hex perceptual (difference) hash of the image, set by the
+            "photo.process" job.
+        created_at (datetime): When the photo was added to the catalog.
+        tag_snapshot (list): Copy of the tags' ids and names, kept by
+            core.tag_snapshots for rendering without a join.
     """
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     title = models.CharField(max_length=100)
     description = models.TextField(blank=True)
-    image = models.ImageField(upload_to="photos/", null=True, blank=True)
+    image = models.ImageField(
+        upload_to="photos/", storage=media_storage, null=True, blank=True
+    )
     tags = models.ManyToManyField(Tag, related_name="photos")
+    tag_snapshot = models.JSONField(default=list, editable=False)
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    file_size = models.PositiveBigIntegerField(null=True, blank=True)
+    mime_type = models.CharField(max_length=100, blank=True, db_index=True)
+    orientation = models.PositiveSmallIntegerField(null=True, blank=True)
+    taken_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    placeholder = models.CharField(max_length=100, blank=True)
+    phash = models.CharField(max_length=16, blank=True)
+    # 16-bit slices of phash, indexed for near-duplicate lookups (core.duplicates).
+    phash_band0 = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+    phash_band1 = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+    phash_band2 = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+    phash_band3 = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+    processing_status = models.CharField(
+        max_length=10, choices=PROCESSING_STATUS_CHOICES, default=PROCESSING_READY
+    )
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     objects = PhotoManager()
 
+    class Meta:
+        # Serves the newest-first list (ORDER BY created_at DESC, id).
+        indexes = [models.Index(fields=["-created_at", "id"], name="photo_created_idx")]
+
+    PHASH_BAND_FIELDS = ("phash_band0", "phash_band1", "phash_band2", "phash_band3")
+
+    METADATA_FIELDS = (
+        "width",
+        "height",
+        "file_size",
+        "mime_type",
+        "orientation",
+        "taken_at",
+        "placeholder",
+        "phash",
+    ) + PHASH_BAND_FIELDS
+
+    def save(self, *args, **kwargs):
+        # Read header metadata only when a new file is uploaded; anything
+        # that needs the pixels runs later in the "photo.process" job.
+        uploaded = bool(self.image) and not self.image._committed
+        if not self.image:
+            for field in self.METADATA_FIELDS:
+                setattr(self, field, self._meta.get_field(field).get_default())
+            self.processing_status = PROCESSING_READY
+        elif uploaded:
+            metadata = read_image_metadata(self.image, placeholder=False)
+            for field, value in metadata.items():
+                setattr(self, field, value)
+            self.placeholder = ""
+            self.set_phash(None)
+            self.processing_status = PROCESSING_PENDING
+        super().save(*args, **kwargs)
+        if uploaded:
+            Job.objects.enqueue("photo.process", photo_id=str(self.pk))
+
+    def set_phash(self, value):
+        """
+        Store a 64-bit perceptual hash (or None) and its index bands.
+        """
+        self.phash = "" if value is None else f"{value:016x}"
+        bands = [None] * len(self.PHASH_BAND_FIELDS) if value is None else phash_bands(value)
+        for field, band in zip(self.PHASH_BAND_FIELDS, bands):
+            setattr(self, field, band)
+
     def __str__(self):
         return f"{self.title}"
 
@@ -230,14 +338,335 @@ class Video(models.Model):
         description (str): A description of the video.
         video_file (FileField): The video file for the video.
         tags (ManyToManyField): Tags associated with the video.
+        file_size, mime_type: Metadata read from the file when it is uploaded.
+        created_at (datetime): When the video was added to the catalog.
+        tag_snapshot (list): Copy of the tags' ids and names, kept by
+            core.tag_snapshots for rendering without a join.
     """
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     title = models.CharField(max_length=100)
     description = models.TextField(blank=True)
-    video_file = models.FileField(upload_to="videos/", null=True, blank=True)
+    video_file = models.FileField(
+        upload_to="videos/", storage=media_storage, null=True, blank=True
+    )
     tags = models.ManyToManyField(Tag, related_name="videos")
+    tag_snapshot = models.JSONField(default=list, editable=False)
+    file_size = models.PositiveBigIntegerField(null=True, blank=True)
+    mime_type = models.CharField(max_length=100, blank=True, db_index=True)
+    processing_status = models.CharField(
+        max_length=10, choices=PROCESSING_STATUS_CHOICES, default=PROCESSING_READY
+    )
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     objects = VideoManager()
 
+    class Meta:
+        # Serves the newest-first list (ORDER BY created_at DESC, id).
+        indexes = [models.Index(fields=["-created_at", "id"], name="video_created_idx")]
+
+    def save(self, *args, **kwargs):
+        # Read header metadata only when a new file is uploaded; further
+        # processing runs later in the "video.process" job.
+        uploaded = bool(self.video_file) and not self.video_file._committed
+        if not self.video_file:
+            self.file_size = None
+            self.mime_type = ""
+            self.processing_status = PROCESSING_READY
+        elif uploaded:
+            for field, value in read_video_metadata(self.video_file).items():
+                setattr(self, field, value)
+            self.processing_status = PROCESSING_PENDING
+        super().save(*args, **kwargs)
+        if uploaded:
+            Job.objects.enqueue("video.process", video_id=str(self.pk))
+
     def __str__(self):
         return f"{self.title}"
+
+
+# Model for stored media files
+
+
+class MediaBlob(models.Model):
+    """
+    Model tracking how many rows reference a stored media file.
+
+    Files in ``media_storage`` are content addressed, so identical uploads
+    share one file. A blob whose refcount drops to zero is left on disk for
+    the media garbage collector.
+
+    Attributes:
+        name (str): The storage name of the file.
+        refcount (int): The number of Photo/Video rows referencing the file.
+        updated_at (datetime): When the refcount last changed.
+    """
+
+    name = models.CharField(max_length=255, unique=True)
+    refcount = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.refcount})"
+
+
+# Model for background jobs
+
+
+class JobManager(models.Manager):
+    """
+    Custom manager for the Job model.
+
+    Example:
+    To queue work for a registered handler, you can use:
+    ```
+    Job.objects.enqueue('photo.process', photo_id=str(photo.pk))
+    ```
+    """
+
+    def enqueue(self, kind, **payload):
+        """
+        Queue a job for the handler registered under ``kind``.
+        """
+        return self.create(kind=kind, payload=payload)
+
+
+class Job(models.Model):
+    """
+    Model representing a unit of background work.
+
+    Jobs are claimed by ``run_workers`` processes (see core.jobs) and retried
+    with exponential backoff until ``max_attempts`` is reached.
+
+    Attributes:
+        kind (str): The registered handler name.
+        payload (dict): Keyword arguments for the handler.
+        status (str): queued, running, done or failed.
+        attempts (int): How many times the job has been claimed.
+        run_after (datetime): The job is not claimed before this time.
+        locked_by (str): The worker currently running the job.
+        locked_at (datetime): When the job was claimed.
+        last_error (str): The error from the last failed attempt.
+        result (dict): What the handler returned, once the job is done.
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+
+    kind = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    result = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    objects = JobManager()
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "run_after"])]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+
+# Model for related media recommendations
+
+
+class RelatedMedia(models.Model):
+    """
+    Model caching the most similar items (by tags) for a photo or video.
+
+    Rows are written by core.related: all at once by the rebuild_related
+    command and one at a time when an item's tags change.
+
+    Attributes:
+        media_type (str): "photo" or "video".
+        object_id (UUID): The id of the photo or video.
+        related (list): [id, score] pairs, best first.
+        computed_at (datetime): When the list was computed.
+    """
+
+    MEDIA_TYPE_CHOICES = [("photo", "Photo"), ("video", "Video")]
+
+    media_type = models.CharField(max_length=10, choices=MEDIA_TYPE_CHOICES)
+    object_id = models.UUIDField()
+    related = models.JSONField(default=list)
+    computed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["media_type", "object_id"], name="unique_related_media"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.media_type} {self.object_id}"
+
+
+# Model for tag co-occurrence counts
+
+
+class TagCooccurrence(models.Model):
+    """
+    Model counting the photos and videos that carry two tags together.
+
+    Each pair is stored in both directions, so the tags related to a tag
+    are read with one lookup on the (tag, -count) index. Maintained by
+    core.cooccurrence.
+
+    Attributes:
+        tag (Tag): The tag being looked up.
+        other (Tag): A tag appearing together with it.
+        count (int): How many photos and videos have both tags.
+    """
+
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name="+")
+    other = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name="+")
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["tag", "other"], name="unique_tag_pair")
+        ]
+        indexes = [models.Index(fields=["tag", "-count"], name="tag_cooccurrence_idx")]
+
+    def __str__(self):
+        return f"{self.tag_id} + {self.other_id}: {self.count}"
+
+
+# Models for pre-aggregated catalog statistics
+
+
+class MediaDailyStat(models.Model):
+    """
+    Model counting the photos or videos added on one day, and their size.
+
+    Summing a handful of these rows replaces a scan of the media tables.
+    Maintained by core.stats.
+
+    Attributes:
+        media_type (str): "photo" or "video".
+        day (date): The day the media was added (in TIME_ZONE).
+        count (int): How many were added that day and still exist.
+        bytes (int): Their total file size.
+    """
+
+    media_type = models.CharField(max_length=5)
+    day = models.DateField()
+    count = models.IntegerField(default=0)
+    bytes = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["media_type", "day"], name="unique_media_day")
+        ]
+        indexes = [models.Index(fields=["day"], name="media_daily_stat_day_idx")]
+
+    def __str__(self):
+        return f"{self.media_type} {self.day}: {self.count}"
+
+
+class TagStat(models.Model):
+    """
+    Model counting the photos and videos carrying a tag.
+
+    Maintained by core.stats.
+
+    Attributes:
+        tag (Tag): The counted tag.
+        photo_count (int): Photos with the tag.
+        video_count (int): Videos with the tag.
+        total (int): Both together, indexed for the most used tags.
+    """
+
+    tag = models.OneToOneField(
+        Tag, on_delete=models.CASCADE, primary_key=True, related_name="+"
+    )
+    photo_count = models.IntegerField(default=0)
+    video_count = models.IntegerField(default=0)
+    total = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [models.Index(fields=["-total"], name="tag_stat_total_idx")]
+
+    def __str__(self):
+        return f"{self.tag_id}: {self.total}"
+
+
+class ChangeLog(models.Model):
+    """
+    Model recording every change to a tag, photo or video, in order.
+
+    ``seq`` only grows, so a client that has seen every entry up to a
+    sequence number asks for the ones after it (core.sync). Deletes are
+    kept as tombstones. Written by the signal handlers in core.signals.
+
+    Attributes:
+        seq (int): Position of the change in the log.
+        model (str): "tag", "photo" or "video".
+        object_id (str): Primary key of the changed row.
+        action (str): "upsert" or "delete".
+        changed_at (datetime): When the change was recorded.
+    """
+
+    UPSERT = "upsert"
+    DELETE = "delete"
+    ACTION_CHOICES = [(UPSERT, "Created or updated"), (DELETE, "Deleted")]
+
+    seq = models.BigAutoField(primary_key=True)
+    model = models.CharField(max_length=20)
+    object_id = models.CharField(max_length=36)
+    action = models.CharField(max_length=6, choices=ACTION_CHOICES)
+    changed_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["model", "object_id", "seq"], name="changelog_object_idx")
+        ]
+
+    def __str__(self):
+        return f"{self.seq}: {self.action} {self.model} {self.object_id}"
+
+
+# Model for idempotent POST replays
+
+
+class IdempotencyKey(models.Model):
+    """
+    Model storing the response to a POST sent with an ``Idempotency-Key``.
+
+    A row is inserted, without a response, when the first request with a
+    key starts; its unique primary key is the lock concurrent duplicates
+    wait on. The response is filled in once the request succeeds.
+    Maintained by core.idempotency.
+
+    Attributes:
+        key (str): SHA-256 of the client's key and who sent it.
+        fingerprint (str): SHA-256 of the request the key was first used for.
+        status_code (int): Stored response status, null while in progress.
+        content_type (str): Stored response content type.
+        body (bytes): Stored response body, zlib-compressed.
+        expires_at (datetime): When the row may be pruned.
+    """
+
+    key = models.CharField(max_length=64, primary_key=True)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True)
+    content_type = models.CharField(max_length=100, blank=True)
+    body = models.BinaryField(default=b"")
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.key[:12]}: {self.status_code or 'in progress'}"
@@ -0,0 +1,224 @@
+"""
+Module docstring: This module contains the pagination used by the large list endpoints.
+
+Counting every row of a big table on each page load costs a full scan, so
+``ApproximateCountPagination`` lets the client choose how the total is
+reported with ``?count=``:
+
+- ``estimate`` (default): the planner's row estimate on PostgreSQL and
+  MySQL. Small tables (estimate under the exact-count cap) get an exact
+  count. Other databases, and filtered lists, get a count capped like
+  ``exact`` and cached for LIST_COUNT_CACHE_SECONDS, so a cache miss costs
+  at most LIST_EXACT_COUNT_CAP rows.
+- ``exact``: ``COUNT(*)`` over at most LIST_EXACT_COUNT_CAP rows; above that
+  the cap is reported with ``count_type`` ``"at_least"``.
+- ``none``: no count; ``next`` is found by reading one extra row.
+
+``KeysetPagination`` serves lists too large for offsets: each page starts
+after the last value of a unique column (``?cursor=``), so deep pages cost
+the same as the first and no count is taken.
+"""
+
+import base64
+import binascii
+import hashlib
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+COUNT_MODES = ("estimate", "exact", "none")
+
+
+def capped_count(queryset, cap):
+    """
+    Return ``(count, exact)`` counting at most ``cap + 1`` rows.
+    """
+    count = queryset.order_by()[: cap + 1].count()
+    if count > cap:
+        return cap, False
+    return count, True
+
+
+def planner_estimate(queryset):
+    """
+    Return the database's row estimate for an unfiltered queryset, or None.
+    """
+    if queryset.query.where or queryset.query.distinct:
+        return None
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    if connection.vendor == "postgresql":
+        sql = "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass"
+        params = [connection.ops.quote_name(table)]
+    elif connection.vendor == "mysql":
+        sql = (
+            "SELECT table_rows FROM information_schema.tables "
+            "WHERE table_schema = DATABASE() AND table_name = %s"
+        )
+        params = [table]
+    else:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+    # reltuples is -1 for a table that has never been analyzed.
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+def cached_count(queryset, cap, timeout):
+    """
+    Return ``capped_count(queryset, cap)``, cached by its SQL for ``timeout`` seconds.
+    """
+    sql, params = queryset.order_by().query.sql_with_params()
+    digest = hashlib.sha1(f"{queryset.db}:{cap}:{sql}:{params!r}".encode()).hexdigest()
+    key = f"list_count:{digest}"
+    result = cache.get(key)
+    if result is None:
+        result = capped_count(queryset, cap)
+        cache.set(key, result, timeout)
+    return tuple(result)
+
+
+class ApproximateCountPagination(BasePagination):
+    """
+    Page-number pagination whose total count can be estimated or skipped.
+    """
+
+    page_query_param = "page"
+    page_size_query_param = "page_size"
+    count_query_param = "count"
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return settings.LIST_PAGE_SIZE
+        return min(max(size, 1), settings.LIST_MAX_PAGE_SIZE)
+
+    def get_count_mode(self, request):
+        mode = request.query_params.get(self.count_query_param, settings.LIST_COUNT_MODE)
+        return mode if mode in COUNT_MODES else settings.LIST_COUNT_MODE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        try:
+            self.page_number = int(request.query_params.get(self.page_query_param, 1))
+        except ValueError as exc:
+            raise NotFound("Invalid page.") from exc
+        if self.page_number < 1:
+            raise NotFound("Invalid page.")
+        offset = (self.page_number - 1) * self.page_size
+        rows = list(queryset[offset:offset + self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.count, self.count_type = self.get_count(queryset, self.get_count_mode(request))
+        return rows[: self.page_size]
+
+    def get_count(self, queryset, mode):
+        """
+        Return ``(count, count_type)`` for the requested count mode.
+        """
+        cap = settings.LIST_EXACT_COUNT_CAP
+        if mode == "none":
+            return None, None
+        if mode == "estimate":
+            estimate = planner_estimate(queryset)
+            if estimate is None:
+                count, exact = cached_count(queryset, cap, settings.LIST_COUNT_CACHE_SECONDS)
+                return count, "estimate" if exact else "at_least"
+            if estimate > cap:
+                return estimate, "estimate"
+        count, exact = capped_count(queryset, cap)
+        return count, "exact" if exact else "at_least"
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.page_query_param, self.page_number + 1)
+
+    def get_previous_link(self):
+        if self.page_number <= 1:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.page_number == 2:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, self.page_number - 1)
+
+    def get_paginated_response(self, data):
+        body = OrderedDict()
+        if self.count_type is not None:
+            body["count"] = self.count
+            body["count_type"] = self.count_type
+        body["next"] = self.get_next_link()
+        body["previous"] = self.get_previous_link()
+        body["results"] = data
+        return Response(body)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on a unique column, ``ordering``.
+
+    The cursor is the last value of the previous page, encoded; a page is
+    ``WHERE ordering > cursor ORDER BY ordering LIMIT page_size + 1``.
+    """
+
+    ordering = "pk"
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+
+    def __init__(self, ordering=None):
+        if ordering is not None:
+            self.ordering = ordering
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return settings.LIST_PAGE_SIZE
+        return min(max(size, 1), settings.LIST_MAX_PAGE_SIZE)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            return base64.b64decode(encoded, altchars=b"-_", validate=True).decode("utf-8")
+        except (UnicodeError, binascii.Error, ValueError) as exc:
+            raise NotFound("Invalid cursor.") from exc
+
+    def encode_cursor(self, value):
+        return base64.urlsafe_b64encode(str(value).encode("utf-8")).decode("ascii")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        if cursor is not None:
+            queryset = queryset.filter(**{f"{self.ordering}__gt": cursor})
+        rows = list(queryset.order_by(self.ordering)[: page_size + 1])
+        self.next_value = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            self.next_value = getattr(rows[-1], self.ordering)
+        return rows
+
+    def get_next_link(self):
+        if self.next_value is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.next_value)
+        )
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([("next", self.get_next_link()), ("results", data)]))
@@ -0,0 +1,158 @@
+"""
+Module docstring: This module contains the slow query log and per-shape SQL statistics.
+
+Every statement is timed by a database execute wrapper, and statements
+slower than SLOW_QUERY_THRESHOLD_MS are logged to ``core.querylog`` with
+the view that ran them. During a sampled request (SLOW_QUERY_SAMPLE_RATE)
+each statement is also normalized into a shape, with literals and IN
+lists collapsed, and count, total and maximum time are aggregated per
+shape. Statistics are kept per process, so each worker reports its own.
+"""
+
+import logging
+import os
+import random
+import re
+import threading
+import time
+from functools import lru_cache
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+NORMALIZE_PATTERNS = (
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),
+    (re.compile(r"%s"), "?"),
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)"), "(...)"),
+    (re.compile(r"\s+"), " "),
+)
+
+MAX_VIEWS_PER_SHAPE = 5
+
+
+@lru_cache(maxsize=1024)
+def normalize_sql(sql):
+    """
+    Return the shape of a statement: literals and placeholders become ``?``
+    and value lists ``(...)``, so queries differing only in values match.
+    """
+    for pattern, replacement in NORMALIZE_PATTERNS:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+class QueryStats:
+    """
+    Thread-safe count, total and maximum time per SQL shape.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._shapes = {}
+            self.dropped = 0
+            self.since = time.time()
+
+    def record(self, sql, seconds, view=None):
+        shape = normalize_sql(sql)
+        with self._lock:
+            entry = self._shapes.get(shape)
+            if entry is None:
+                if len(self._shapes) >= settings.SLOW_QUERY_MAX_SHAPES:
+                    self.dropped += 1
+                    return
+                entry = self._shapes[shape] = {
+                    "count": 0,
+                    "total": 0.0,
+                    "max": 0.0,
+                    "views": set(),
+                }
+            entry["count"] += 1
+            entry["total"] += seconds
+            entry["max"] = max(entry["max"], seconds)
+            if view and len(entry["views"]) < MAX_VIEWS_PER_SHAPE:
+                entry["views"].add(view)
+
+    def top(self, limit=20, order="total"):
+        """
+        Return the ``limit`` most expensive shapes, by ``total``, ``max`` or ``count``.
+        """
+        with self._lock:
+            items = [(shape, dict(entry)) for shape, entry in self._shapes.items()]
+        items.sort(key=lambda item: item[1][order], reverse=True)
+        return [
+            {
+                "shape": shape,
+                "count": entry["count"],
+                "total_ms": round(entry["total"] * 1000, 3),
+                "mean_ms": round(entry["total"] * 1000 / entry["count"], 3),
+                "max_ms": round(entry["max"] * 1000, 3),
+                "views": sorted(entry["views"]),
+            }
+            for shape, entry in items[:limit]
+        ]
+
+    def report(self, limit=20, order="total"):
+        return {
+            "pid": os.getpid(),
+            "since": self.since,
+            "sample_rate": settings.SLOW_QUERY_SAMPLE_RATE,
+            "dropped": self.dropped,
+            "shapes": self.top(limit, order),
+        }
+
+
+query_stats = QueryStats()
+
+
+def should_sample():
+    """
+    Return whether the current request's queries should be aggregated by shape.
+    """
+    rate = settings.SLOW_QUERY_SAMPLE_RATE
+    return rate >= 1 or (rate > 0 and random.random() < rate)
+
+
+class SlowQueryWrapper:
+    """
+    ``execute_wrapper`` timing the statements of one request.
+
+    Slow statements are always logged; ``sampled`` also records every
+    statement in ``stats``.
+    """
+
+    def __init__(self, request, stats=query_stats, sampled=True):
+        self.request = request
+        self.stats = stats
+        self.sampled = sampled
+        self.threshold = settings.SLOW_QUERY_THRESHOLD_MS / 1000
+
+    def view_name(self):
+        match = getattr(self.request, "resolver_match", None)
+        if match is not None:
+            return match.view_name
+        return self.request.path
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            seconds = time.perf_counter() - start
+            slow = seconds >= self.threshold
+            view = self.view_name() if self.sampled or slow else None
+            if self.sampled:
+                self.stats.record(sql, seconds, view)
+            if slow:
+                logger.warning(
+                    "Slow query (%.1fms) in %s on %s: %s",
+                    seconds * 1000,
+                    view,
+                    context["connection"].alias,
+                    sql,
+                )
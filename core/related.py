@@ -0,0 +1,214 @@
+"""
+Module docstring: This module contains the tag-similarity recommendations for photos and videos.
+
+Items are rows of a sparse item x tag matrix built from the tag through
+tables. Similarities (Jaccard or cosine) are computed for a batch of rows
+at once with one sparse matrix product, and the top-k results per item are
+stored in RelatedMedia so a detail page reads them with a single lookup.
+Lists are only computed by the ``related.refresh`` job and the
+``rebuild_related`` command; a read never computes one.
+"""
+
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from scipy import sparse
+
+from .models import Job, Photo, RelatedMedia, Video
+
+MEDIA_MODELS = {"photo": Photo, "video": Video}
+
+
+def _through(media_type):
+    model = MEDIA_MODELS[media_type]
+    return model.tags.through, f"{model._meta.model_name}_id"
+
+
+class TagMatrix:
+    """
+    Sparse binary item x tag matrix with the item ids for each row.
+    """
+
+    def __init__(self, pairs):
+        items, tags = {}, {}
+        rows, cols = [], []
+        for item_id, tag_id in pairs:
+            rows.append(items.setdefault(item_id, len(items)))
+            cols.append(tags.setdefault(tag_id, len(tags)))
+        self.item_ids = list(items)
+        self.item_index = items
+        self.tag_index = tags
+        self.matrix = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float32), (rows, cols)),
+            shape=(len(items), len(tags)),
+        )
+        self.matrix.sum_duplicates()
+        self.matrix.data[:] = 1
+        self.sizes = np.diff(self.matrix.indptr)
+
+    @classmethod
+    def load(cls, media_type, item_ids=None):
+        """
+        Build the matrix from the through table, optionally for some items.
+        """
+        through, column = _through(media_type)
+        pairs = through.objects.all()
+        if item_ids is not None:
+            pairs = pairs.filter(**{f"{column}__in": item_ids})
+        return cls(pairs.values_list(column, "tag_id").iterator())
+
+
+def similarity(query, matrix, query_sizes, matrix_sizes, metric="jaccard"):
+    """
+    Return a sparse (queries x items) matrix of tag similarities.
+
+    Only item pairs sharing at least one tag get an entry.
+    """
+    shared = (query @ matrix.T).tocsr()
+    rows = np.repeat(np.arange(shared.shape[0]), np.diff(shared.indptr))
+    cols = shared.indices
+    counts = shared.data
+    if metric == "cosine":
+        scores = counts / np.sqrt(query_sizes[rows] * matrix_sizes[cols])
+    else:
+        scores = counts / (query_sizes[rows] + matrix_sizes[cols] - counts)
+    return sparse.csr_matrix((scores, cols, shared.indptr), shape=shared.shape)
+
+
+def top_k(scores, item_ids, exclude, k):
+    """
+    Return the ``k`` best [item id, score] pairs from one sparse row.
+    """
+    cols, values = scores.indices, scores.data
+    keep = cols != exclude
+    cols, values = cols[keep], values[keep]
+    if len(values) > k:
+        best = np.argpartition(-values, k - 1)[:k]
+        cols, values = cols[best], values[best]
+    order = np.argsort(-values, kind="stable")
+    return [[str(item_ids[cols[i]]), round(float(values[i]), 6)] for i in order]
+
+
+def rebuild_related(media_type, batch_size=500, k=None, metric=None):
+    """
+    Recompute the related list of every item of ``media_type``.
+    """
+    k = k or settings.RELATED_MEDIA_TOP_K
+    metric = metric or settings.RELATED_MEDIA_METRIC
+    tag_matrix = TagMatrix.load(media_type)
+    matrix, sizes = tag_matrix.matrix, tag_matrix.sizes
+    now = timezone.now()
+    for start in range(0, len(tag_matrix.item_ids), batch_size):
+        stop = min(start + batch_size, len(tag_matrix.item_ids))
+        scores = similarity(matrix[start:stop], matrix, sizes[start:stop], sizes, metric)
+        ids = tag_matrix.item_ids[start:stop]
+        rows = [
+            RelatedMedia(
+                media_type=media_type,
+                object_id=item_id,
+                related=top_k(scores[offset], tag_matrix.item_ids, start + offset, k),
+                computed_at=now,
+            )
+            for offset, item_id in enumerate(ids)
+        ]
+        with transaction.atomic():
+            RelatedMedia.objects.filter(media_type=media_type, object_id__in=ids).delete()
+            RelatedMedia.objects.bulk_create(rows)
+    # Items without tags have no related items.
+    RelatedMedia.objects.filter(media_type=media_type).exclude(
+        computed_at=now
+    ).delete()
+    return len(tag_matrix.item_ids)
+
+
+def refresh_related(media_type, object_id, k=None, metric=None):
+    """
+    Recompute and store the related list of a single item.
+
+    Only the through rows of items sharing a tag with it are loaded, found
+    through the tag_id index, rather than the whole table; of each tag, the
+    RELATED_MEDIA_CANDIDATES_PER_TAG items tagged most recently.
+    """
+    k = k or settings.RELATED_MEDIA_TOP_K
+    metric = metric or settings.RELATED_MEDIA_METRIC
+    through, column = _through(media_type)
+    tag_ids = list(
+        through.objects.filter(**{column: object_id}).values_list("tag_id", flat=True)
+    )
+    related = []
+    if tag_ids:
+        pk = MEDIA_MODELS[media_type]._meta.pk.to_python(object_id)
+        candidates = {pk}
+        for tag_id in tag_ids:
+            candidates.update(
+                through.objects.filter(tag_id=tag_id)
+                .order_by("-pk")
+                .values_list(column, flat=True)[: settings.RELATED_MEDIA_CANDIDATES_PER_TAG]
+            )
+        tag_matrix = TagMatrix.load(media_type, item_ids=list(candidates))
+        row = tag_matrix.item_index[pk]
+        scores = similarity(
+            tag_matrix.matrix[row],
+            tag_matrix.matrix,
+            tag_matrix.sizes[row:row + 1],
+            tag_matrix.sizes,
+            metric,
+        )
+        related = top_k(scores[0], tag_matrix.item_ids, row, k)
+    entry, _ = RelatedMedia.objects.update_or_create(
+        media_type=media_type,
+        object_id=object_id,
+        defaults={"related": related, "computed_at": timezone.now()},
+    )
+    return entry
+
+
+def refresh_related_with_neighbours(media_type, object_id):
+    """
+    Recompute an item's related list after its tags changed.
+
+    Returns the ids of the items it listed before or after the change:
+    their similarity to it changed too, so their own lists are stale.
+    """
+    previous = (
+        RelatedMedia.objects.filter(media_type=media_type, object_id=object_id)
+        .values_list("related", flat=True)
+        .first()
+    ) or []
+    entry = refresh_related(media_type, object_id)
+    return list(dict.fromkeys(item_id for item_id, _ in previous + entry.related))
+
+
+def get_related(media_type, object_id):
+    """
+    Return the stored related list, queueing a refresh when missing or stale.
+
+    A missing list reads as empty until the job has run.
+    """
+    max_age = timedelta(seconds=settings.RELATED_MEDIA_MAX_AGE)
+    entry = RelatedMedia.objects.filter(
+        media_type=media_type, object_id=object_id
+    ).first()
+    if entry is None or entry.computed_at < timezone.now() - max_age:
+        queue_refresh(media_type, object_id)
+    return entry.related if entry is not None else []
+
+
+def queue_refresh(media_type, object_id):
+    """
+    Queue a ``related.refresh`` of one item unless one is already waiting.
+    """
+    object_id = str(object_id)
+    waiting = Job.objects.filter(
+        kind="related.refresh",
+        status=Job.QUEUED,
+        payload__media_type=media_type,
+        payload__object_id=object_id,
+    )
+    if not waiting.exists():
+        Job.objects.enqueue(
+            "related.refresh", media_type=media_type, object_id=object_id, neighbours=False
+        )
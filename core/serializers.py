@@ -2,8 +2,11 @@
 Module docstring: This module contains serializers for user profiles and related models.
 """
 
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
 from rest_framework import serializers
 from django.contrib.auth import authenticate, get_user_model
+from .image_validation import validate_image
 from .models import UserProfile, Tag, Photo, Video
 
 User = get_user_model()
@@ -59,16 +62,17 @@ class RegisterSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         """
         Create and return a new user with encrypted password.
+
+        The password is hashed before the row is written so registration
+        costs a single INSERT.
         """
-        user = UserProfile.objects.create(
+        return UserProfile.objects.create_user(
             email=validated_data["email"],
             username=validated_data["username"],
+            password=validated_data["password"],
             first_name=validated_data["first_name"],
             last_name=validated_data["last_name"],
         )
-        user.set_password(validated_data["password"])
-        user.save()
-        return user
 
 
 class LoginSerializer(serializers.Serializer):
@@ -191,19 +195,62 @@ class TagSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
+class BoundedImageField(serializers.FileField):
+    """
+    Image upload checked by core.image_validation.
+
+    Replaces ``ImageField``, whose Pillow verify runs unbounded in the web
+    worker.
+    """
+
+    def to_internal_value(self, data):
+        file = super().to_internal_value(data)
+        try:
+            validate_image(file)
+        except DjangoValidationError as exc:
+            raise serializers.ValidationError(exc.messages) from exc
+        return file
+
+
+class SnapshotTagsField(serializers.ManyRelatedField):
+    """
+    Tag ids of a photo or video, read from its tag snapshot when enabled.
+    """
+
+    def get_attribute(self, instance):
+        if settings.TAG_SNAPSHOTS and instance.pk is not None:
+            return [Tag(pk=tag["id"], name=tag["name"]) for tag in instance.tag_snapshot]
+        return super().get_attribute(instance)
+
+
+def snapshot_tags_field():
+    return SnapshotTagsField(
+        child_relation=serializers.PrimaryKeyRelatedField(queryset=Tag.objects.all()),
+        allow_empty=False,
+    )
+
+
 # Serializer for the Photo model
 class PhotoSerializer(serializers.ModelSerializer):
     """
     Serializer for the Photo model.
     """
 
+    image = BoundedImageField(
+        max_length=Photo._meta.get_field("image").max_length,
+        allow_null=True,
+        required=False,
+    )
+    tags = snapshot_tags_field()
+
     class Meta:
         """
         Meta class for PhotoSerializer with fields and model configuration.
         """
 
         model = Photo
-        fields = "__all__"
+        exclude = Photo.PHASH_BAND_FIELDS + ("tag_snapshot",)
+        read_only_fields = Photo.METADATA_FIELDS + ("processing_status", "created_at")
 
 
 # Serializer for the Video model
@@ -212,10 +259,13 @@ class VideoSerializer(serializers.ModelSerializer):
     Serializer for the Video model.
     """
 
+    tags = snapshot_tags_field()
+
     class Meta:
         """
         "Meta class for VideoSerializer with fields and model configuration.
         """
 
         model = Video
-        fields = "__all__"
+        exclude = ("tag_snapshot",)
+        read_only_fields = ["file_size", "mime_type", "processing_status", "created_at"]
@@ -0,0 +1,320 @@
+"""
+Module docstring: This module contains signal handlers for the core models.
+"""
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_init,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+
+from .cooccurrence import record_media_delete, record_tag_change
+from .models import ChangeLog, Job, MediaBlob, Photo, RelatedMedia, Tag, Video
+from . import stats, tag_snapshots
+from .sync import record_change, record_changes
+
+MEDIA_FIELDS = {Photo: "image", Video: "video_file"}
+MEDIA_TYPES = {Photo.tags.through: "photo", Video.tags.through: "video"}
+MEDIA_MODELS = {Photo.tags.through: Photo, Video.tags.through: Video}
+
+
+def incref_blob(name):
+    """
+    Record one more row referencing a stored file.
+    """
+    if MediaBlob.objects.filter(name=name).update(refcount=F("refcount") + 1):
+        return
+    try:
+        with transaction.atomic():
+            MediaBlob.objects.create(name=name, refcount=1)
+    except IntegrityError:
+        MediaBlob.objects.filter(name=name).update(refcount=F("refcount") + 1)
+
+
+def decref_blob(name):
+    """
+    Record one less row referencing a stored file.
+    """
+    MediaBlob.objects.filter(name=name, refcount__gt=0).update(
+        refcount=F("refcount") - 1
+    )
+
+
+@receiver(post_init, sender=Photo)
+@receiver(post_init, sender=Video)
+def remember_media_name(sender, instance, **kwargs):
+    """
+    Remember the loaded file name so replacements can be detected on save.
+    """
+    field = MEDIA_FIELDS[sender]
+    if field in instance.__dict__:
+        value = instance.__dict__[field]
+        # Anything other than a loaded name is an upload not yet stored.
+        instance._stored_media_name = value if isinstance(value, str) else ""
+
+
+@receiver(post_save, sender=Photo)
+@receiver(post_save, sender=Video)
+def track_media_references(sender, instance, **kwargs):
+    """
+    Keep MediaBlob refcounts in step with the file a row points at.
+    """
+    field = MEDIA_FIELDS[sender]
+    update_fields = kwargs.get("update_fields")
+    if not hasattr(instance, "_stored_media_name") or (
+        update_fields is not None and field not in update_fields
+    ):
+        # The file field was deferred or not saved.
+        return
+    old_name = instance._stored_media_name
+    new_name = getattr(instance, field).name or ""
+    if old_name == new_name:
+        return
+    if new_name:
+        incref_blob(new_name)
+    if old_name:
+        decref_blob(old_name)
+    instance._stored_media_name = new_name
+
+
+@receiver(post_delete, sender=Photo)
+@receiver(post_delete, sender=Video)
+def release_media_reference(sender, instance, **kwargs):
+    """
+    Drop the reference held by a deleted row.
+    """
+    name = getattr(instance, "_stored_media_name", "")
+    if name:
+        decref_blob(name)
+
+
+def changed_media_ids(sender, instance, action, reverse, pk_set):
+    """
+    Return the ids of the photos or videos whose tags an m2m change touched.
+
+    For ``tag.photos.clear()`` the ids are captured on ``pre_clear``, since
+    Django does not pass them to ``post_clear``.
+    """
+    if not reverse:
+        return [instance.pk]
+    if action == "pre_clear":
+        column = f"{MEDIA_TYPES[sender]}_id"
+        instance._cleared_media_ids = list(
+            sender.objects.filter(tag_id=instance.pk).values_list(column, flat=True)
+        )
+        return []
+    if action == "post_clear":
+        return getattr(instance, "_cleared_media_ids", [])
+    return list(pk_set or ())
+
+
+@receiver(m2m_changed, sender=Photo.tags.through)
+@receiver(m2m_changed, sender=Video.tags.through)
+def queue_related_refresh(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Recompute the related list of items whose tags changed.
+    """
+    media_ids = changed_media_ids(sender, instance, action, reverse, pk_set)
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    for media_id in media_ids:
+        Job.objects.enqueue(
+            "related.refresh", media_type=MEDIA_TYPES[sender], object_id=str(media_id)
+        )
+
+
+@receiver(post_delete, sender=Tag)
+def queue_related_refresh_for_tag(sender, instance, **kwargs):
+    """
+    Recompute the related lists of the photos and videos that lost a deleted tag.
+
+    The tagged items are remembered by ``remember_tagged_media``.
+    """
+    for model, ids in getattr(instance, "_tagged_ids", {}).items():
+        for media_id in ids:
+            Job.objects.enqueue(
+                "related.refresh", media_type=model._meta.model_name, object_id=str(media_id)
+            )
+
+
+@receiver(post_delete, sender=Photo)
+@receiver(post_delete, sender=Video)
+def forget_related_media(sender, instance, **kwargs):
+    """
+    Drop the cached related list of a deleted item.
+    """
+    RelatedMedia.objects.filter(
+        media_type=sender._meta.model_name, object_id=instance.pk
+    ).delete()
+
+
+@receiver(m2m_changed, sender=Photo.tags.through)
+@receiver(m2m_changed, sender=Video.tags.through)
+def track_tag_cooccurrence(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Keep the tag co-occurrence counts in step with tag changes.
+    """
+    column = f"{MEDIA_TYPES[sender]}_id"
+    record_tag_change(sender, column, instance, action, reverse, pk_set)
+
+
+@receiver(pre_delete, sender=Photo)
+@receiver(pre_delete, sender=Video)
+def release_tag_cooccurrence(sender, instance, **kwargs):
+    """
+    Remove a deleted item's tag pairs before its through rows go.
+    """
+    record_media_delete(instance)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Photo)
+@receiver(post_save, sender=Video)
+def log_save(sender, instance, **kwargs):
+    """
+    Record a created or updated row for incremental sync.
+    """
+    if not kwargs.get("raw"):
+        record_change(instance)
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Photo)
+@receiver(post_delete, sender=Video)
+def log_delete(sender, instance, **kwargs):
+    """
+    Record a tombstone for a deleted row.
+    """
+    record_change(instance, ChangeLog.DELETE)
+
+
+@receiver(m2m_changed, sender=Photo.tags.through)
+@receiver(m2m_changed, sender=Video.tags.through)
+def log_tag_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Record photos and videos whose tags changed.
+    """
+    media_ids = changed_media_ids(sender, instance, action, reverse, pk_set)
+    if action in ("post_add", "post_remove", "post_clear"):
+        record_changes(MEDIA_MODELS[sender], media_ids)
+
+
+@receiver(pre_delete, sender=Tag)
+def log_tag_delete(sender, instance, **kwargs):
+    """
+    Record the photos and videos that lose a tag being deleted.
+
+    Their through rows are removed by the cascade without ``m2m_changed``.
+    """
+    for through, model in MEDIA_MODELS.items():
+        column = f"{MEDIA_TYPES[through]}_id"
+        record_changes(
+            model,
+            through.objects.filter(tag_id=instance.pk).values_list(column, flat=True),
+        )
+
+
+@receiver(post_init, sender=Photo)
+@receiver(post_init, sender=Video)
+def remember_stats_key(sender, instance, **kwargs):
+    """
+    Remember the day and size a loaded row is counted under.
+    """
+    if "created_at" in instance.__dict__ and "file_size" in instance.__dict__:
+        instance._stored_stats = stats.stats_key(instance)
+
+
+@receiver(post_save, sender=Photo)
+@receiver(post_save, sender=Video)
+def count_media(sender, instance, created, **kwargs):
+    """
+    Keep the daily upload counts and sizes in step with saves.
+    """
+    if not kwargs.get("raw"):
+        stats.record_media_save(instance, created)
+
+
+@receiver(post_delete, sender=Photo)
+@receiver(post_delete, sender=Video)
+def uncount_media(sender, instance, **kwargs):
+    """
+    Remove a deleted row from the daily upload counts.
+    """
+    stats.record_media_delete(instance)
+
+
+@receiver(pre_delete, sender=Photo)
+@receiver(pre_delete, sender=Video)
+def uncount_media_tags(sender, instance, **kwargs):
+    """
+    Remove a deleted row from its tags' counts before its through rows go.
+    """
+    stats.record_media_tags_delete(instance)
+
+
+@receiver(m2m_changed, sender=Photo.tags.through)
+@receiver(m2m_changed, sender=Video.tags.through)
+def count_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Keep the per-tag photo and video counts in step with tag changes.
+    """
+    stats.record_tag_change(sender, MEDIA_TYPES[sender], instance, action, reverse, pk_set)
+
+
+@receiver(m2m_changed, sender=Photo.tags.through)
+@receiver(m2m_changed, sender=Video.tags.through)
+def refresh_tag_snapshots(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Rewrite the tag snapshots of photos and videos whose tags changed.
+    """
+    media_ids = changed_media_ids(sender, instance, action, reverse, pk_set)
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    snapshots = tag_snapshots.refresh_snapshots(MEDIA_MODELS[sender], media_ids)
+    if not reverse:
+        # The instance may be serialized next, e.g. by the view that set its tags.
+        instance.tag_snapshot = snapshots.get(instance.pk, [])
+
+
+@receiver(post_init, sender=Tag)
+def remember_tag_name(sender, instance, **kwargs):
+    """
+    Remember the loaded name so renames can be detected on save.
+    """
+    if "name" in instance.__dict__:
+        instance._stored_name = instance.name
+
+
+@receiver(post_save, sender=Tag)
+def rename_in_tag_snapshots(sender, instance, created, **kwargs):
+    """
+    Rewrite the snapshots carrying a renamed tag.
+    """
+    old_name = getattr(instance, "_stored_name", None)
+    instance._stored_name = instance.name
+    if created or kwargs.get("raw") or old_name is None or old_name == instance.name:
+        return
+    for model, ids in tag_snapshots.tagged_ids(instance.pk).items():
+        tag_snapshots.refresh_snapshots(model, ids)
+
+
+@receiver(pre_delete, sender=Tag)
+def remember_tagged_media(sender, instance, **kwargs):
+    """
+    Remember the photos and videos carrying a tag being deleted.
+    """
+    instance._tagged_ids = tag_snapshots.tagged_ids(instance.pk)
+
+
+@receiver(post_delete, sender=Tag)
+def drop_from_tag_snapshots(sender, instance, **kwargs):
+    """
+    Rewrite the snapshots of the photos and videos that lost a deleted tag.
+    """
+    for model, ids in getattr(instance, "_tagged_ids", {}).items():
+        tag_snapshots.refresh_snapshots(model, ids)
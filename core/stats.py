@@ -0,0 +1,245 @@
+"""
+Module docstring: This module contains the pre-aggregated catalog statistics.
+
+Two summary tables stand in for scans of the media and through tables:
+MediaDailyStat holds the number and total size of the photos or videos
+added each day, and TagStat the number of photos and videos per tag.
+Totals are sums over the daily rows, so every figure on ``/stats/`` is
+read from a few hundred rows whatever the catalog size.
+
+The tables are kept up to date from the model signals (see core.signals)
+with atomic ``count = count + n`` updates, and can be recomputed from
+scratch with ``rebuild_stats``, e.g. periodically to correct any drift
+from writes that bypass signals (``QuerySet.update()``, raw SQL).
+"""
+
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.apps import apps as global_apps
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import MediaDailyStat, Photo, TagStat, Video
+
+MEDIA_TYPES = {Photo: "photo", Video: "video"}
+TAG_COUNT_FIELDS = {"photo": "photo_count", "video": "video_count"}
+
+
+def stats_key(instance):
+    """
+    Return the ``(day, bytes)`` a photo or video counts towards.
+
+    Days are dates in TIME_ZONE, whatever time zone a request activated, as
+    in ``rebuild_stats``.
+    """
+    created_at = instance.created_at
+    if timezone.is_aware(created_at):
+        day = timezone.localdate(created_at, timezone.get_default_timezone())
+    else:
+        day = created_at.date()
+    return day, instance.file_size or 0
+
+
+def apply_daily_deltas(media_type, deltas):
+    """
+    Add ``deltas`` ({day: (count, bytes)}) to the daily rows of ``media_type``.
+    """
+    deltas = {day: delta for day, delta in deltas.items() if any(delta)}
+    if not deltas:
+        return
+    # Rows are created at zero first so every change is an atomic UPDATE.
+    MediaDailyStat.objects.bulk_create(
+        [MediaDailyStat(media_type=media_type, day=day) for day in deltas],
+        ignore_conflicts=True,
+    )
+    for day, (count, size) in deltas.items():
+        MediaDailyStat.objects.filter(media_type=media_type, day=day).update(
+            count=F("count") + count, bytes=F("bytes") + size
+        )
+
+
+def apply_tag_deltas(media_type, deltas):
+    """
+    Add ``deltas`` ({tag id: change}) to the ``media_type`` count of each tag.
+    """
+    field = TAG_COUNT_FIELDS[media_type]
+    by_delta = defaultdict(list)
+    for tag_id, delta in deltas.items():
+        if delta:
+            by_delta[delta].append(tag_id)
+    if not by_delta:
+        return
+    TagStat.objects.bulk_create(
+        [TagStat(tag_id=tag_id) for tag_ids in by_delta.values() for tag_id in tag_ids],
+        ignore_conflicts=True,
+    )
+    for delta, tag_ids in by_delta.items():
+        TagStat.objects.filter(tag_id__in=tag_ids).update(
+            **{field: F(field) + delta, "total": F("total") + delta}
+        )
+
+
+def record_media_save(instance, created):
+    """
+    Count a saved photo or video, moving it if its day or size changed.
+    """
+    new = stats_key(instance)
+    old = getattr(instance, "_stored_stats", None)
+    instance._stored_stats = new
+    if created:
+        deltas = {new[0]: (1, new[1])}
+    elif old is None or old == new:
+        # Unchanged, or loaded without the counted fields.
+        return
+    elif old[0] == new[0]:
+        deltas = {new[0]: (0, new[1] - old[1])}
+    else:
+        deltas = {old[0]: (-1, -old[1]), new[0]: (1, new[1])}
+    apply_daily_deltas(MEDIA_TYPES[type(instance)], deltas)
+
+
+def record_media_delete(instance):
+    """
+    Uncount a deleted photo or video.
+    """
+    day, size = getattr(instance, "_stored_stats", None) or stats_key(instance)
+    apply_daily_deltas(MEDIA_TYPES[type(instance)], {day: (-1, -size)})
+
+
+def record_media_tags_delete(instance):
+    """
+    Uncount the tags of a photo or video that is being deleted.
+    """
+    media_type = MEDIA_TYPES[type(instance)]
+    through = type(instance).tags.through
+    tag_ids = through.objects.filter(**{f"{media_type}_id": instance.pk}).values_list(
+        "tag_id", flat=True
+    )
+    apply_tag_deltas(media_type, {tag_id: -1 for tag_id in tag_ids})
+
+
+def record_tag_change(through, media_type, instance, action, reverse, pk_set):
+    """
+    Update the tag counts for an ``m2m_changed`` signal on a through table.
+
+    Additions are counted on ``post_add``, where Django passes only the
+    links it inserted; removals on ``pre_remove``/``pre_clear``, while the
+    links that actually exist can still be read.
+    """
+    column = f"{media_type}_id"
+    if action == "post_add":
+        if reverse:
+            deltas = {instance.pk: len(pk_set)}
+        else:
+            deltas = {tag_id: 1 for tag_id in pk_set}
+    elif action in ("pre_remove", "pre_clear"):
+        if reverse:
+            links = through.objects.filter(tag_id=instance.pk)
+            if action == "pre_remove":
+                links = links.filter(**{f"{column}__in": pk_set})
+            deltas = {instance.pk: -links.count()}
+        else:
+            links = through.objects.filter(**{column: instance.pk})
+            if action == "pre_remove":
+                links = links.filter(tag_id__in=pk_set)
+            deltas = {tag_id: -1 for tag_id in links.values_list("tag_id", flat=True)}
+    else:
+        return
+    apply_tag_deltas(media_type, deltas)
+
+
+def catalog_stats(days, tags):
+    """
+    Return totals, the last ``days`` days of uploads and the ``tags`` most used tags.
+    """
+    totals = {
+        media_type: {"count": 0, "bytes": 0} for media_type in MEDIA_TYPES.values()
+    }
+    for row in MediaDailyStat.objects.values("media_type").annotate(
+        count=Sum("count"), bytes=Sum("bytes")
+    ):
+        totals[row["media_type"]] = {"count": row["count"], "bytes": row["bytes"]}
+
+    today = timezone.localdate(timezone=timezone.get_default_timezone())
+    since = today - timedelta(days=days - 1)
+    daily = {}
+    for media_type, day, count, size in (
+        MediaDailyStat.objects.filter(day__gte=since)
+        .order_by("day")
+        .values_list("media_type", "day", "count", "bytes")
+    ):
+        entry = daily.setdefault(day, {"day": day})
+        entry[media_type] = {"count": count, "bytes": size}
+
+    top_tags = [
+        {
+            "id": stat.tag_id,
+            "name": stat.tag.name,
+            "photos": stat.photo_count,
+            "videos": stat.video_count,
+            "total": stat.total,
+        }
+        for stat in TagStat.objects.select_related("tag")
+        .filter(total__gt=0)
+        .order_by("-total", "tag_id")[:tags]
+    ]
+    for entry in daily.values():
+        for name in MEDIA_TYPES.values():
+            entry.setdefault(name, {"count": 0, "bytes": 0})
+    return {"totals": totals, "daily": list(daily.values()), "tags": top_tags}
+
+
+def rebuild_stats(apps=global_apps):
+    """
+    Recompute both summary tables from the media and through tables.
+
+    ``apps`` lets migrations run this against historical models. Returns
+    the number of daily rows and tag rows stored.
+    """
+    daily_model = apps.get_model("core", "MediaDailyStat")
+    tag_model = apps.get_model("core", "TagStat")
+    daily_rows = []
+    tag_counts = defaultdict(Counter)
+    for model_name, media_type in (("Photo", "photo"), ("Video", "video")):
+        model = apps.get_model("core", model_name)
+        rows = (
+            model.objects.annotate(
+                day=TruncDate("created_at", tzinfo=timezone.get_default_timezone())
+            )
+            .values("day")
+            .annotate(count=Count("pk"), bytes=Sum("file_size"))
+            .order_by()
+        )
+        daily_rows += [
+            daily_model(
+                media_type=media_type,
+                day=row["day"],
+                count=row["count"],
+                bytes=row["bytes"] or 0,
+            )
+            for row in rows
+        ]
+        through = model._meta.get_field("tags").remote_field.through
+        for row in through.objects.values("tag_id").annotate(count=Count("pk")).order_by():
+            tag_counts[row["tag_id"]][media_type] = row["count"]
+
+    with transaction.atomic():
+        daily_model.objects.all().delete()
+        tag_model.objects.all().delete()
+        daily_model.objects.bulk_create(daily_rows, batch_size=500)
+        tag_model.objects.bulk_create(
+            [
+                tag_model(
+                    tag_id=tag_id,
+                    photo_count=counts["photo"],
+                    video_count=counts["video"],
+                    total=counts["photo"] + counts["video"],
+                )
+                for tag_id, counts in tag_counts.items()
+            ],
+            batch_size=500,
+        )
+    return len(daily_rows), len(tag_counts)
@@ -0,0 +1,145 @@
+"""
+Module docstring: This module contains the content-addressed media storage.
+"""
+
+import errno
+import hashlib
+import os
+import tempfile
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import File
+from django.core.files.storage import FileSystemStorage
+from django.core.files.utils import validate_file_name
+from django.utils.deconstruct import deconstructible
+
+from .image_validation import SIGNATURE_BYTES, sniff_head
+
+
+# Extension of each sniffed image format (core.image_validation), so the
+# same bytes get the same name whether uploaded as .jpg, .jpeg or .JPG.
+FORMAT_EXTENSIONS = {"JPEG": ".jpg", "PNG": ".png", "GIF": ".gif", "WEBP": ".webp"}
+
+# errno values of link() on file systems without hard links.
+LINK_UNSUPPORTED = {errno.EPERM, errno.ENOTSUP, errno.EOPNOTSUPP, errno.ENOSYS, errno.EXDEV}
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage that names files after the SHA-256 of their content.
+
+    ``photos/cat.JPG`` is stored as ``photos/ab/cd/abcd….jpg``; the two
+    directory levels keep directories small. Images take the extension of
+    the format sniffed from their first bytes, other files keep theirs.
+    Saving content that is already stored returns the existing name without
+    keeping the new copy (only the modification time is refreshed), and
+    since a name always maps to the same bytes its URL can be cached forever.
+    """
+
+    chunk_size = 64 * 1024
+
+    def content_name(self, name, digest, extension=None):
+        """
+        Build the sharded storage name for a digest.
+
+        ``extension`` defaults to the lowercased extension of ``name``.
+        """
+        directory = os.path.dirname(name)
+        if extension is None:
+            extension = os.path.splitext(name)[1].lower()
+        return os.path.join(directory, digest[:2], digest[2:4], digest + extension)
+
+    def save(self, name, content, max_length=None):
+        """
+        Write ``content`` to a temporary file, hashing it on the way, then
+        link it into place under its content name.
+
+        When the content is already stored, or a concurrent save of the
+        same content links first, the stored file is kept as a dedupe hit.
+        The name is never visible half written; a temporary file left by a
+        crash is an orphan for core.media_gc.
+        """
+        if name is None:
+            name = content.name
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+        temporary, digest, head = self._write_temporary(os.path.dirname(name), content)
+        try:
+            name = self.content_name(
+                name, digest, FORMAT_EXTENSIONS.get(sniff_head(head))
+            )
+            name = self.get_available_name(name, max_length=max_length)
+            validate_file_name(name, allow_relative_path=True)
+            self._link(temporary, self.path(name))
+        finally:
+            if os.path.exists(temporary):
+                os.unlink(temporary)
+        return name
+
+    def get_available_name(self, name, max_length=None):
+        """
+        Return ``name`` unchanged: a taken content name already holds the same bytes.
+        """
+        if max_length is not None and len(name) > max_length:
+            raise SuspiciousFileOperation(
+                f"Storage name {name!r} is longer than {max_length} characters."
+            )
+        return name
+
+    def _write_temporary(self, directory, content):
+        """
+        Copy ``content`` into a temporary file under ``directory``.
+
+        Returns its path, the hex SHA-256 of the content and its first
+        SIGNATURE_BYTES bytes.
+        """
+        full_directory = self.path(directory)
+        self._makedirs(full_directory)
+        fd, temporary = tempfile.mkstemp(dir=full_directory, prefix=".upload-")
+        digest = hashlib.sha256()
+        head = b""
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                if hasattr(content, "seek"):
+                    content.seek(0)
+                for chunk in content.chunks(self.chunk_size):
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    if len(head) < SIGNATURE_BYTES:
+                        head += chunk[: SIGNATURE_BYTES - len(head)]
+                    digest.update(chunk)
+                    handle.write(chunk)
+            os.chmod(temporary, self.file_permissions_mode or 0o644)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+        return temporary, digest.hexdigest(), head
+
+    def _link(self, temporary, full_path):
+        """
+        Give the temporary file its final path unless that path already exists.
+        """
+        self._makedirs(os.path.dirname(full_path))
+        try:
+            os.link(temporary, full_path)
+        except FileExistsError:
+            os.utime(full_path)
+        except OSError as exc:
+            if exc.errno not in LINK_UNSUPPORTED:
+                raise
+            # No hard links: move the file instead. A file that appears there
+            # meanwhile holds the same bytes, so replacing it is harmless.
+            if os.path.exists(full_path):
+                os.utime(full_path)
+            else:
+                os.replace(temporary, full_path)
+
+    def _makedirs(self, directory):
+        if self.directory_permissions_mode is not None:
+            os.makedirs(directory, self.directory_permissions_mode, exist_ok=True)
+        else:
+            os.makedirs(directory, exist_ok=True)
+
+
+media_storage = ContentAddressedStorage()
@@ -0,0 +1,222 @@
+"""
+Module docstring: This module contains the change log behind incremental sync.
+
+Every create, update and delete of a tag, photo or video appends a
+ChangeLog entry (see core.signals). A client keeps the ``seq`` of the last
+entry it has seen as its cursor and asks for the entries after it, so the
+cost of a sync is one indexed range scan over the changes plus one lookup
+per model for the changed rows, whatever the size of the tables.
+
+Sequence numbers are handed out when a transaction inserts its entry but
+become visible when it commits, so a later number can be visible before
+an earlier one. Entries are stamped when they are inserted, and only
+those older than the start of the oldest transaction still writing to the
+database (PostgreSQL, MySQL; SQLite runs one writer at a time) are handed
+out, which keeps a cursor from skipping past a change that has not
+committed yet. SYNC_SETTLE_SECONDS more are held back for the time
+between stamping and inserting, clock differences between the web servers
+and the database, and replica lag.
+"""
+
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import ChangeLog, Photo, Tag, Video
+from .tag_snapshots import with_tags
+
+SYNC_MODELS = {"tag": Tag, "photo": Photo, "video": Video}
+MODEL_NAMES = {model: name for name, model in SYNC_MODELS.items()}
+
+_buffer = threading.local()
+
+
+@contextmanager
+def buffered_changes():
+    """
+    Collect the changes recorded inside the block and write them with one INSERT.
+
+    Used by bulk writers that send ``post_save``/``post_delete`` per row.
+    """
+    if getattr(_buffer, "entries", None) is not None:
+        yield
+        return
+    _buffer.entries = []
+    try:
+        yield
+        entries = _buffer.entries
+    finally:
+        _buffer.entries = None
+    _write(entries)
+
+
+def _write(entries):
+    pending = getattr(_buffer, "entries", None)
+    if pending is not None:
+        pending.extend(entries)
+    elif entries:
+        now = timezone.now()
+        for entry in entries:
+            entry.changed_at = now
+        ChangeLog.objects.bulk_create(entries)
+        transaction.on_commit(_announce)
+
+
+def _announce():
+    from .events import announce
+
+    announce()
+
+
+def record_change(instance, action=ChangeLog.UPSERT):
+    """
+    Append a change of a tag, photo or video to the log.
+    """
+    record_changes(type(instance), [instance.pk], action)
+
+
+def record_changes(model, ids, action=ChangeLog.UPSERT):
+    """
+    Append the same change for many rows of ``model`` with one INSERT.
+    """
+    _write(
+        [
+            ChangeLog(model=MODEL_NAMES[model], object_id=str(pk), action=action)
+            for pk in ids
+        ]
+    )
+
+
+OLDEST_TRANSACTION_SQL = {
+    "postgresql": (
+        "SELECT min(xact_start) FROM pg_stat_activity WHERE backend_xid IS NOT NULL "
+        "AND datname = current_database() AND pid <> pg_backend_pid()"
+    ),
+    "mysql": (
+        "SELECT UNIX_TIMESTAMP(MIN(trx_started)) FROM information_schema.innodb_trx "
+        "WHERE trx_mysql_thread_id <> CONNECTION_ID()"
+    ),
+}
+
+
+def oldest_transaction_start():
+    """
+    Return when the oldest transaction still writing to the primary started, or None.
+
+    Needs the database user to see other sessions: the same role, or
+    pg_read_all_stats, on PostgreSQL and PROCESS on MySQL.
+    """
+    connection = connections[DEFAULT_DB_ALIAS]
+    sql = OLDEST_TRANSACTION_SQL.get(connection.vendor)
+    if sql is None:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(sql)
+        started = cursor.fetchone()[0]
+    if started is None:
+        return None
+    if connection.vendor == "mysql":
+        return datetime.fromtimestamp(float(started), tz=timezone.utc)
+    return started
+
+
+def settled_before():
+    """
+    Return the time up to which every change log entry has committed.
+    """
+    now = timezone.now()
+    started = oldest_transaction_start()
+    if started is not None:
+        now = min(now, started)
+    return now - timedelta(seconds=settings.SYNC_SETTLE_SECONDS)
+
+
+def changes_since(since, limit, serializers):
+    """
+    Return the rows changed after cursor ``since``.
+
+    ``serializers`` maps model names to serializer classes. The result
+    holds the upserted rows and deleted ids per model, the cursor to send
+    next time, and whether more changes are waiting.
+    """
+    entries = list(
+        ChangeLog.objects.filter(seq__gt=since, changed_at__lte=settled_before())
+        .order_by("seq")
+        .values_list("seq", "model", "object_id", "action")[: limit + 1]
+    )
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    # Only the last change of each row in this page matters.
+    latest = {}
+    for _, model, object_id, action in entries:
+        latest.pop((model, object_id), None)
+        latest[(model, object_id)] = action
+
+    changed = {name: [] for name in SYNC_MODELS}
+    deleted = {name: [] for name in SYNC_MODELS}
+    for (model, object_id), action in latest.items():
+        if model in SYNC_MODELS:
+            (deleted if action == ChangeLog.DELETE else changed)[model].append(object_id)
+
+    result = {
+        "cursor": entries[-1][0] if entries else since,
+        "has_more": has_more,
+        "changed": {},
+        "deleted": deleted,
+    }
+    for name, ids in changed.items():
+        result["changed"][name] = serializers[name](load_rows(name, ids), many=True).data
+    return result
+
+
+def load_rows(name, ids):
+    """
+    Return the rows of model ``name`` with logged ids ``ids``, in that order.
+
+    Tags are prefetched unless read from the snapshots. Rows deleted
+    since are skipped; their tombstone follows later in the log.
+    """
+    model = SYNC_MODELS[name]
+    queryset = model.objects.all()
+    if model._meta.many_to_many:
+        queryset = with_tags(queryset)
+    pks = [model._meta.pk.to_python(pk) for pk in ids]
+    found = queryset.in_bulk(pks) if pks else {}
+    return [found[pk] for pk in pks if pk in found]
+
+
+def latest_cursor():
+    """
+    Return the sequence number of the newest change.
+    """
+    return ChangeLog.objects.aggregate(seq=Max("seq"))["seq"] or 0
+
+
+def prune_changelog(batch_size=1000):
+    """
+    Delete entries superseded by a later entry for the same row.
+
+    The newest entry of every row is kept, tombstones included, so a
+    client syncing from any cursor still ends up with the right state.
+    """
+    removed = 0
+    newest = (
+        ChangeLog.objects.values("model", "object_id")
+        .annotate(seq=Max("seq"))
+        .values_list("seq", flat=True)
+    )
+    while True:
+        stale = list(
+            ChangeLog.objects.exclude(seq__in=newest)
+            .order_by("seq")
+            .values_list("seq", flat=True)[:batch_size]
+        )
+        if not stale:
+            return removed
+        removed += ChangeLog.objects.filter(seq__in=stale).delete()[0]
@@ -0,0 +1,126 @@
+"""
+Module docstring: This module contains the denormalized tag snapshots of photos and videos.
+
+Each photo and video keeps a copy of its tags, ``[{"id": 1, "name":
+"red"}, ...]`` ordered by id, in its ``tag_snapshot`` column. With
+TAG_SNAPSHOTS enabled the serializers render ``tags`` from it, so a list
+page is one query on the media table, without the through table and
+``Tag`` join of a prefetch.
+
+The snapshots are refreshed by the signal handlers in core.signals when
+the tags of an item change and when a tag is renamed or deleted. Writes
+that bypass signals (``QuerySet.update()``, raw SQL) are corrected by
+``rebuild_tag_snapshots``.
+"""
+
+from django.apps import apps as global_apps
+from django.conf import settings
+from django.db import transaction
+
+from .models import Photo, Video
+
+SNAPSHOT_MODELS = (Photo, Video)
+
+
+def with_tags(queryset):
+    """
+    Return ``queryset`` set up to render its rows' tags.
+
+    Tags are prefetched unless they are read from the snapshots.
+    """
+    if settings.TAG_SNAPSHOTS and queryset.model in SNAPSHOT_MODELS:
+        return queryset
+    return queryset.prefetch_related("tags")
+
+
+def build_snapshots(model, ids):
+    """
+    Return {id: snapshot} for the rows of ``model`` with ids ``ids``.
+    """
+    field = model._meta.get_field("tags")
+    through = field.remote_field.through
+    column = f"{field.m2m_field_name()}_id"
+    snapshots = {pk: [] for pk in ids}
+    for media_id, tag_id, name in (
+        through.objects.filter(**{f"{column}__in": list(snapshots)})
+        .order_by("tag_id")
+        .values_list(column, "tag_id", "tag__name")
+    ):
+        snapshots[media_id].append({"id": tag_id, "name": name})
+    return snapshots
+
+
+def refresh_snapshots(model, ids):
+    """
+    Recompute and store the snapshots of the rows of ``model`` with ids ``ids``.
+
+    The rows are locked before their tags are read, so two transactions
+    changing the tags of the same item write its snapshot one after the
+    other, the second one seeing the first one's links. Returns
+    {id: snapshot}.
+    """
+    ids = sorted(set(ids))
+    snapshots = {}
+    for start in range(0, len(ids), settings.TAG_SNAPSHOT_BATCH_SIZE):
+        with transaction.atomic():
+            locked = list(
+                model.objects.select_for_update()
+                .filter(pk__in=ids[start : start + settings.TAG_SNAPSHOT_BATCH_SIZE])
+                .order_by("pk")
+                .values_list("pk", flat=True)
+            )
+            batch = build_snapshots(model, locked)
+            model.objects.bulk_update(
+                [model(pk=pk, tag_snapshot=snapshot) for pk, snapshot in batch.items()],
+                ["tag_snapshot"],
+            )
+        snapshots.update(batch)
+    return snapshots
+
+
+def tagged_ids(tag_id):
+    """
+    Return {model: ids} of the photos and videos carrying a tag.
+    """
+    tagged = {}
+    for model in SNAPSHOT_MODELS:
+        field = model._meta.get_field("tags")
+        tagged[model] = list(
+            field.remote_field.through.objects.filter(tag_id=tag_id).values_list(
+                f"{field.m2m_field_name()}_id", flat=True
+            )
+        )
+    return tagged
+
+
+def rebuild_snapshots(apps=global_apps, batch_size=None):
+    """
+    Recompute every snapshot from the through tables.
+
+    ``apps`` lets migrations run this against historical models. Returns
+    {model name: rows rebuilt}.
+    """
+    batch_size = batch_size or settings.TAG_SNAPSHOT_BATCH_SIZE
+    rebuilt = {}
+    for name in ("Photo", "Video"):
+        model = apps.get_model("core", name)
+        rebuilt[name.lower()] = 0
+        last = None
+        while True:
+            queryset = model.objects.order_by("pk")
+            if last is not None:
+                queryset = queryset.filter(pk__gt=last)
+            ids = list(queryset.values_list("pk", flat=True)[:batch_size])
+            if not ids:
+                break
+            last = ids[-1]
+            with transaction.atomic():
+                model.objects.bulk_update(
+                    [
+                        model(pk=pk, tag_snapshot=snapshot)
+                        for pk, snapshot in build_snapshots(model, ids).items()
+                    ],
+                    ["tag_snapshot"],
+                )
+            rebuilt[name.lower()] += len(ids)
+    return rebuilt
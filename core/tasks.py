@@ -0,0 +1,114 @@
+"""
+Module docstring: This module contains the background job handlers for uploads.
+"""
+
+from django.utils import timezone
+
+from .jobs import register
+from .media import image_dhash, image_placeholder
+from .models import PROCESSING_FAILED, PROCESSING_READY, Job, Photo, Video
+from .sync import record_changes
+from .user_import import import_storage, import_users
+
+
+def set_processing_status(model, pk, status):
+    """
+    Update a row's processing status without loading it, logging the change.
+    """
+    if model.objects.filter(pk=pk).update(
+        processing_status=status, updated_at=timezone.now()
+    ):
+        record_changes(model, [pk])
+
+
+def mark_photo_failed(photo_id):
+    """
+    Flag a photo whose processing job ran out of attempts.
+    """
+    set_processing_status(Photo, photo_id, PROCESSING_FAILED)
+
+
+def mark_video_failed(video_id):
+    """
+    Flag a video whose processing job ran out of attempts.
+    """
+    set_processing_status(Video, video_id, PROCESSING_FAILED)
+
+
+@register("photo.process", on_failure=mark_photo_failed)
+def process_photo(photo_id):
+    """
+    Decode an uploaded photo and store its placeholder and perceptual hash.
+    """
+    from PIL import Image
+
+    photo = Photo.objects.filter(pk=photo_id).first()
+    if photo is None or photo.processing_status == PROCESSING_READY:
+        return
+    if photo.image:
+        with photo.image.open("rb") as file, Image.open(file) as image:
+            photo.placeholder = image_placeholder(image)
+            photo.set_phash(image_dhash(image))
+    photo.processing_status = PROCESSING_READY
+    photo.save(
+        update_fields=[
+            "placeholder",
+            "phash",
+            *Photo.PHASH_BAND_FIELDS,
+            "processing_status",
+            "updated_at",
+        ]
+    )
+
+
+@register("video.process", on_failure=mark_video_failed)
+def process_video(video_id):
+    """
+    Finish processing an uploaded video.
+
+    Nothing needs the decoded stream yet; this is where transcoding or
+    thumbnailing belongs when it is added.
+    """
+    set_processing_status(Video, video_id, PROCESSING_READY)
+
+
+@register("related.refresh")
+def refresh_related_media(media_type, object_id, neighbours=True):
+    """
+    Recompute the related list of a photo or video after its tags changed.
+
+    With ``neighbours`` the items listed next to it before or after the
+    change are queued too, without neighbours of their own.
+    """
+    # numpy/scipy are only loaded by the processes that need them.
+    from .related import refresh_related, refresh_related_with_neighbours
+
+    if not neighbours:
+        refresh_related(media_type, object_id)
+        return
+    for neighbour in refresh_related_with_neighbours(media_type, object_id):
+        Job.objects.enqueue(
+            "related.refresh", media_type=media_type, object_id=neighbour, neighbours=False
+        )
+
+
+def discard_user_import(name, fmt):
+    """
+    Delete the upload of a user import that ran out of attempts.
+    """
+    import_storage().delete(name)
+
+
+@register("users.import", on_failure=discard_user_import)
+def run_user_import(name, fmt):
+    """
+    Import an uploaded user file; the summary becomes the job's result.
+
+    A retry skips the users an earlier attempt already created.
+    """
+    storage = import_storage()
+    with storage.open(name, "rb") as stream:
+        result = import_users(stream, fmt=fmt)
+    storage.delete(name)
+    return result
+
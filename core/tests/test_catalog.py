@@ -0,0 +1,253 @@
+"""
+Module docstring: This module contains test cases for the NDJSON catalog export and import.
+"""
+
+import io
+import json
+import os
+import tempfile
+
+from asgiref.sync import async_to_sync
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.catalog import export_catalog, import_catalog
+from core.models import (
+    ChangeLog,
+    MediaBlob,
+    Photo,
+    Tag,
+    TagCooccurrence,
+    UserProfile,
+    Video,
+)
+
+
+def dump(**kwargs):
+    return b"".join(export_catalog(**kwargs))
+
+
+class CatalogTestCase(TestCase):
+    """
+    Test cases for core.catalog.
+    """
+
+    def setUp(self):
+        self.red = Tag.objects.create(name="red")
+        self.blue = Tag.objects.create(name="blue", description="Blue things")
+        self.photo = Photo.objects.create(title="Sky", image="photos/sky.jpg", width=40)
+        MediaBlob.objects.create(name="photos/sky.jpg", refcount=1)
+        self.photo.tags.add(self.red, self.blue)
+        self.video = Video.objects.create(title="Sea")
+        self.video.tags.add(self.blue)
+
+    def test_export(self):
+        """
+        Test that every row is exported once, tags first, with its links.
+        """
+        records = [json.loads(line) for line in dump().splitlines()]
+        self.assertEqual([record["model"] for record in records], ["tag", "tag", "photo", "video"])
+        photo = records[2]
+        self.assertEqual(photo["pk"], str(self.photo.pk))
+        self.assertEqual(photo["fields"]["image"], "photos/sky.jpg")
+        self.assertEqual(sorted(photo["fields"]["tags"]), sorted([self.red.pk, self.blue.pk]))
+
+    def test_export_queries_per_page(self):
+        """
+        Test that the export reads pages by key rather than row by row.
+        """
+        for index in range(4):
+            Photo.objects.create(title=f"Photo {index}")
+        # Two pages and the empty page that ends the scan, plus one
+        # query for the links of each page.
+        with self.assertNumQueries(5):
+            dump(models=["photo"], batch_size=3)
+
+    def test_round_trip(self):
+        """
+        Test that an export re-imported into an empty catalog restores it.
+        """
+        data = dump()
+        Photo.objects.all().delete()
+        Video.objects.all().delete()
+        Tag.objects.all().delete()
+        self.assertEqual(MediaBlob.objects.get(name="photos/sky.jpg").refcount, 0)
+        cursor = ChangeLog.objects.latest("seq").seq
+
+        result = import_catalog(io.BytesIO(data), batch_size=2)
+
+        self.assertEqual((result["created"], result["updated"]), (4, 0))
+        self.assertEqual(result["errors"], [])
+        self.assertEqual(result["line"], 4)
+        photo = Photo.objects.get(pk=self.photo.pk)
+        self.assertEqual((photo.title, photo.width), ("Sky", 40))
+        self.assertEqual(set(photo.tags.all()), {self.red, self.blue})
+        self.assertEqual(Tag.objects.get(pk=self.blue.pk).description, "Blue things")
+        self.assertEqual(list(Video.objects.get(pk=self.video.pk).tags.all()), [self.blue])
+        # Signal handlers saw the bulk writes.
+        self.assertEqual(MediaBlob.objects.get(name="photos/sky.jpg").refcount, 1)
+        self.assertEqual(TagCooccurrence.objects.get(tag=self.red, other=self.blue).count, 1)
+        self.assertTrue(
+            ChangeLog.objects.filter(seq__gt=cursor, object_id=str(self.photo.pk)).exists()
+        )
+
+    def test_upsert(self):
+        """
+        Test that importing over existing rows updates them and their links.
+        """
+        record = {
+            "model": "photo",
+            "pk": str(self.photo.pk),
+            "fields": {"title": "Renamed", "image": "photos/sky.jpg", "tags": [self.red.pk]},
+        }
+        result = import_catalog(io.BytesIO(json.dumps(record).encode()))
+        self.assertEqual((result["created"], result["updated"]), (0, 1))
+        self.photo.refresh_from_db()
+        self.assertEqual(self.photo.title, "Renamed")
+        self.assertEqual(list(self.photo.tags.all()), [self.red])
+        self.assertEqual(MediaBlob.objects.get(name="photos/sky.jpg").refcount, 1)
+
+    def test_errors_and_resume(self):
+        """
+        Test that bad lines are reported and a start line skips earlier ones.
+        """
+        lines = [
+            b"not json",
+            json.dumps({"model": "photo", "pk": "x", "fields": {}}).encode(),
+            json.dumps({"model": "tag", "pk": 99, "fields": {"name": "red"}}).encode(),
+            json.dumps(
+                {"model": "video", "pk": str(self.video.pk), "fields": {"colour": "red"}}
+            ).encode(),
+            json.dumps(
+                {"model": "video", "pk": str(self.video.pk), "fields": {"title": "Sea", "tags": [404]}}
+            ).encode(),
+        ]
+        checkpoints = []
+        result = import_catalog(io.BytesIO(b"\n".join(lines)), checkpoint=checkpoints.append)
+        self.assertEqual([error["line"] for error in result["errors"]], [1, 2, 3, 4, 5])
+        self.assertEqual(result["updated"], 1)
+        self.assertEqual(checkpoints, [5])
+        self.assertFalse(self.video.tags.exists())
+
+        result = import_catalog(io.BytesIO(b"\n".join(lines)), start=4)
+        self.assertEqual([error["line"] for error in result["errors"]], [5])
+
+    def test_invalid_values(self):
+        """
+        Test that values breaking null, length or choices are line errors, not crashes.
+        """
+        lines = [
+            {"model": "photo", "pk": str(self.photo.pk), "fields": {"title": None}},
+            {"model": "photo", "pk": str(self.photo.pk), "fields": {"title": "x" * 101}},
+            {"model": "video", "pk": str(self.video.pk), "fields": {"processing_status": "lost"}},
+            {"model": "tag", "pk": self.red.pk, "fields": {"name": "red", "description": None}},
+        ]
+        data = b"\n".join(json.dumps(line).encode() for line in lines)
+        result = import_catalog(io.BytesIO(data))
+        self.assertEqual([error["line"] for error in result["errors"]], [1, 2, 3])
+        self.assertTrue(result["errors"][0]["error"].startswith("title:"))
+        self.assertEqual(result["updated"], 1)
+        self.assertEqual(Photo.objects.get(pk=self.photo.pk).title, "Sky")
+
+    def test_commands(self):
+        """
+        Test the export_catalog and import_catalog commands with a checkpoint.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "catalog.ndjson")
+            call_command("export_catalog", output=path, stderr=io.StringIO())
+            Photo.objects.filter(pk=self.photo.pk).update(title="Changed")
+            with open(f"{path}.checkpoint", "w", encoding="utf-8") as handle:
+                handle.write("2")
+            out = io.StringIO()
+            call_command("import_catalog", path, resume=True, stdout=out)
+            self.assertIn("Resuming after line 2", out.getvalue())
+            self.assertIn("updated 2", out.getvalue())
+            self.assertFalse(os.path.exists(f"{path}.checkpoint"))
+        self.assertEqual(Photo.objects.get(pk=self.photo.pk).title, "Sky")
+
+
+class CatalogViewTestCase(TestCase):
+    """
+    Test cases for the admin catalog endpoints.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin_user = UserProfile.objects.create_superuser(
+            email="admin@example.com", username="adminuser", password="adminpassword"
+        )
+        self.user = UserProfile.objects.create_user(
+            email="test@example.com", username="testuser", password="testpassword"
+        )
+        Tag.objects.create(name="red")
+
+    def login(self, user):
+        token = RefreshToken.for_user(user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def test_export_and_import(self):
+        """
+        Test that an admin can stream an export and upload it back.
+        """
+        self.login(self.admin_user)
+        response = self.client.get(reverse("catalog-export"), {"models": "tag"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        data = b"".join(response.streaming_content)
+        self.assertEqual(json.loads(data)["fields"]["name"], "red")
+
+        upload = SimpleUploadedFile("catalog.ndjson", data)
+        response = self.client.post(reverse("catalog-import"), {"file": upload})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["updated"], 1)
+        self.assertIn("rows_per_second", response.data)
+
+    def test_unknown_model(self):
+        """
+        Test that an unknown model name is rejected.
+        """
+        self.login(self.admin_user)
+        response = self.client.get(reverse("catalog-export"), {"models": "user"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_regular_user_is_forbidden(self):
+        """
+        Test that non-admin users cannot export.
+        """
+        self.login(self.user)
+        response = self.client.get(reverse("catalog-export"))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_export_under_asgi(self):
+        """
+        Test that the streamed export can query the database when served over ASGI.
+        """
+        from ideal.asgi import application
+
+        messages = []
+
+        async def receive():
+            return {"type": "http.request", "body": b""}
+
+        async def send(message):
+            messages.append(message)
+
+        token = RefreshToken.for_user(self.admin_user).access_token
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "path": reverse("catalog-export"),
+            "query_string": b"",
+            "server": ("testserver", 80),
+            "headers": [(b"authorization", f"Bearer {token}".encode())],
+        }
+        async_to_sync(application)(scope, receive, send)
+        self.assertEqual(messages[0]["status"], status.HTTP_200_OK)
+        body = b"".join(message.get("body", b"") for message in messages[1:])
+        self.assertEqual(json.loads(body)["fields"]["name"], "red")
@@ -0,0 +1,205 @@
+"""
+Module docstring: This module contains test cases for request coalescing.
+"""
+
+import tempfile
+import threading
+import time
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory
+
+from core.coalesce import CoalescedGetMixin, Coalescer, normalize_query
+from core.db_router import replica_reads
+from core.models import Tag
+
+
+class CoalescerTestCase(SimpleTestCase):
+    """
+    Test cases for the Coalescer.
+    """
+
+    def race(self, coalescers, key="key", shared=True, waiters=4):
+        """
+        Run one leader and ``waiters`` identical requests against it.
+
+        The leader blocks until every waiter has joined, so they overlap.
+        Returns the results and the number of computations.
+        """
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            if len(calls) == 1:
+                started.set()
+                release.wait(5)
+            return "leader", ({"value": 42} if shared else None)
+
+        results = []
+
+        def request(coalescer):
+            results.append(coalescer.run(key, compute, lambda result: result["value"]))
+
+        threads = [threading.Thread(target=request, args=(coalescers[0],))]
+        threads[0].start()
+        started.wait(5)
+        for index in range(waiters):
+            coalescer = coalescers[(index + 1) % len(coalescers)]
+            threads.append(threading.Thread(target=request, args=(coalescer,)))
+            threads[-1].start()
+        # Give the waiters time to reach the flight or the lock.
+        threading.Event().wait(0.2)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        return sorted(results, key=str), len(calls)
+
+    def test_waiters_share_the_result(self):
+        """
+        Test that identical concurrent requests are computed once.
+        """
+        results, calls = self.race([Coalescer()])
+        self.assertEqual(calls, 1)
+        self.assertEqual(results, [42, 42, 42, 42, "leader"])
+
+    def test_unshared_result_is_recomputed(self):
+        """
+        Test that waiters compute themselves when the leader's result is private.
+        """
+        results, calls = self.race([Coalescer()], shared=False, waiters=2)
+        self.assertEqual(calls, 3)
+        self.assertEqual(results, ["leader"] * 3)
+
+    @override_settings(COALESCE_TIMEOUT=0.05)
+    def test_timeout(self):
+        """
+        Test that a waiter stops waiting for a slow leader.
+        """
+        _, calls = self.race([Coalescer()], waiters=1)
+        self.assertEqual(calls, 2)
+
+    def test_across_workers(self):
+        """
+        Test that coalescers in different workers share through the lock files.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            with self.settings(COALESCE_BACKEND="file", COALESCE_LOCK_DIR=directory):
+                results, calls = self.race([Coalescer(), Coalescer()], waiters=3)
+        self.assertEqual(calls, 1)
+        self.assertEqual(results, [42, 42, 42, "leader"])
+
+    def test_other_key_in_the_same_slot_does_not_wait(self):
+        """
+        Test that a key sharing a lock file with a busy leader is computed at once.
+        """
+        started, release = threading.Event(), threading.Event()
+
+        def slow():
+            started.set()
+            release.wait(5)
+            return "a", {"value": "a"}
+
+        with tempfile.TemporaryDirectory() as directory:
+            with self.settings(
+                COALESCE_BACKEND="file",
+                COALESCE_LOCK_DIR=directory,
+                COALESCE_LOCK_SLOTS=1,
+                COALESCE_TIMEOUT=2,
+            ):
+                leader = threading.Thread(
+                    target=Coalescer().run, args=("a", slow, lambda result: result)
+                )
+                leader.start()
+                started.wait(5)
+                waited = time.monotonic()
+                result = Coalescer().run("b", lambda: ("b", None), lambda result: result)
+                waited = time.monotonic() - waited
+                release.set()
+                leader.join(5)
+        self.assertEqual(result, "b")
+        self.assertLess(waited, 1)
+
+    @override_settings(ALLOWED_HOSTS=["testserver", "other.example"])
+    def test_key_includes_scheme_and_host(self):
+        """
+        Test that requests differing only in scheme or host are not coalesced.
+        """
+        factory = APIRequestFactory()
+        keys = set()
+        for extra in ({}, {"HTTP_HOST": "other.example"}, {"secure": True}):
+            request = Request(factory.get("/tags/", **extra))
+            request.accepted_media_type = "application/json"
+            keys.add(CoalescedGetMixin().get_coalesce_key(request))
+        self.assertEqual(len(keys), 3)
+
+    @override_settings(DATABASE_REPLICAS={"replica": 1}, COALESCE_TIMEOUT=2)
+    def test_pinned_request_is_not_coalesced(self):
+        """
+        Test that a GET pinned to the primary never shares an unpinned result.
+        """
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        class SlowView:
+            def get(self, request):
+                calls.append(1)
+                if len(calls) == 1:
+                    started.set()
+                    release.wait(5)
+                return Response({"call": len(calls)})
+
+        class View(CoalescedGetMixin, SlowView):
+            pass
+
+        def get():
+            request = Request(APIRequestFactory().get("/tags/"))
+            request.accepted_media_type = "application/json"
+            return View().get(request)
+
+        def unpinned():
+            with replica_reads():
+                get()
+
+        leader = threading.Thread(target=unpinned)
+        leader.start()
+        started.wait(5)
+        waited = time.monotonic()
+        response = get()
+        waited = time.monotonic() - waited
+        release.set()
+        leader.join(5)
+        self.assertEqual(response.data, {"call": 2})
+        self.assertLess(waited, 1)
+
+    def test_normalize_query(self):
+        """
+        Test that parameter order does not change the key.
+        """
+        self.assertEqual(normalize_query("page=2&count=none"), normalize_query("count=none&page=2"))
+        self.assertNotEqual(normalize_query("page=2"), normalize_query("page=3"))
+
+
+class CoalescedViewTestCase(TestCase):
+    """
+    Test cases for the views using CoalescedGetMixin.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.tag = Tag.objects.create(name="red")
+
+    def test_views_still_answer(self):
+        """
+        Test that coalesced list and detail views return their usual responses.
+        """
+        response = self.client.get(reverse("tag-list-create"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]["name"], "red")
+        response = self.client.get(reverse("tag-detail", args=[self.tag.pk]))
+        self.assertEqual(response.json()["name"], "red")
+        response = self.client.get(reverse("tag-detail", args=[self.tag.pk + 1]))
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,115 @@
+"""
+Module docstring: This module contains test cases for the tag co-occurrence index.
+"""
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.cooccurrence import rebuild_cooccurrence
+from core.models import Photo, Tag, TagCooccurrence, Video
+
+
+class TagCooccurrenceTestCase(TestCase):
+    """
+    Test cases for incremental maintenance and rebuild of TagCooccurrence.
+    """
+
+    def setUp(self):
+        self.red, self.green, self.blue, self.grey = (
+            Tag.objects.create(name=name) for name in ("red", "green", "blue", "grey")
+        )
+        self.photo = Photo.objects.create(title="Photo")
+        self.video = Video.objects.create(title="Video")
+
+    def counts(self):
+        return dict(
+            ((tag, other), count)
+            for tag, other, count in TagCooccurrence.objects.values_list(
+                "tag_id", "other_id", "count"
+            )
+        )
+
+    def assertMatchesRebuild(self):
+        incremental = self.counts()
+        rebuild_cooccurrence()
+        self.assertEqual(incremental, self.counts())
+        return incremental
+
+    def test_forward_changes(self):
+        """
+        Test adding, removing and clearing tags on a photo.
+        """
+        self.photo.tags.add(self.red, self.green)
+        self.photo.tags.add(self.blue)
+        counts = self.assertMatchesRebuild()
+        self.assertEqual(counts[(self.red.pk, self.blue.pk)], 1)
+        self.assertEqual(len(counts), 6)
+
+        self.photo.tags.remove(self.green, self.grey)
+        counts = self.assertMatchesRebuild()
+        self.assertEqual(set(counts), {(self.red.pk, self.blue.pk), (self.blue.pk, self.red.pk)})
+
+        self.photo.tags.clear()
+        self.assertEqual(self.assertMatchesRebuild(), {})
+
+    def test_counts_span_photos_and_videos(self):
+        """
+        Test that photos and videos add to the same pair counts.
+        """
+        self.photo.tags.set([self.red, self.green])
+        self.video.tags.set([self.red, self.green, self.grey])
+        counts = self.assertMatchesRebuild()
+        self.assertEqual(counts[(self.green.pk, self.red.pk)], 2)
+        self.assertEqual(counts[(self.grey.pk, self.red.pk)], 1)
+
+    def test_reverse_changes(self):
+        """
+        Test adding and clearing media from the tag side.
+        """
+        other = Photo.objects.create(title="Other")
+        self.photo.tags.add(self.red)
+        other.tags.add(self.red, self.green)
+        self.blue.photos.add(self.photo, other)
+        counts = self.assertMatchesRebuild()
+        self.assertEqual(counts[(self.blue.pk, self.red.pk)], 2)
+
+        self.blue.photos.remove(other)
+        self.assertMatchesRebuild()
+        self.red.photos.clear()
+        self.assertEqual(self.assertMatchesRebuild(), {})
+
+    def test_deleting_media_removes_pairs(self):
+        """
+        Test that deleting a photo releases its pairs.
+        """
+        self.photo.tags.add(self.red, self.green)
+        self.video.tags.add(self.red, self.green)
+        self.photo.delete()
+        self.assertEqual(self.assertMatchesRebuild()[(self.red.pk, self.green.pk)], 1)
+
+    def test_related_tags_endpoint(self):
+        """
+        Test that related tags come back most frequent first.
+        """
+        self.photo.tags.add(self.red, self.green, self.blue)
+        self.video.tags.add(self.red, self.green)
+        url = reverse("tag-related", args=[self.red.pk])
+        with self.assertNumQueries(1):
+            response = APIClient().get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(item["name"], item["count"]) for item in response.data],
+            [("green", 2), ("blue", 1)],
+        )
+
+    def test_rebuild_command(self):
+        """
+        Test the rebuild_tag_cooccurrence management command.
+        """
+        self.photo.tags.add(self.red, self.green)
+        TagCooccurrence.objects.all().delete()
+        call_command("rebuild_tag_cooccurrence", stdout=open("/dev/null", "w"))
+        self.assertEqual(TagCooccurrence.objects.count(), 2)
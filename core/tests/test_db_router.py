@@ -0,0 +1,138 @@
+"""
+Module docstring: This module contains test cases for read-replica routing.
+"""
+
+import os
+import tempfile
+from unittest import mock
+
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from core.db_router import ReplicaPool, ReplicaRouter, replica_reads
+from core.middleware import PIN_COOKIE_NAME, ReplicaRoutingMiddleware
+from core.models import Photo
+
+
+class ReplicaPoolTestCase(SimpleTestCase):
+    """
+    Test cases for weighted replica selection and failover.
+    """
+
+    def test_choose_skips_unreachable_replica(self):
+        """
+        Test that a failing replica is marked down and another is chosen.
+        """
+        pool = ReplicaPool({"replica1": 1, "replica2": 1})
+        reachable = {"replica1": False, "replica2": True}
+
+        def is_reachable(alias):
+            if not reachable[alias]:
+                pool.mark_down(alias)
+            return reachable[alias]
+
+        with mock.patch.object(pool, "is_reachable", side_effect=is_reachable):
+            for _ in range(10):
+                self.assertEqual(pool.choose(), "replica2")
+        self.assertEqual(pool.healthy(), ["replica2"])
+
+    def test_choose_falls_back_to_primary(self):
+        """
+        Test that None (the primary) is returned when no replica is reachable.
+        """
+        pool = ReplicaPool({"replica1": 1})
+        with mock.patch.object(pool, "is_reachable", return_value=False):
+            self.assertIsNone(pool.choose())
+
+    def test_zero_weight_is_ignored(self):
+        """
+        Test that replicas with weight 0 are never selected.
+        """
+        pool = ReplicaPool({"replica1": 0, "replica2": 3})
+        self.assertEqual(pool.healthy(), ["replica2"])
+
+
+@override_settings(DATABASE_REPLICAS={"replica1": 1})
+class ReplicaRouterTestCase(SimpleTestCase):
+    """
+    Test cases for the ReplicaRouter.
+    """
+
+    def test_reads_use_primary_outside_replica_context(self):
+        """
+        Test that reads default to the primary.
+        """
+        router = ReplicaRouter()
+        self.assertIsNone(router.db_for_read(Photo))
+        self.assertEqual(router.db_for_write(Photo), "default")
+
+    def test_reads_use_replica_inside_replica_context(self):
+        """
+        Test that replica-safe reads are routed to a replica.
+        """
+        router = ReplicaRouter()
+        with mock.patch.object(router.pool, "is_reachable", return_value=True):
+            with replica_reads():
+                self.assertEqual(router.db_for_read(Photo), "replica1")
+
+    def test_replicas_are_not_migrated(self):
+        """
+        Test that migrations only run on the primary.
+        """
+        router = ReplicaRouter()
+        self.assertFalse(router.allow_migrate("replica1", "core"))
+        self.assertIsNone(router.allow_migrate("default", "core"))
+
+
+SHARED_CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.path.join(tempfile.gettempdir(), "ideal-test-cache"),
+    }
+}
+
+
+@override_settings(
+    DATABASE_REPLICAS={"replica1": 1}, REPLICA_PIN_SECONDS=5, CACHES=SHARED_CACHES
+)
+class ReplicaRoutingMiddlewareTestCase(SimpleTestCase):
+    """
+    Test cases for read-your-writes pinning.
+    """
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.seen = []
+
+        def get_response(request):
+            router = ReplicaRouter()
+            with mock.patch.object(router.pool, "is_reachable", return_value=True):
+                self.seen.append(router.db_for_read(Photo))
+            return HttpResponse(status=201 if request.method == "POST" else 200)
+
+        self.middleware = ReplicaRoutingMiddleware(get_response)
+
+    def test_write_pins_client_to_primary(self):
+        """
+        Test that a write sets the pin cookie and pinned reads use the primary.
+        """
+        response = self.middleware(self.factory.post("/photos/"))
+        self.assertIn(PIN_COOKIE_NAME, response.cookies)
+
+        request = self.factory.get("/photos/")
+        request.COOKIES[PIN_COOKIE_NAME] = response.cookies[PIN_COOKIE_NAME].value
+        self.middleware(request)
+        self.middleware(self.factory.get("/photos/"))
+        self.assertEqual(self.seen, [None, None, "replica1"])
+
+    def test_process_local_cache_is_refused(self):
+        """
+        Test that pins kept in a per-process cache are refused at startup.
+        """
+        locmem = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+        with self.settings(CACHES=locmem):
+            with self.assertRaises(ImproperlyConfigured):
+                ReplicaRoutingMiddleware(lambda request: HttpResponse())
+            with self.settings(REPLICA_PIN_SECONDS=0):
+                ReplicaRoutingMiddleware(lambda request: HttpResponse())
@@ -0,0 +1,123 @@
+"""
+Module docstring: This module contains test cases for near-duplicate photo detection.
+"""
+
+import io
+import random
+import shutil
+import tempfile
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework.test import APIClient
+
+from core.duplicates import BKTree, band_neighbours, cluster_hashes, hamming, near_duplicates
+from core.jobs import run_pending_jobs
+from core.media import image_dhash
+from core.models import Photo
+
+
+def sample_image(seed, size=(160, 120)):
+    rng = random.Random(seed)
+    image = Image.new("L", (8, 6))
+    image.putdata([rng.randrange(256) for _ in range(48)])
+    return image.resize(size, Image.BILINEAR).convert("RGB")
+
+
+def encode(image, fmt="JPEG", **params):
+    buffer = io.BytesIO()
+    image.save(buffer, fmt, **params)
+    buffer.seek(0)
+    return buffer
+
+
+class HashIndexTestCase(SimpleTestCase):
+    """
+    Test cases for the perceptual hash and the in-memory index.
+    """
+
+    def test_dhash_survives_reencoding_and_resizing(self):
+        original = sample_image(1)
+        value = image_dhash(Image.open(encode(original, quality=95)))
+        resized = image_dhash(Image.open(encode(original.resize((80, 60)), quality=60)))
+        other = image_dhash(Image.open(encode(sample_image(2), quality=95)))
+        self.assertLessEqual(hamming(value, resized), 4)
+        self.assertGreater(hamming(value, other), 12)
+
+    def test_band_neighbours(self):
+        self.assertEqual(band_neighbours(5, 0), [5])
+        neighbours = band_neighbours(0, 2)
+        self.assertEqual(len(neighbours), 1 + 16 + 120)
+        self.assertTrue(all(bin(value).count("1") <= 2 for value in neighbours))
+
+    def test_bk_tree_matches_brute_force(self):
+        rng = random.Random(3)
+        base = [rng.getrandbits(64) for _ in range(20)]
+        hashes = [value ^ (1 << rng.randrange(64)) for value in base for _ in range(5)]
+        tree = BKTree()
+        for index, value in enumerate(hashes):
+            tree.add(value, index)
+        for query in hashes[:10]:
+            expected = sorted(i for i, value in enumerate(hashes) if hamming(query, value) <= 4)
+            self.assertEqual(sorted(item for item, _ in tree.search(query, 4)), expected)
+
+    def test_cluster_hashes(self):
+        clusters = cluster_hashes({"a": 0b0, "b": 0b1, "c": 0b11, "d": 2**63 - 1}, 1)
+        self.assertEqual([sorted(cluster) for cluster in clusters], [["a", "b", "c"]])
+
+
+class NearDuplicateTestCase(TestCase):
+    """
+    Test cases for hashing uploads and looking up their near-duplicates.
+    """
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.override = override_settings(MEDIA_ROOT=self.media_root)
+        self.override.enable()
+        original = sample_image(1)
+        uploads = [
+            ("original.jpg", encode(original, quality=95)),
+            ("smaller.jpg", encode(original.resize((80, 60)), quality=60)),
+            ("other.png", encode(sample_image(2), "PNG")),
+        ]
+        self.photos = [
+            Photo.objects.create(title=name, image=SimpleUploadedFile(name, data.read()))
+            for name, data in uploads
+        ]
+        run_pending_jobs()
+        for photo in self.photos:
+            photo.refresh_from_db()
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def test_uploads_are_hashed(self):
+        original = self.photos[0]
+        self.assertEqual(len(original.phash), 16)
+        self.assertEqual(original.phash_band0, int(original.phash[:4], 16))
+
+    def test_near_duplicates(self):
+        with self.assertNumQueries(1):
+            matches = near_duplicates(self.photos[0], 6)
+        self.assertEqual([photo.pk for photo, _ in matches], [self.photos[1].pk])
+
+    def test_duplicates_endpoint(self):
+        url = reverse("photo-duplicates", args=[str(self.photos[1].id)])
+        response = APIClient().get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item["title"] for item in response.data], ["original.jpg"])
+        self.assertIn("distance", response.data[0])
+        self.assertNotIn("phash_band0", response.data[0])
+        self.assertEqual(APIClient().get(url, {"distance": 99}).status_code, 400)
+
+    def test_cluster_command(self):
+        Photo.objects.filter(pk=self.photos[2].pk).update(phash="")
+        out = io.StringIO()
+        call_command("cluster_duplicates", "--compute-missing", stdout=out)
+        self.assertIn("Hashed 1 photos", out.getvalue())
+        self.assertIn("1 clusters, 1 near-duplicates", out.getvalue())
@@ -0,0 +1,185 @@
+"""
+Module docstring: This module contains test cases for the server-sent event stream.
+"""
+
+import asyncio
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.test import TestCase, override_settings
+
+from core.events import Event, Subscription, broker, event_stream
+from core.models import Photo, Tag
+from core.sync import latest_cursor
+
+
+class StreamClient:
+    """
+    Drives the ASGI event stream like a connected EventSource.
+    """
+
+    def __init__(self, query_string=b"", headers=()):
+        self.scope = {
+            "type": "http",
+            "method": "GET",
+            "path": "/events/",
+            "query_string": query_string,
+            "headers": list(headers),
+        }
+        self.incoming = asyncio.Queue()
+        self.messages = []
+        self.received = asyncio.Event()
+
+    async def receive(self):
+        return await self.incoming.get()
+
+    async def send(self, message):
+        self.messages.append(message)
+        self.received.set()
+
+    @property
+    def body(self):
+        return b"".join(
+            message.get("body", b"")
+            for message in self.messages
+            if message["type"] == "http.response.body"
+        ).decode()
+
+    async def wait_for(self, text, timeout=2):
+        while text not in self.body:
+            self.received.clear()
+            await asyncio.wait_for(self.received.wait(), timeout)
+
+    async def run(self, during=None):
+        """
+        Connect, run ``during(self)``, then disconnect and return the body.
+        """
+        stream = asyncio.ensure_future(event_stream(self.scope, self.receive, self.send))
+        await self.wait_for("retry:")
+        if during is not None:
+            await during(self)
+        await self.incoming.put({"type": "http.disconnect"})
+        await asyncio.wait_for(stream, 2)
+        return self.body
+
+
+class EventStreamTestCase(TestCase):
+    """
+    Test cases for /events/.
+    """
+
+    def setUp(self):
+        self.red = Tag.objects.create(name="red")
+
+    def test_live_events(self):
+        """
+        Test that a change committed while connected is pushed.
+        """
+
+        async def during(client):
+            photo = await sync_to_async(Photo.objects.create)(title="Live")
+            await sync_to_async(photo.tags.add)(self.red)
+            broker.wake()
+            await client.wait_for("photo.upsert")
+
+        client = StreamClient()
+        body = async_to_sync(client.run)(during)
+        self.assertEqual(client.messages[0]["status"], 200)
+        self.assertIn((b"content-type", b"text/event-stream"), client.messages[0]["headers"])
+        self.assertIn('"title":"Live"', body)
+        self.assertEqual(body.count("event: photo.upsert"), 1)
+        self.assertFalse(broker.subscribers)
+
+    def test_resume_with_last_event_id(self):
+        """
+        Test that a reconnecting client is replayed what it missed.
+        """
+        cursor = latest_cursor()
+        photo = Photo.objects.create(title="Missed")
+        photo_id = str(photo.pk)
+        photo.delete()
+        Photo.objects.create(title="Kept")
+        client = StreamClient(headers=[(b"last-event-id", str(cursor).encode())])
+        body = async_to_sync(client.run)()
+        self.assertIn(f'event: photo.delete\ndata: {{"id":"{photo_id}"}}', body)
+        self.assertIn('"title":"Kept"', body)
+        self.assertNotIn('"title":"Missed"', body)
+
+    def test_tag_filter(self):
+        """
+        Test that a tag-filtered subscription only sees matching media.
+        """
+        cursor = latest_cursor()
+        Photo.objects.create(title="Untagged")
+        Photo.objects.create(title="Tagged").tags.add(self.red)
+        query = f"tags={self.red.id}&last_event_id={cursor}".encode()
+        body = async_to_sync(StreamClient(query).run)()
+        self.assertIn('"title":"Tagged"', body)
+        self.assertNotIn('"title":"Untagged"', body)
+
+    @override_settings(EVENTS_REPLAY_LIMIT=1)
+    def test_reset_when_too_far_behind(self):
+        """
+        Test that a client too far behind is sent to /sync/.
+        """
+        cursor = latest_cursor()
+        Photo.objects.create(title="One")
+        Photo.objects.create(title="Two")
+        client = StreamClient(headers=[(b"last-event-id", str(cursor).encode())])
+        body = async_to_sync(client.run)()
+        self.assertIn("event: reset", body)
+        self.assertNotIn("photo.upsert", body)
+
+    def test_invalid_filter(self):
+        """
+        Test that a malformed tag filter is rejected.
+        """
+
+        async def run():
+            client = StreamClient(b"tags=red")
+            await event_stream(client.scope, client.receive, client.send)
+            return client.messages[0]["status"]
+
+        self.assertEqual(async_to_sync(run)(), 400)
+
+    def test_slow_subscriber_is_dropped(self):
+        """
+        Test that a full queue ends the subscription instead of growing.
+        """
+
+        async def run():
+            subscription = Subscription(None, 2)
+            for seq in range(5):
+                subscription.offer(Event(seq, "tag", None, b""))
+            return subscription.overflowed, subscription.queue.qsize(), subscription.queue.get_nowait()
+
+        self.assertEqual(async_to_sync(run)(), (True, 1, None))
+
+    @override_settings(CORS_ALLOWED_ORIGINS=["https://app.example"])
+    def test_cors_follows_settings(self):
+        """
+        Test that only allowed origins get CORS headers on the stream.
+        """
+        allowed = StreamClient(headers=[(b"origin", b"https://app.example")])
+        async_to_sync(allowed.run)()
+        self.assertIn(
+            (b"access-control-allow-origin", b"https://app.example"),
+            allowed.messages[0]["headers"],
+        )
+        other = StreamClient(headers=[(b"origin", b"https://evil.example")])
+        async_to_sync(other.run)()
+        self.assertNotIn(b"access-control-allow-origin", dict(other.messages[0]["headers"]))
+
+    def test_events_application_serves_only_the_stream(self):
+        """
+        Test that the events process leaves every other path to the API.
+        """
+        from ideal.asgi import events_application
+
+        async def run():
+            client = StreamClient()
+            client.scope["path"] = "/tags/"
+            await events_application(client.scope, client.receive, client.send)
+            return client.messages[0]["status"]
+
+        self.assertEqual(async_to_sync(run)(), 404)
+
@@ -0,0 +1,178 @@
+"""
+Module docstring: This module contains test cases for Idempotency-Key support.
+"""
+
+import io
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.idempotency import REPLAY_HEADER, prune_expired
+from core.models import IdempotencyKey, Photo, Tag, UserProfile
+
+REGISTRATION = {
+    "email": "newuser@example.com",
+    "username": "newuser",
+    "password": "newpassword",
+    "first_name": "firstname",
+    "last_name": "lastname",
+}
+
+
+class RegisterIdempotencyTestCase(TestCase):
+    """
+    Test cases for Idempotency-Key on /register/.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse("register")
+
+    def post(self, key, data=REGISTRATION):
+        return self.client.post(self.url, data, format="json", HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_replay(self):
+        """
+        Test that a retry gets the first response without registering again.
+        """
+        first = self.post("abc")
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn(REPLAY_HEADER, first)
+        with mock.patch("core.views.RegisterSerializer") as serializer:
+            second = self.post("abc")
+        serializer.assert_not_called()
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second[REPLAY_HEADER], "true")
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(UserProfile.objects.count(), 1)
+        self.assertEqual(IdempotencyKey.objects.count(), 1)
+
+    def test_key_reused_for_another_request(self):
+        """
+        Test that a key cannot replay the response to a different body.
+        """
+        self.post("abc")
+        response = self.post("abc", {**REGISTRATION, "password": "guess"})
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    def test_multipart_of_the_same_length(self):
+        """
+        Test that a multipart body is fingerprinted by content, not length.
+        """
+        first = self.client.post(self.url, REGISTRATION, HTTP_IDEMPOTENCY_KEY="abc")
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        response = self.client.post(
+            self.url, {**REGISTRATION, "password": "guesspasswd"}, HTTP_IDEMPOTENCY_KEY="abc"
+        )
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        response = self.client.post(self.url, REGISTRATION, HTTP_IDEMPOTENCY_KEY="abc")
+        self.assertEqual(response[REPLAY_HEADER], "true")
+
+    def test_failure_is_not_stored(self):
+        """
+        Test that an error response frees the key for a corrected retry.
+        """
+        response = self.post("abc", {**REGISTRATION, "email": "not an email"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    @override_settings(IDEMPOTENCY_LOCK_TIMEOUT=0.1)
+    def test_duplicate_in_progress(self):
+        """
+        Test that a duplicate waits for the first request, then gives up.
+        """
+        self.post("abc")
+        IdempotencyKey.objects.update(status_code=None)
+        response = self.post("abc")
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    def test_expired_keys(self):
+        """
+        Test that expired keys are pruned and no longer replayed.
+        """
+        self.post("abc")
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        response = self.post("abc", {**REGISTRATION, "email": "other@example.com", "username": "other"})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn(REPLAY_HEADER, response)
+
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(prune_expired(force=True), 1)
+
+    def test_without_key(self):
+        """
+        Test that requests without the header are not recorded.
+        """
+        self.client.post(self.url, REGISTRATION, format="json")
+        self.assertFalse(IdempotencyKey.objects.exists())
+        response = self.post("x" * 256)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PhotoIdempotencyTestCase(TestCase):
+    """
+    Test cases for Idempotency-Key on photo uploads.
+    """
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.override = override_settings(MEDIA_ROOT=self.media_root)
+        self.override.enable()
+        self.client = APIClient()
+        self.user = UserProfile.objects.create_user(
+            email="test@example.com", username="testuser", password="testpassword"
+        )
+        self.other = UserProfile.objects.create_user(
+            email="other@example.com", username="otheruser", password="otherpassword"
+        )
+        self.tag = Tag.objects.create(name="sky")
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def upload(self, user, key, color="lime"):
+        token = RefreshToken.for_user(user).access_token
+        buffer = io.BytesIO()
+        Image.new("RGB", (8, 8), color).save(buffer, "PNG")
+        return self.client.post(
+            reverse("photo-list-create"),
+            {"title": "Sky", "tags": [self.tag.pk], "image": SimpleUploadedFile("sky.png", buffer.getvalue())},
+            HTTP_AUTHORIZATION=f"Bearer {token}",
+            HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_retried_upload(self):
+        """
+        Test that a retried upload creates one photo, and keys are per user.
+        """
+        first = self.upload(self.user, "upload-1")
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        second = self.upload(self.user, "upload-1")
+        self.assertEqual(second[REPLAY_HEADER], "true")
+        self.assertEqual(second.json()["id"], first.json()["id"])
+        self.assertEqual(Photo.objects.count(), 1)
+
+        other = self.upload(self.other, "upload-1")
+        self.assertNotIn(REPLAY_HEADER, other)
+        self.assertEqual(Photo.objects.count(), 2)
+
+    def test_other_file_of_the_same_length(self):
+        """
+        Test that a key reused for another file of the same size is refused.
+        """
+        first = self.upload(self.user, "upload-1")
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        second = self.upload(self.user, "upload-1", color="yellow")
+        self.assertEqual(second.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Photo.objects.count(), 1)
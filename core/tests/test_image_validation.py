@@ -0,0 +1,153 @@
+"""
+Module docstring: This module contains test cases for the bounded image upload validation.
+"""
+
+import io
+import shutil
+import struct
+import tempfile
+import zlib
+
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.image_validation import validate_image
+from core.models import Photo, Tag, UserProfile
+
+
+def png_bytes(size=(8, 8)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, "red").save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def png_header(width, height):
+    """
+    Return a PNG with a valid header claiming ``width`` x ``height`` and no pixels.
+    """
+    def chunk(kind, data):
+        return (
+            struct.pack(">I", len(data))
+            + kind
+            + data
+            + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+        )
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IEND", b"")
+
+
+class ValidateImageTestCase(SimpleTestCase):
+    """
+    Test cases for core.image_validation.validate_image.
+    """
+
+    def check(self, content, name="upload.png"):
+        return validate_image(SimpleUploadedFile(name, content))
+
+    def test_valid_image(self):
+        """
+        Test that a small image passes, including the decode in the worker.
+        """
+        self.assertEqual(self.check(png_bytes()), "PNG")
+
+    @override_settings(IMAGE_UPLOAD_MAX_BYTES=10)
+    def test_too_many_bytes(self):
+        """
+        Test that the byte limit is enforced.
+        """
+        with self.assertRaisesMessage(ValidationError, "larger than 10 bytes"):
+            self.check(png_bytes())
+
+    def test_not_an_image(self):
+        """
+        Test that files without a known signature are refused.
+        """
+        with self.assertRaisesMessage(ValidationError, "Supported formats"):
+            self.check(b"<svg xmlns='http://www.w3.org/2000/svg'/>", "a.png")
+
+    def test_decompression_bomb(self):
+        """
+        Test that oversized dimensions are refused from the header alone.
+        """
+        with self.assertRaisesMessage(ValidationError, "10000x10000 pixels"):
+            self.check(png_header(10000, 10000))
+        with self.assertRaisesMessage(ValidationError, "pixels are allowed"):
+            self.check(png_header(100000, 100000))
+
+    def test_truncated_pixels(self):
+        """
+        Test that the worker reports images whose pixels cannot be decoded.
+        """
+        with self.assertRaisesMessage(ValidationError, "could not be decoded"):
+            self.check(png_bytes((64, 64))[:-30])
+
+    @override_settings(IMAGE_DECODE_TIMEOUT=0.001)
+    def test_timeout(self):
+        """
+        Test that a decode that takes too long is abandoned.
+        """
+        # Large enough that the worker cannot finish within the timeout.
+        with self.assertRaisesMessage(ValidationError, "too long"):
+            self.check(png_bytes((4000, 4000)))
+        with self.settings(IMAGE_DECODE_TIMEOUT=30):
+            self.assertEqual(self.check(png_bytes()), "PNG")
+
+
+class PhotoUploadValidationTestCase(TestCase):
+    """
+    Test cases for image validation on the photo endpoints.
+    """
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.override = override_settings(MEDIA_ROOT=self.media_root)
+        self.override.enable()
+        self.client = APIClient()
+        user = UserProfile.objects.create_user(
+            email="test@example.com", username="testuser", password="testpassword"
+        )
+        token = RefreshToken.for_user(user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.tag = Tag.objects.create(name="sky")
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def upload(self, content):
+        return self.client.post(
+            reverse("photo-list-create"),
+            {
+                "title": "Sky",
+                "tags": [self.tag.pk],
+                "image": SimpleUploadedFile("sky.png", content),
+            },
+        )
+
+    def test_upload(self):
+        """
+        Test that valid uploads are stored and invalid ones refused.
+        """
+        response = self.upload(png_bytes())
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Photo.objects.get().width, 8)
+
+        response = self.upload(png_header(100000, 100000))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("image", response.data)
+        self.assertEqual(Photo.objects.count(), 1)
+
+    @override_settings(IMAGE_UPLOAD_MAX_BYTES=100, DATA_UPLOAD_MAX_MEMORY_SIZE=100)
+    def test_body_too_large(self):
+        """
+        Test that oversized bodies are refused before they are read.
+        """
+        response = self.upload(png_bytes((64, 64)) + b"\0" * 1000)
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
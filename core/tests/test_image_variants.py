@@ -0,0 +1,115 @@
+"""
+Module docstring: This module contains test cases for WebP/AVIF photo delivery.
+"""
+
+import io
+import os
+import shutil
+import tempfile
+import time
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework.test import APIClient
+
+from core.image_variants import negotiate_format, original_stem, variant_name
+from core.media_gc import MediaGarbageCollector
+from core.models import Photo
+from core.storage import media_storage
+
+BROWSER_ACCEPT = "image/avif,image/webp,image/apng,image/*,*/*;q=0.8"
+
+
+def jpeg_upload(name="photo.jpg", colour=(200, 30, 30)):
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 48), colour).save(buffer, "JPEG", quality=95)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/jpeg")
+
+
+@override_settings(PHOTO_IMAGE_FORMATS=["webp"])
+class NegotiateFormatTestCase(SimpleTestCase):
+    """
+    Test cases for choosing an output format from the Accept header.
+    """
+
+    def test_negotiate_format(self):
+        self.assertEqual(negotiate_format(BROWSER_ACCEPT, "image/jpeg"), "webp")
+        self.assertIsNone(negotiate_format("image/*,*/*", "image/jpeg"))
+        self.assertIsNone(negotiate_format("image/webp;q=0", "image/png"))
+        self.assertIsNone(negotiate_format(BROWSER_ACCEPT, "image/gif"))
+
+    def test_variant_names(self):
+        with self.settings(PHOTO_WEBP_QUALITY=75):
+            name = variant_name("photos/ab/cd/abcd.jpg", "webp")
+        self.assertEqual(name, "photos/ab/cd/abcd.q75.webp")
+        self.assertEqual(original_stem(name), "photos/ab/cd/abcd")
+        self.assertIsNone(original_stem("photos/ab/cd/abcd.webp"))
+
+
+@override_settings(PHOTO_IMAGE_FORMATS=["webp"])
+class PhotoImageViewTestCase(TestCase):
+    """
+    Test cases for serving photos in negotiated formats.
+    """
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.override = override_settings(MEDIA_ROOT=self.media_root)
+        self.override.enable()
+        self.client = APIClient()
+        self.photo = Photo.objects.create(title="Photo", image=jpeg_upload())
+        self.url = reverse("photo-image", args=[str(self.photo.id)])
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def test_webp_is_built_once(self):
+        response = self.client.get(self.url, HTTP_ACCEPT=BROWSER_ACCEPT)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/webp")
+        self.assertIn("Accept", response["Vary"].split(", "))
+        body = b"".join(response.streaming_content)
+        self.assertEqual(Image.open(io.BytesIO(body)).format, "WEBP")
+        variant = variant_name(self.photo.image.name, "webp")
+        mtime = os.path.getmtime(media_storage.path(variant))
+        self.client.get(self.url, HTTP_ACCEPT=BROWSER_ACCEPT)
+        self.assertEqual(os.path.getmtime(media_storage.path(variant)), mtime)
+        not_modified = self.client.get(
+            self.url, HTTP_ACCEPT=BROWSER_ACCEPT, HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_original_without_support(self):
+        response = self.client.get(self.url, HTTP_ACCEPT="image/*")
+        self.assertEqual(response["Content-Type"], "image/jpeg")
+        self.assertIn("Accept", response["Vary"].split(", "))
+
+    def test_original_when_transcoding_fails(self):
+        with self.settings(IMAGE_UPLOAD_MAX_PIXELS=100), self.assertLogs("core.image_variants"):
+            response = self.client.get(self.url, HTTP_ACCEPT=BROWSER_ACCEPT)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/jpeg")
+
+        broken = media_storage.save("photos/b.jpg", SimpleUploadedFile("b.jpg", b"not a jpeg"))
+        Photo.objects.filter(pk=self.photo.pk).update(image=broken)
+        with self.assertLogs("core.image_variants"):
+            response = self.client.get(self.url, HTTP_ACCEPT=BROWSER_ACCEPT)
+        self.assertEqual(response["Content-Type"], "image/jpeg")
+        self.assertEqual(b"".join(response.streaming_content), b"not a jpeg")
+
+    def test_gc_keeps_variants_of_referenced_photos(self):
+        self.client.get(self.url, HTTP_ACCEPT=BROWSER_ACCEPT)
+        variant = variant_name(self.photo.image.name, "webp")
+        orphan = media_storage.save("photos/orphan.jpg", jpeg_upload("orphan.jpg", (30, 30, 200)))
+        orphan_variant = variant_name(orphan, "webp")
+        shutil.copy(media_storage.path(variant), media_storage.path(orphan_variant))
+        old = time.time() - 3 * 24 * 3600
+        for name in (variant, orphan, orphan_variant, self.photo.image.name):
+            os.utime(media_storage.path(name), (old, old))
+        MediaGarbageCollector().run()
+        self.assertTrue(media_storage.exists(variant))
+        self.assertFalse(media_storage.exists(orphan))
+        self.assertFalse(media_storage.exists(orphan_variant))
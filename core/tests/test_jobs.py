@@ -0,0 +1,129 @@
+"""
+Module docstring: This module contains test cases for the background job runner.
+"""
+
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core.jobs import HANDLERS, claim_jobs, register, requeue_stale_jobs, run_job
+from core.models import Job, Photo
+
+CALLS = []
+
+
+@register("test.record")
+def record(value):
+    CALLS.append(value)
+
+
+@register("test.fail", on_failure=lambda value: CALLS.append(f"gave up {value}"))
+def fail(value):
+    raise RuntimeError(value)
+
+
+def broken_failure_handler(value):
+    raise RuntimeError(f"cleanup of {value}")
+
+
+@register("test.fail_twice", on_failure=broken_failure_handler)
+def fail_twice(value):
+    raise RuntimeError(value)
+
+
+class JobRunnerTestCase(TestCase):
+    """
+    Test cases for claiming, running and retrying jobs.
+    """
+
+    def setUp(self):
+        CALLS.clear()
+
+    def test_claimed_job_is_not_claimed_twice(self):
+        """
+        Test that a job is handed to only one worker.
+        """
+        Job.objects.enqueue("test.record", value=1)
+        first = claim_jobs("worker-1")
+        self.assertEqual(len(first), 1)
+        self.assertEqual(claim_jobs("worker-2"), [])
+        self.assertEqual(first[0].status, Job.RUNNING)
+        self.assertEqual(first[0].attempts, 1)
+
+    def test_successful_job_is_done(self):
+        """
+        Test that a job runs its handler with the payload.
+        """
+        Job.objects.enqueue("test.record", value=42)
+        call_command("run_workers", "--once", stdout=open("/dev/null", "w"))
+        self.assertEqual(CALLS, [42])
+        self.assertEqual(Job.objects.get().status, Job.DONE)
+
+    @override_settings(JOB_MAX_ATTEMPTS=2, JOB_RETRY_BASE_DELAY=60)
+    def test_failed_job_is_retried_with_backoff(self):
+        """
+        Test that failures are retried later and eventually marked failed.
+        """
+        job = Job.objects.enqueue("test.fail", value="boom")
+        with self.assertLogs("core.jobs", "ERROR"):
+            run_job(claim_jobs("worker")[0])
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=29))
+        self.assertIn("boom", job.last_error)
+        self.assertEqual(claim_jobs("worker"), [])
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        with self.assertLogs("core.jobs", "ERROR"):
+            run_job(claim_jobs("worker")[0])
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(CALLS, ["gave up boom"])
+
+    @override_settings(JOB_MAX_ATTEMPTS=1)
+    def test_failing_failure_handler(self):
+        """
+        Test that an error in the failure handler is logged and the job still recorded.
+        """
+        job = Job.objects.enqueue("test.fail_twice", value="boom")
+        with self.assertLogs("core.jobs", "ERROR") as logs:
+            self.assertFalse(run_job(claim_jobs("worker")[0]))
+        self.assertIn("cleanup of boom", "\n".join(logs.output))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIsNone(job.locked_at)
+
+    @override_settings(JOB_LOCK_TIMEOUT=60)
+    def test_stale_running_job_is_requeued(self):
+        """
+        Test that jobs held by a dead worker go back to the queue.
+        """
+        Job.objects.enqueue("test.record", value=1)
+        job = claim_jobs("dead-worker")[0]
+        Job.objects.filter(pk=job.pk).update(
+            locked_at=timezone.now() - timedelta(minutes=5)
+        )
+        self.assertEqual(requeue_stale_jobs(), 1)
+        self.assertEqual(len(claim_jobs("worker")), 1)
+
+    def test_unknown_kind_fails(self):
+        """
+        Test that a job without a handler is recorded as an error.
+        """
+        self.assertNotIn("test.missing", HANDLERS)
+        Job.objects.enqueue("test.missing")
+        with self.assertLogs("core.jobs", "ERROR"):
+            self.assertFalse(run_job(claim_jobs("worker")[0]))
+
+    def test_photo_job_is_idempotent(self):
+        """
+        Test that processing an already processed photo is a no-op.
+        """
+        photo = Photo.objects.create(title="No image")
+        Job.objects.enqueue("photo.process", photo_id=str(photo.pk))
+        job = claim_jobs("worker")[0]
+        # One SELECT for the photo, one UPDATE marking the job done.
+        with self.assertNumQueries(2):
+            self.assertTrue(run_job(job))
@@ -0,0 +1,103 @@
+"""
+Module docstring: This module contains test cases for the orphaned media garbage collector.
+"""
+
+import io
+import os
+import shutil
+import tempfile
+import time
+
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from core.media_gc import MediaGarbageCollector, iter_media_files
+from core.models import MediaBlob, Video
+from core.storage import media_storage
+
+
+class MediaGarbageCollectorTestCase(TestCase):
+    """
+    Test cases for gc_media and MediaGarbageCollector.
+    """
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.override = override_settings(MEDIA_ROOT=self.media_root)
+        self.override.enable()
+        self.video = Video.objects.create(title="Kept")
+        self.video.video_file.save("kept.mp4", ContentFile(b"kept"))
+        orphan = Video.objects.create(title="Deleted")
+        orphan.video_file.save("gone.mp4", ContentFile(b"gone"))
+        self.orphan_name = orphan.video_file.name
+        orphan.delete()
+        self.recent_name = media_storage.save("videos/new.mp4", ContentFile(b"new"))
+        old = time.time() - 3 * 24 * 3600
+        for name in (self.video.video_file.name, self.orphan_name):
+            os.utime(media_storage.path(name), (old, old))
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def test_dry_run_removes_nothing(self):
+        """
+        Test that a dry run only reports old orphans.
+        """
+        out = io.StringIO()
+        call_command("gc_media", "--dry-run", stdout=out)
+        self.assertIn("Would remove 1 orphans", out.getvalue())
+        self.assertTrue(media_storage.exists(self.orphan_name))
+
+    def test_old_orphans_are_deleted(self):
+        """
+        Test that only unreferenced files past the grace period are removed.
+        """
+        stats = MediaGarbageCollector(batch_size=1).run()
+        self.assertEqual(stats["scanned"], 3)
+        self.assertEqual(stats["removed"], 1)
+        self.assertFalse(media_storage.exists(self.orphan_name))
+        self.assertTrue(media_storage.exists(self.video.video_file.name))
+        self.assertTrue(media_storage.exists(self.recent_name))
+        self.assertFalse(MediaBlob.objects.filter(name=self.orphan_name).exists())
+
+    def test_reused_orphan_is_kept(self):
+        """
+        Test that an old orphan saved again by a pending upload is within the grace period.
+        """
+        name = media_storage.save("videos/again.mp4", ContentFile(b"gone"))
+        self.assertEqual(name, self.orphan_name)
+        stats = MediaGarbageCollector().run()
+        self.assertEqual(stats["removed"], 0)
+        self.assertTrue(media_storage.exists(self.orphan_name))
+
+    def test_orphans_can_be_quarantined(self):
+        """
+        Test that orphans are moved instead of deleted when quarantining.
+        """
+        quarantine = os.path.join(self.media_root, "..", "quarantine-test")
+        self.addCleanup(shutil.rmtree, quarantine, True)
+        MediaGarbageCollector(quarantine=quarantine).run()
+        self.assertTrue(os.path.exists(os.path.join(quarantine, self.orphan_name)))
+
+    def test_resume_skips_processed_files(self):
+        """
+        Test that a resumed scan starts after the checkpointed name.
+        """
+        names = [name for name, _ in iter_media_files(self.media_root, ["photos", "videos"])]
+        self.assertEqual(names, sorted(names, key=lambda name: name.split("/")))
+        resumed = [
+            name
+            for name, _ in iter_media_files(
+                self.media_root, ["photos", "videos"], after=names[0]
+            )
+        ]
+        self.assertEqual(resumed, names[1:])
+
+        checkpoint = os.path.join(self.media_root, "gc.checkpoint")
+        with open(checkpoint, "w", encoding="utf-8") as handle:
+            handle.write(names[-1])
+        stats = MediaGarbageCollector(checkpoint=checkpoint).run(resume=True)
+        self.assertEqual(stats["scanned"], 0)
+        self.assertFalse(os.path.exists(checkpoint))
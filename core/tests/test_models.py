@@ -2,7 +2,14 @@
 Module docstring: This module contains test cases for the models in your Django application.
 """
 
-from django.test import TestCase
+import io
+import shutil
+import tempfile
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+from core.jobs import run_pending_jobs
 from core.models import UserProfile, Tag, Photo, Video
 
 class UserProfileModelTestCase(TestCase):
@@ -62,6 +69,74 @@ class PhotoModelTestCase(TestCase):
         photo = Photo.objects.create(title="Test Photo")
         self.assertEqual(str(photo), "Test Photo")
 
+
+class MediaMetadataTestCase(TestCase):
+    """
+    Test cases for metadata read from uploaded photos and videos.
+    """
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.override = override_settings(MEDIA_ROOT=self.media_root)
+        self.override.enable()
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def test_photo_metadata_is_read_on_upload(self):
+        """
+        Test that dimensions, MIME type and EXIF details are stored.
+        """
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        exif.get_ifd(0x8769)[0x9003] = "2023:09:08 11:11:00"
+        buffer = io.BytesIO()
+        Image.new("RGB", (40, 30), "red").save(buffer, "JPEG", exif=exif)
+        photo = Photo.objects.create(
+            title="Exif Photo",
+            image=SimpleUploadedFile("exif.jpg", buffer.getvalue()),
+        )
+
+        photo.refresh_from_db()
+        self.assertEqual((photo.width, photo.height), (40, 30))
+        self.assertEqual(photo.file_size, len(buffer.getvalue()))
+        self.assertEqual(photo.mime_type, "image/jpeg")
+        self.assertEqual(photo.orientation, 6)
+        self.assertEqual(photo.taken_at.year, 2023)
+        self.assertEqual(photo.processing_status, "pending")
+
+        run_pending_jobs()
+        photo.refresh_from_db()
+        self.assertEqual(photo.processing_status, "ready")
+        self.assertTrue(photo.placeholder)
+
+    def test_photo_metadata_is_cleared_with_image(self):
+        """
+        Test that removing the image clears its metadata.
+        """
+        buffer = io.BytesIO()
+        Image.new("RGB", (8, 8)).save(buffer, "PNG")
+        photo = Photo.objects.create(
+            title="PNG", image=SimpleUploadedFile("a.png", buffer.getvalue())
+        )
+        self.assertEqual(photo.mime_type, "image/png")
+        photo.image = None
+        photo.save()
+        self.assertIsNone(photo.width)
+        self.assertEqual(photo.mime_type, "")
+
+    def test_video_metadata_is_read_on_upload(self):
+        """
+        Test that the MIME type is sniffed from the container header.
+        """
+        content = b"\x00\x00\x00\x18ftypmp42" + b"\x00" * 32
+        video = Video.objects.create(
+            title="Clip", video_file=SimpleUploadedFile("clip.bin", content)
+        )
+        self.assertEqual(video.mime_type, "video/mp4")
+        self.assertEqual(video.file_size, len(content))
+
 class VideoModelTestCase(TestCase):
     """
     Test cases for the Video model.
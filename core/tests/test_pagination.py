@@ -0,0 +1,91 @@
+"""
+Module docstring: This module contains tests for the photo and video list pagination.
+"""
+
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Photo
+
+
+@override_settings(LIST_PAGE_SIZE=2, LIST_EXACT_COUNT_CAP=3)
+class ApproximateCountPaginationTestCase(TestCase):
+    """
+    Test cases for the count modes of ApproximateCountPagination.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.url = reverse("photo-list-create")
+        for index in range(5):
+            Photo.objects.create(title=f"Photo {index}")
+
+    def test_pages(self):
+        first = self.client.get(self.url, {"count": "exact"})
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(first.data["results"]), 2)
+        self.assertIsNone(first.data["previous"])
+        last = self.client.get(self.url, {"count": "none", "page": 3})
+        self.assertEqual(len(last.data["results"]), 1)
+        self.assertIsNone(last.data["next"])
+        self.assertIsNotNone(last.data["previous"])
+        titles = {
+            item["title"]
+            for page in (1, 2, 3)
+            for item in self.client.get(self.url, {"page": page}).data["results"]
+        }
+        self.assertEqual(len(titles), 5)
+
+    def test_invalid_page(self):
+        response = self.client.get(self.url, {"page": "0"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_exact_count_is_capped(self):
+        response = self.client.get(self.url, {"count": "exact"})
+        self.assertEqual(response.data["count"], 3)
+        self.assertEqual(response.data["count_type"], "at_least")
+        with self.settings(LIST_EXACT_COUNT_CAP=10):
+            response = self.client.get(self.url, {"count": "exact"})
+        self.assertEqual(response.data["count"], 5)
+        self.assertEqual(response.data["count_type"], "exact")
+
+    def test_no_count(self):
+        with self.assertNumQueries(1):  # the page, tags from its snapshots
+            response = self.client.get(self.url, {"count": "none"})
+        self.assertNotIn("count", response.data)
+        self.assertIsNotNone(response.data["next"])
+
+    @override_settings(LIST_EXACT_COUNT_CAP=10)
+    def test_estimated_count_is_cached(self):
+        # SQLite has no planner estimate, so the count is cached.
+        response = self.client.get(self.url)
+        self.assertEqual(response.data["count"], 5)
+        self.assertEqual(response.data["count_type"], "estimate")
+        Photo.objects.create(title="Photo 5")
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data["count"], 5)
+
+    def test_estimated_count_without_planner_is_capped(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.data["count"], 3)
+        self.assertEqual(response.data["count_type"], "at_least")
+
+    def test_newest_first(self):
+        Photo.objects.update(created_at=timezone.now() - timedelta(days=1))
+        newest = Photo.objects.create(title="Newest")
+        response = self.client.get(self.url, {"count": "none"})
+        self.assertEqual(response.data["results"][0]["id"], str(newest.pk))
+        titles = [
+            item["title"]
+            for page in (1, 2, 3)
+            for item in self.client.get(self.url, {"page": page}).data["results"]
+        ]
+        self.assertEqual(len(set(titles)), 6)
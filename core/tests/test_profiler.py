@@ -0,0 +1,69 @@
+"""
+Module docstring: This module contains tests for the admin request profiler.
+"""
+
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.models import Photo
+
+User = get_user_model()
+
+
+class RequestProfilerMiddlewareTestCase(TestCase):
+    """
+    Test cases for RequestProfilerMiddleware.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = User.objects.create_superuser(
+            email="admin@example.com", username="admin", password="adminpassword"
+        )
+        self.user = User.objects.create_user(
+            email="user@example.com", username="user", password="userpassword"
+        )
+        Photo.objects.create(title="Photo")
+        self.url = reverse("photo-list-create")
+
+    def authenticate(self, user):
+        token = RefreshToken.for_user(user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def test_summary_for_admin(self):
+        self.authenticate(self.admin)
+        response = self.client.get(self.url, HTTP_X_PROFILE="summary")
+        self.assertEqual(response.status_code, 200)
+        summary = response.json()
+        self.assertEqual(summary["status"], 200)
+        self.assertEqual(summary["path"], self.url)
+        self.assertGreater(summary["sql"]["count"], 0)
+        self.assertTrue(
+            any("core_photo" in query["sql"] for query in summary["sql"]["queries"])
+        )
+        self.assertTrue(summary["functions"])
+
+    def test_profile_file(self):
+        self.authenticate(self.admin)
+        with tempfile.TemporaryDirectory() as directory:
+            with self.settings(REQUEST_PROFILE_DIR=directory):
+                response = self.client.get(self.url, {"_profile": "file"})
+            self.assertEqual(response.status_code, 200)
+            self.assertIn("results", response.json())
+            self.assertTrue(
+                os.path.exists(os.path.join(directory, response["X-Profile-File"]))
+            )
+
+    def test_ignored_for_other_users(self):
+        for user in (None, self.user):
+            if user is not None:
+                self.authenticate(user)
+            response = self.client.get(self.url, HTTP_X_PROFILE="summary")
+            self.assertIn("results", response.json())
+            self.assertNotIn("X-Profile-File", response)
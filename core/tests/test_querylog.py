@@ -0,0 +1,94 @@
+"""
+Module docstring: This module contains tests for the slow query log and SQL shape statistics.
+"""
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.models import Photo
+from core.querylog import QueryStats, normalize_sql, query_stats
+
+User = get_user_model()
+
+
+class NormalizeSqlTestCase(SimpleTestCase):
+    """
+    Test cases for reducing statements to their shape.
+    """
+
+    def test_literals_and_lists_are_collapsed(self):
+        self.assertEqual(
+            normalize_sql(
+                "SELECT * FROM \"core_tag\"  WHERE name = 'it''s' AND id IN (1, 2, 3)"
+            ),
+            normalize_sql('SELECT * FROM "core_tag" WHERE name = \'x\' AND id IN (7)'),
+        )
+        self.assertEqual(
+            normalize_sql('SELECT "a" FROM "t1" WHERE "b" IN (%s, %s) LIMIT 21'),
+            'SELECT "a" FROM "t1" WHERE "b" IN (...) LIMIT ?',
+        )
+
+    @override_settings(SLOW_QUERY_MAX_SHAPES=1)
+    def test_stats(self):
+        stats = QueryStats()
+        stats.record("SELECT 1", 0.002, "a")
+        stats.record("SELECT 2", 0.004, "b")
+        stats.record("SELECT name FROM t", 0.1, "c")
+        [entry] = stats.top()
+        self.assertEqual(entry["count"], 2)
+        self.assertEqual(entry["total_ms"], 6.0)
+        self.assertEqual(entry["max_ms"], 4.0)
+        self.assertEqual(entry["views"], ["a", "b"])
+        self.assertEqual(stats.dropped, 1)
+
+
+@override_settings(SLOW_QUERY_SAMPLE_RATE=1)
+class SlowQueryMiddlewareTestCase(TestCase):
+    """
+    Test cases for collecting and reporting query shapes per view.
+    """
+
+    def setUp(self):
+        query_stats.reset()
+        self.client = APIClient()
+        self.admin = User.objects.create_superuser(
+            email="admin@example.com", username="admin", password="adminpassword"
+        )
+        Photo.objects.create(title="Photo")
+
+    def test_report(self):
+        with self.settings(SLOW_QUERY_THRESHOLD_MS=0), self.assertLogs(
+            "core.querylog", "WARNING"
+        ) as logs:
+            self.client.get(reverse("photo-list-create"), {"count": "exact"})
+        self.assertIn("photo-list-create", logs.output[0])
+        token = RefreshToken.for_user(self.admin).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        with self.settings(SLOW_QUERY_SAMPLE_RATE=0):
+            response = self.client.get(reverse("query-stats"), {"order": "count"})
+        self.assertEqual(response.status_code, 200)
+        shapes = response.data["shapes"]
+        self.assertTrue(any('"core_photo"' in entry["shape"] for entry in shapes))
+        self.assertTrue(all(entry["views"] == ["photo-list-create"] for entry in shapes))
+
+    @override_settings(SLOW_QUERY_SAMPLE_RATE=0)
+    def test_unsampled_requests_log_slow_queries(self):
+        with self.settings(SLOW_QUERY_THRESHOLD_MS=0), self.assertLogs(
+            "core.querylog", "WARNING"
+        ) as logs:
+            self.client.get(reverse("photo-list-create"), {"count": "exact"})
+        self.assertIn("photo-list-create", logs.output[0])
+        self.assertEqual(query_stats.top(), [])
+
+    @override_settings(SLOW_QUERY_SAMPLE_RATE=0)
+    def test_report_is_admin_only(self):
+        user = User.objects.create_user(
+            email="user@example.com", username="user", password="userpassword"
+        )
+        token = RefreshToken.for_user(user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        response = self.client.get(reverse("query-stats"))
+        self.assertEqual(response.status_code, 403)
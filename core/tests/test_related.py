@@ -0,0 +1,150 @@
+"""
+Module docstring: This module contains test cases for related-media recommendations.
+"""
+
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.jobs import run_pending_jobs
+from core.models import Job, Photo, RelatedMedia, Tag
+from core.related import get_related, rebuild_related, refresh_related
+
+
+class RelatedMediaTestCase(TestCase):
+    """
+    Test cases for tag-similarity recommendations.
+    """
+
+    def setUp(self):
+        self.tags = [Tag.objects.create(name=f"tag-{index}") for index in range(4)]
+        self.a = self._photo("A", 0, 1, 2)
+        self.b = self._photo("B", 0, 1)
+        self.c = self._photo("C", 2)
+        self.d = self._photo("D", 3)
+        run_pending_jobs()
+
+    def _photo(self, title, *tags):
+        photo = Photo.objects.create(title=title)
+        photo.tags.set([self.tags[index] for index in tags])
+        return photo
+
+    def test_rebuild_ranks_by_jaccard(self):
+        """
+        Test that the batch rebuild orders items by Jaccard similarity.
+        """
+        RelatedMedia.objects.all().delete()
+        self.assertEqual(rebuild_related("photo", batch_size=2), 4)
+        related = RelatedMedia.objects.get(object_id=self.a.pk).related
+        self.assertEqual(
+            related, [[str(self.b.pk), 0.666667], [str(self.c.pk), 0.333333]]
+        )
+        self.assertEqual(RelatedMedia.objects.get(object_id=self.d.pk).related, [])
+
+    def test_refresh_matches_rebuild(self):
+        """
+        Test that the single-item refresh agrees with the batch rebuild.
+        """
+        rebuild_related("photo")
+        rebuilt = RelatedMedia.objects.get(object_id=self.a.pk).related
+        self.assertEqual(refresh_related("photo", self.a.pk).related, rebuilt)
+
+    def test_cosine_metric(self):
+        """
+        Test the cosine similarity option.
+        """
+        related = refresh_related("photo", self.a.pk, metric="cosine").related
+        self.assertEqual(related[0], [str(self.b.pk), 0.816497])
+
+    def test_tag_change_refreshes_item(self):
+        """
+        Test that changing an item's tags queues a refresh of its list.
+        """
+        self.d.tags.add(self.tags[0])
+        run_pending_jobs()
+        related = RelatedMedia.objects.get(object_id=self.d.pk).related
+        self.assertEqual([item for item, _ in related], [str(self.b.pk), str(self.a.pk)])
+
+    def test_tag_change_refreshes_neighbours(self):
+        """
+        Test that items listed next to a changed item are refreshed too.
+        """
+        self.d.tags.add(self.tags[0])
+        self.c.tags.clear()
+        run_pending_jobs()
+        related = RelatedMedia.objects.get(object_id=self.b.pk).related
+        self.assertEqual([item for item, _ in related], [str(self.a.pk), str(self.d.pk)])
+        related = RelatedMedia.objects.get(object_id=self.a.pk).related
+        self.assertNotIn(str(self.c.pk), [item for item, _ in related])
+
+    def test_tag_delete_refreshes_items(self):
+        """
+        Test that deleting a tag refreshes the items that carried it.
+        """
+        self.tags[2].delete()
+        run_pending_jobs()
+        self.assertEqual(RelatedMedia.objects.get(object_id=self.c.pk).related, [])
+        related = RelatedMedia.objects.get(object_id=self.a.pk).related
+        self.assertEqual(related, [[str(self.b.pk), 1.0]])
+
+    def test_reverse_clear_refreshes_items(self):
+        """
+        Test that clearing a tag's photos refreshes every affected photo.
+        """
+        self.tags[2].photos.clear()
+        run_pending_jobs()
+        self.assertEqual(get_related("photo", self.c.pk), [])
+
+    def test_missing_list_is_queued_not_computed(self):
+        """
+        Test that reading a missing list queues one refresh and answers empty.
+        """
+        RelatedMedia.objects.all().delete()
+        self.assertEqual(get_related("photo", self.a.pk), [])
+        self.assertEqual(get_related("photo", self.a.pk), [])
+        self.assertEqual(Job.objects.filter(status=Job.QUEUED).count(), 1)
+        run_pending_jobs()
+        self.assertEqual(get_related("photo", self.a.pk)[0][0], str(self.b.pk))
+
+    @override_settings(RELATED_MEDIA_MAX_AGE=60)
+    def test_stale_list_is_served_while_refreshed(self):
+        """
+        Test that a stale list is returned as it is and a refresh queued.
+        """
+        stale = [[str(self.d.pk), 1.0]]
+        RelatedMedia.objects.filter(object_id=self.a.pk).update(
+            related=stale, computed_at=timezone.now() - timedelta(minutes=5)
+        )
+        self.assertEqual(get_related("photo", self.a.pk), stale)
+        run_pending_jobs()
+        self.assertEqual(get_related("photo", self.a.pk)[0][0], str(self.b.pk))
+
+    @override_settings(RELATED_MEDIA_CANDIDATES_PER_TAG=1)
+    def test_candidates_per_tag(self):
+        """
+        Test that a refresh only compares the most recently tagged items of each tag.
+        """
+        newest = self._photo("E", 0)
+        related = refresh_related("photo", self.b.pk).related
+        self.assertEqual([item for item, _ in related], [str(newest.pk)])
+
+    def test_related_endpoint(self):
+        """
+        Test the related photos endpoint returns photos in similarity order.
+        """
+        url = reverse("photo-related", args=[str(self.a.pk)])
+        response = APIClient().get(url, {"limit": 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item["title"] for item in response.data], ["B"])
+
+    def test_rebuild_command(self):
+        """
+        Test the rebuild_related management command.
+        """
+        call_command("rebuild_related", "--type", "photo", stdout=open("/dev/null", "w"))
+        self.assertEqual(RelatedMedia.objects.filter(media_type="photo").count(), 4)
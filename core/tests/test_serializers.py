@@ -34,6 +34,25 @@ class RegisterSerializerTest(TestCase):
         serializer = RegisterSerializer(data=data)
         self.assertTrue(serializer.is_valid())
 
+    def test_create_writes_user_once(self):
+        """
+        Test that saving a registration issues a single INSERT.
+        """
+        data = {
+            "email": "newuser@example.com",
+            "username": "newuser",
+            "first_name": "John",
+            "last_name": "Doe",
+            "password": "newpassword",
+        }
+
+        serializer = RegisterSerializer(data=data)
+        self.assertTrue(serializer.is_valid())
+        with self.assertNumQueries(1):
+            user = serializer.save()
+        self.assertTrue(user.check_password("newpassword"))
+        self.assertEqual(user.first_name, "John")
+
     def test_serializer_invalid_data(self):
         """
         Test registration with incomplete data (invalid data).
@@ -134,11 +153,12 @@ class PhotoSerializerTest(TestCase):
 
     def test_serializer(self):
         """
-        Test that the serializer includes the 'title' field.
+        Test that the serializer includes 'title' but not the internal 'tag_snapshot'.
         """
         photo = Photo.objects.create(title="Test Photo")
         serializer = PhotoSerializer(photo)
         self.assertIn("title", serializer.data)
+        self.assertNotIn("tag_snapshot", serializer.data)
 
 
 class VideoSerializerTest(TestCase):
@@ -148,8 +168,9 @@ class VideoSerializerTest(TestCase):
 
     def test_serializer(self):
         """
-        Test that the serializer includes the 'title' field.
+        Test that the serializer includes 'title' but not the internal 'tag_snapshot'.
         """
         video = Video.objects.create(title="Test Video")
         serializer = VideoSerializer(video)
         self.assertIn("title", serializer.data)
+        self.assertNotIn("tag_snapshot", serializer.data)
@@ -0,0 +1,181 @@
+"""
+Module docstring: This module contains test cases for the pre-aggregated catalog statistics.
+"""
+
+import io
+from datetime import date, datetime, timedelta
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.models import MediaDailyStat, Photo, Tag, TagStat, UserProfile, Video
+from core.stats import rebuild_stats
+
+
+def snapshot():
+    daily = {
+        (row.media_type, row.day): (row.count, row.bytes)
+        for row in MediaDailyStat.objects.all()
+        if row.count or row.bytes
+    }
+    tags = {
+        row.tag_id: (row.photo_count, row.video_count, row.total)
+        for row in TagStat.objects.all()
+        if row.total
+    }
+    return daily, tags
+
+
+class StatsTestCase(TestCase):
+    """
+    Test cases for core.stats and the signal handlers maintaining it.
+    """
+
+    def setUp(self):
+        self.red = Tag.objects.create(name="red")
+        self.blue = Tag.objects.create(name="blue")
+        self.today = timezone.localdate()
+
+    def assertMatchesRebuild(self):
+        incremental = snapshot()
+        rebuild_stats()
+        self.assertEqual(incremental, snapshot())
+
+    def test_counts_follow_writes(self):
+        """
+        Test that incremental maintenance agrees with a full rebuild.
+        """
+        first = Photo.objects.create(title="A", image="photos/a.jpg", file_size=100)
+        second = Photo.objects.create(title="B", image="photos/b.jpg", file_size=50)
+        video = Video.objects.create(title="C", file_size=1000)
+        first.tags.add(self.red, self.blue)
+        second.tags.add(self.red)
+        video.tags.add(self.red)
+        self.assertEqual(
+            MediaDailyStat.objects.get(media_type="photo", day=self.today).bytes, 150
+        )
+        self.assertEqual(TagStat.objects.get(tag=self.red).total, 3)
+
+        first.tags.remove(self.red, self.red.pk + 100)
+        self.blue.photos.add(second)
+        self.blue.photos.remove(first)
+        self.red.videos.clear()
+        second.file_size = 70
+        second.save()
+        first.delete()
+        self.assertEqual(
+            MediaDailyStat.objects.get(media_type="photo", day=self.today).bytes, 70
+        )
+        self.assertEqual(TagStat.objects.get(tag=self.red).total, 1)
+        self.assertMatchesRebuild()
+
+    def test_moving_day(self):
+        """
+        Test that changing the upload time moves a row between days.
+        """
+        photo = Photo.objects.create(title="A", image="photos/a.jpg", file_size=10)
+        photo.created_at -= timedelta(days=1)
+        photo.save()
+        yesterday = self.today - timedelta(days=1)
+        self.assertEqual(
+            MediaDailyStat.objects.get(media_type="photo", day=yesterday).count, 1
+        )
+        self.assertEqual(
+            MediaDailyStat.objects.get(media_type="photo", day=self.today).count, 0
+        )
+        self.assertMatchesRebuild()
+
+    def test_tag_delete(self):
+        """
+        Test that deleting a tag drops its counts.
+        """
+        Photo.objects.create(title="A").tags.add(self.red)
+        self.red.delete()
+        self.assertFalse(TagStat.objects.exists())
+        self.assertMatchesRebuild()
+
+    @override_settings(TIME_ZONE="America/New_York")
+    def test_days_follow_time_zone(self):
+        """
+        Test that counting and rebuilding agree on the day outside UTC.
+        """
+        created_at = timezone.make_aware(datetime(2026, 3, 1, 2, 30), timezone.utc)
+        with timezone.override("Asia/Tokyo"):
+            Photo.objects.create(title="A", file_size=10, created_at=created_at)
+        self.assertEqual(MediaDailyStat.objects.get().day, date(2026, 2, 28))
+        with timezone.override("Europe/Paris"):
+            self.assertMatchesRebuild()
+
+    def test_rebuild_command(self):
+        """
+        Test that rebuild_stats repairs counts changed behind its back.
+        """
+        Photo.objects.create(title="A", image="photos/a.jpg", file_size=10).tags.add(self.red)
+        TagStat.objects.update(total=99)
+        out = io.StringIO()
+        call_command("rebuild_stats", stdout=out)
+        self.assertIn("Stored 1 daily rows and 1 tag rows", out.getvalue())
+        self.assertEqual(TagStat.objects.get(tag=self.red).total, 1)
+
+
+class CatalogStatsViewTestCase(TestCase):
+    """
+    Test cases for /stats/.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse("stats")
+        self.admin_user = UserProfile.objects.create_superuser(
+            email="admin@example.com", username="adminuser", password="adminpassword"
+        )
+        self.user = UserProfile.objects.create_user(
+            email="test@example.com", username="testuser", password="testpassword"
+        )
+        self.red = Tag.objects.create(name="red")
+
+    def login(self, user):
+        token = RefreshToken.for_user(user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def get(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url, {"days": 7})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data, len(context.captured_queries)
+
+    def test_stats(self):
+        """
+        Test the report, and that its cost does not depend on the catalog size.
+        """
+        self.login(self.admin_user)
+        Photo.objects.create(title="A", image="photos/a.jpg", file_size=10).tags.add(self.red)
+        data, queries = self.get()
+        self.assertEqual(data["totals"]["photo"], {"count": 1, "bytes": 10})
+        self.assertEqual(data["totals"]["video"], {"count": 0, "bytes": 0})
+        self.assertEqual(data["daily"][0]["photo"]["count"], 1)
+        self.assertEqual(data["tags"][0]["name"], "red")
+        self.assertEqual(data["tags"][0]["photos"], 1)
+
+        for index in range(5):
+            Photo.objects.create(title=str(index), image="photos/a.jpg", file_size=1).tags.add(self.red)
+            Video.objects.create(title=str(index))
+        data, more_queries = self.get()
+        self.assertEqual(data["totals"]["photo"]["count"], 6)
+        self.assertEqual(data["tags"][0]["total"], 6)
+        self.assertEqual(queries, more_queries)
+
+    def test_regular_user_is_forbidden(self):
+        """
+        Test that non-admin users cannot read the statistics.
+        """
+        self.login(self.user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
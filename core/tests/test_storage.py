@@ -0,0 +1,120 @@
+"""
+Module docstring: This module contains test cases for content-addressed media storage.
+"""
+
+import errno
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+
+from core.models import MediaBlob, Photo, Video
+from core.storage import media_storage
+
+
+class ContentAddressedStorageTestCase(TestCase):
+    """
+    Test cases for ContentAddressedStorage and blob reference counting.
+    """
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.override = override_settings(MEDIA_ROOT=self.media_root)
+        self.override.enable()
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def test_name_is_sharded_content_hash(self):
+        """
+        Test that files are stored under their SHA-256 in sharded directories.
+        """
+        name = media_storage.save("photos/Cat.JPG", ContentFile(b"abc"))
+        digest = "ba7816bf8f01cfea414140de5dae2223b00361a396177a9cb410ff61f20015ad"
+        self.assertEqual(name, f"photos/ba/78/{digest}.jpg")
+        self.assertTrue(media_storage.exists(name))
+
+    def test_duplicate_upload_is_not_rewritten(self):
+        """
+        Test that saving identical content reuses the stored file.
+        """
+        first = media_storage.save("videos/a.mp4", ContentFile(b"same bytes"))
+        path = media_storage.path(first)
+        os.utime(path, (0, 0))
+        inode = os.stat(path).st_ino
+        second = media_storage.save("videos/b.mp4", ContentFile(b"same bytes"))
+        self.assertEqual(first, second)
+        self.assertEqual(os.stat(path).st_ino, inode)
+        # The reuse is fresh again for the garbage collector's grace period.
+        self.assertGreater(os.path.getmtime(path), 0)
+
+    def test_concurrent_identical_saves_share_a_name(self):
+        """
+        Test that losing a race to store the same content is a dedupe hit.
+        """
+        name = media_storage.save("photos/a.png", ContentFile(b"race"))
+        path = media_storage.path(name)
+        inode = os.stat(path).st_ino
+        # What a save that hashed its copy before the first one linked does next.
+        temporary, _, _ = media_storage._write_temporary("photos", ContentFile(b"race"))
+        media_storage._link(temporary, path)
+        os.unlink(temporary)
+        self.assertEqual(os.stat(path).st_ino, inode)
+        self.assertEqual(os.listdir(os.path.dirname(path)), [os.path.basename(name)])
+        self.assertEqual(os.listdir(media_storage.path("photos")), [name.split("/")[1]])
+
+    def test_extension_follows_the_sniffed_format(self):
+        """
+        Test that the same image gets one name whatever extension it was uploaded with.
+        """
+        jpeg = b"\xff\xd8\xff\xe0" + b"\x00" * 20
+        first = media_storage.save("photos/a.jpeg", ContentFile(jpeg))
+        second = media_storage.save("photos/b.JPG", ContentFile(jpeg))
+        self.assertEqual(first, second)
+        self.assertTrue(first.endswith(".jpg"))
+        png = media_storage.save("photos/c.jpg", ContentFile(b"\x89PNG\r\n\x1a\n" + b"\x00" * 8))
+        self.assertTrue(png.endswith(".png"))
+
+    def test_without_hard_links(self):
+        """
+        Test that saving works on file systems that refuse hard links.
+        """
+        with mock.patch("core.storage.os.link", side_effect=OSError(errno.EPERM, "link")):
+            name = media_storage.save("videos/a.mp4", ContentFile(b"no links"))
+            self.assertEqual(media_storage.save("videos/b.mp4", ContentFile(b"no links")), name)
+        with media_storage.open(name) as handle:
+            self.assertEqual(handle.read(), b"no links")
+        self.assertEqual(os.listdir(media_storage.path("videos")), [name.split("/")[1]])
+
+    def test_blob_refcounts_follow_rows(self):
+        """
+        Test that rows sharing a file share one refcounted blob.
+        """
+        one = Video.objects.create(title="One")
+        one.video_file.save("clip.mp4", ContentFile(b"video"))
+        two = Video.objects.create(title="Two")
+        two.video_file.save("copy.mp4", ContentFile(b"video"))
+        self.assertEqual(one.video_file.name, two.video_file.name)
+        blob = MediaBlob.objects.get(name=one.video_file.name)
+        self.assertEqual(blob.refcount, 2)
+
+        two.delete()
+        blob.refresh_from_db()
+        self.assertEqual(blob.refcount, 1)
+
+        one = Video.objects.get(pk=one.pk)
+        one.video_file.save("other.mp4", ContentFile(b"other video"))
+        blob.refresh_from_db()
+        self.assertEqual(blob.refcount, 0)
+        self.assertEqual(MediaBlob.objects.get(name=one.video_file.name).refcount, 1)
+
+    def test_photo_without_image_has_no_blob(self):
+        """
+        Test that rows without files do not create blobs.
+        """
+        Photo.objects.create(title="Empty")
+        self.assertFalse(MediaBlob.objects.exists())
@@ -0,0 +1,138 @@
+"""
+Module docstring: This module contains test cases for the change log and incremental sync.
+"""
+
+import io
+from datetime import timedelta
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.models import ChangeLog, Photo, Tag, Video
+from core.sync import buffered_changes, latest_cursor
+
+
+@override_settings(SYNC_SETTLE_SECONDS=0)
+class SyncTestCase(TestCase):
+    """
+    Test cases for /sync/ and the signal handlers feeding it.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse("sync")
+        self.tag = Tag.objects.create(name="red")
+        self.photo = Photo.objects.create(title="Photo")
+        self.video = Video.objects.create(title="Video")
+
+    def sync(self, since, **params):
+        response = self.client.get(self.url, dict(params, since=since))
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_full_sync(self):
+        data = self.sync(0)
+        self.assertEqual([item["name"] for item in data["changed"]["tag"]], ["red"])
+        self.assertEqual([item["title"] for item in data["changed"]["photo"]], ["Photo"])
+        self.assertEqual(data["cursor"], latest_cursor())
+        self.assertFalse(data["has_more"])
+
+    def test_only_changes_are_returned(self):
+        cursor = latest_cursor()
+        video_id = str(self.video.pk)
+        self.photo.tags.add(self.tag)
+        self.video.delete()
+        with self.assertNumQueries(2):  # log page, photos with their tag snapshots
+            data = self.sync(cursor)
+        self.assertEqual([item["title"] for item in data["changed"]["photo"]], ["Photo"])
+        self.assertEqual(data["changed"]["photo"][0]["tags"], [self.tag.id])
+        self.assertEqual(data["changed"]["tag"], [])
+        self.assertEqual(data["deleted"]["video"], [video_id])
+        self.assertEqual(self.sync(data["cursor"])["changed"]["photo"], [])
+
+    def test_reverse_tag_changes_and_tag_deletes(self):
+        cursor = latest_cursor()
+        tag_id = str(self.tag.pk)
+        self.tag.photos.add(self.photo)
+        self.tag.delete()
+        data = self.sync(cursor)
+        self.assertEqual(data["deleted"]["tag"], [tag_id])
+        self.assertEqual(data["changed"]["photo"][0]["tags"], [])
+
+    def test_pages(self):
+        cursor = latest_cursor()
+        for index in range(3):
+            Tag.objects.create(name=f"tag {index}")
+        first = self.sync(cursor, limit=2)
+        self.assertTrue(first["has_more"])
+        second = self.sync(first["cursor"], limit=2)
+        self.assertFalse(second["has_more"])
+        names = [item["name"] for page in (first, second) for item in page["changed"]["tag"]]
+        self.assertEqual(names, ["tag 0", "tag 1", "tag 2"])
+
+    def test_unsettled_changes_are_held_back(self):
+        cursor = latest_cursor()
+        Tag.objects.create(name="new")
+        with self.settings(SYNC_SETTLE_SECONDS=60):
+            data = self.sync(cursor)
+        self.assertEqual(data["changed"]["tag"], [])
+        self.assertEqual(data["cursor"], cursor)
+
+    def test_late_commit_is_not_skipped(self):
+        """
+        Test that a change flushed after a long block is stamped when written.
+        """
+        cursor = latest_cursor()
+        start = timezone.now()
+        with self.settings(SYNC_SETTLE_SECONDS=2), mock.patch.object(timezone, "now") as now:
+            now.return_value = start
+            with buffered_changes():
+                Tag.objects.create(name="imported")
+                # The rest of the import takes longer than the settle window.
+                now.return_value = start + timedelta(seconds=10)
+            now.return_value = start + timedelta(seconds=11)
+            self.assertEqual(self.sync(cursor)["changed"]["tag"], [])
+            now.return_value = start + timedelta(seconds=13)
+            data = self.sync(cursor)
+        self.assertEqual([item["name"] for item in data["changed"]["tag"]], ["imported"])
+
+    def test_open_transaction_holds_back_later_changes(self):
+        """
+        Test that changes newer than the oldest open transaction are held back.
+        """
+        cursor = latest_cursor()
+        started = timezone.now()
+        Tag.objects.create(name="after")
+        with mock.patch("core.sync.oldest_transaction_start", return_value=started):
+            self.assertEqual(self.sync(cursor)["cursor"], cursor)
+        self.assertEqual(self.sync(cursor)["changed"]["tag"][0]["name"], "after")
+
+    def test_updated_at_is_maintained(self):
+        before = self.photo.updated_at
+        self.photo.title = "Renamed"
+        self.photo.save()
+        self.assertGreater(self.photo.updated_at, before)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {"since": "x"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_prune(self):
+        for title in ("a", "b", "c"):
+            self.photo.title = title
+            self.photo.save()
+        video_id = str(self.video.pk)
+        self.video.delete()
+        out = io.StringIO()
+        call_command("prune_changelog", stdout=out)
+        self.assertIn("Removed 4 superseded entries", out.getvalue())
+        self.assertEqual(ChangeLog.objects.filter(object_id=str(self.photo.pk)).count(), 1)
+        self.assertTrue(
+            ChangeLog.objects.filter(
+                object_id=video_id, action=ChangeLog.DELETE
+            ).exists()
+        )
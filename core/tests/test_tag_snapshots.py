@@ -0,0 +1,135 @@
+"""
+Module docstring: This module contains test cases for the denormalized tag snapshots.
+"""
+
+import io
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.models import Photo, Tag, UserProfile, Video
+from core.tag_snapshots import rebuild_snapshots
+
+
+def snapshots():
+    return {
+        item.pk: item.tag_snapshot
+        for model in (Photo, Video)
+        for item in model.objects.all()
+    }
+
+
+class TagSnapshotTestCase(TestCase):
+    """
+    Test cases for core.tag_snapshots and the signal handlers maintaining it.
+    """
+
+    def setUp(self):
+        self.red = Tag.objects.create(name="red")
+        self.blue = Tag.objects.create(name="blue")
+        self.photo = Photo.objects.create(title="A")
+        self.video = Video.objects.create(title="B")
+
+    def assertMatchesRebuild(self):
+        incremental = snapshots()
+        rebuild_snapshots()
+        self.assertEqual(incremental, snapshots())
+
+    def test_follows_tag_changes(self):
+        """
+        Test that adding and removing tags from either side rewrites the snapshot.
+        """
+        self.photo.tags.add(self.blue, self.red)
+        expected = [{"id": self.red.pk, "name": "red"}, {"id": self.blue.pk, "name": "blue"}]
+        self.assertEqual(self.photo.tag_snapshot, expected)
+        self.assertEqual(Photo.objects.get(pk=self.photo.pk).tag_snapshot, expected)
+
+        self.blue.videos.add(self.video)
+        self.red.photos.remove(self.photo)
+        self.assertEqual(Photo.objects.get(pk=self.photo.pk).tag_snapshot, expected[1:])
+        self.assertEqual(Video.objects.get(pk=self.video.pk).tag_snapshot, expected[1:])
+        self.assertMatchesRebuild()
+
+        self.blue.photos.clear()
+        self.video.tags.clear()
+        self.assertEqual(self.video.tag_snapshot, [])
+        self.assertMatchesRebuild()
+
+    def test_rename_and_delete(self):
+        """
+        Test that renaming or deleting a tag rewrites the snapshots carrying it.
+        """
+        self.photo.tags.add(self.red, self.blue)
+        self.video.tags.add(self.red)
+        self.red.name = "crimson"
+        self.red.save()
+        self.assertEqual(Video.objects.get(pk=self.video.pk).tag_snapshot[0]["name"], "crimson")
+        self.assertMatchesRebuild()
+
+        self.red.delete()
+        self.assertEqual(
+            Photo.objects.get(pk=self.photo.pk).tag_snapshot,
+            [{"id": self.blue.pk, "name": "blue"}],
+        )
+        self.assertEqual(Video.objects.get(pk=self.video.pk).tag_snapshot, [])
+
+    def test_rebuild_command(self):
+        """
+        Test that rebuild_tag_snapshots repairs snapshots changed behind its back.
+        """
+        self.photo.tags.add(self.red)
+        Photo.objects.update(tag_snapshot=[])
+        out = io.StringIO()
+        call_command("rebuild_tag_snapshots", batch_size=1, stdout=out)
+        self.assertIn("Rebuilt 1 photo and 1 video snapshots", out.getvalue())
+        self.assertEqual(Photo.objects.get(pk=self.photo.pk).tag_snapshot[0]["id"], self.red.pk)
+
+
+class TagSnapshotViewTestCase(TestCase):
+    """
+    Test cases for rendering tags from the snapshots.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = UserProfile.objects.create_user(
+            email="test@example.com", username="testuser", password="testpassword"
+        )
+        token = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.red = Tag.objects.create(name="red")
+        self.blue = Tag.objects.create(name="blue")
+
+    def test_create_and_list(self):
+        """
+        Test that created items show their tags and lists render them without a join.
+        """
+        response = self.client.post(
+            reverse("photo-list-create"),
+            {"title": "Sea", "tags": [self.blue.pk, self.red.pk]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["tags"], [self.red.pk, self.blue.pk])
+        self.assertNotIn("tag_snapshot", response.data)
+
+        Photo.objects.create(title="Sky").tags.add(self.red)
+        with self.assertNumQueries(3):  # user, count, page
+            response = self.client.get(reverse("photo-list-create"), {"count": "exact"})
+        tags = {item["title"]: item["tags"] for item in response.data["results"]}
+        self.assertEqual(tags, {"Sea": [self.red.pk, self.blue.pk], "Sky": [self.red.pk]})
+
+    @override_settings(TAG_SNAPSHOTS=False)
+    def test_disabled(self):
+        """
+        Test that tags are prefetched when the snapshots are not read.
+        """
+        Photo.objects.create(title="Sky").tags.add(self.red)
+        Photo.objects.filter(title="Sky").update(tag_snapshot=[])
+        with self.assertNumQueries(4):  # user, count, page, tags
+            response = self.client.get(reverse("photo-list-create"), {"count": "exact"})
+        self.assertEqual(response.data["results"][0]["tags"], [self.red.pk])
@@ -20,6 +20,17 @@ from core.views import (
     PhotoDetailUpdateDeleteView,
     VideoListCreateView,
     VideoDetailUpdateDeleteView,
+    PhotoRelatedView,
+    VideoRelatedView,
+    TagRelatedView,
+    BatchMutationView,
+    QueryStatsView,
+    PhotoImageView,
+    PhotoDuplicatesView,
+    SyncView,
+    CatalogExportView,
+    CatalogImportView,
+    CatalogStatsView,
 )
 
 class TestUrls(SimpleTestCase):
@@ -95,3 +106,73 @@ class TestUrls(SimpleTestCase):
         """
         url = reverse("video-detail", args=[1])
         self.assertEqual(resolve(url).func.view_class, VideoDetailUpdateDeleteView)
+
+    def test_photo_related_url_resolves(self):
+        """
+        Test if the 'photo-related' URL resolves to the PhotoRelatedView class.
+        """
+        url = reverse("photo-related", args=[1])
+        self.assertEqual(resolve(url).func.view_class, PhotoRelatedView)
+
+    def test_video_related_url_resolves(self):
+        """
+        Test if the 'video-related' URL resolves to the VideoRelatedView class.
+        """
+        url = reverse("video-related", args=[1])
+        self.assertEqual(resolve(url).func.view_class, VideoRelatedView)
+
+    def test_tag_related_url_resolves(self):
+        """
+        Test if the 'tag-related' URL resolves to the TagRelatedView class.
+        """
+        url = reverse("tag-related", args=[1])
+        self.assertEqual(resolve(url).func.view_class, TagRelatedView)
+
+    def test_batch_url_resolves(self):
+        """
+        Test if the 'batch' URL resolves to the BatchMutationView class.
+        """
+        url = reverse("batch")
+        self.assertEqual(resolve(url).func.view_class, BatchMutationView)
+
+    def test_query_stats_url_resolves(self):
+        """
+        Test if the 'query-stats' URL resolves to the QueryStatsView class.
+        """
+        url = reverse("query-stats")
+        self.assertEqual(resolve(url).func.view_class, QueryStatsView)
+
+    def test_photo_image_url_resolves(self):
+        """
+        Test if the 'photo-image' URL resolves to the PhotoImageView class.
+        """
+        url = reverse("photo-image", args=[1])
+        self.assertEqual(resolve(url).func.view_class, PhotoImageView)
+
+    def test_photo_duplicates_url_resolves(self):
+        """
+        Test if the 'photo-duplicates' URL resolves to the PhotoDuplicatesView class.
+        """
+        url = reverse("photo-duplicates", args=[1])
+        self.assertEqual(resolve(url).func.view_class, PhotoDuplicatesView)
+
+    def test_sync_url_resolves(self):
+        """
+        Test if the 'sync' URL resolves to the SyncView class.
+        """
+        url = reverse("sync")
+        self.assertEqual(resolve(url).func.view_class, SyncView)
+
+    def test_catalog_urls_resolve(self):
+        """
+        Test if the catalog URLs resolve to the export and import views.
+        """
+        self.assertEqual(resolve(reverse("catalog-export")).func.view_class, CatalogExportView)
+        self.assertEqual(resolve(reverse("catalog-import")).func.view_class, CatalogImportView)
+
+    def test_stats_url_resolves(self):
+        """
+        Test if the 'stats' URL resolves to the CatalogStatsView class.
+        """
+        url = reverse("stats")
+        self.assertEqual(resolve(url).func.view_class, CatalogStatsView)
@@ -0,0 +1,183 @@
+"""
+Module docstring: This module contains test cases for the bulk user import pipeline.
+"""
+
+import io
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.jobs import run_pending_jobs
+from core.models import Job, UserProfile
+from core.user_import import UserImporter, import_users
+
+
+class ImportUsersTestCase(TestCase):
+    """
+    Test cases for the import_users pipeline.
+    """
+
+    def test_import_csv(self):
+        """
+        Test importing users from CSV, skipping duplicates and invalid rows.
+        """
+        UserProfile.objects.create_user(
+            email="taken@example.com", username="taken", password="secret"
+        )
+        stream = io.BytesIO(
+            b"email,username,first_name,last_name,password\n"
+            b"a@example.com,alice,Alice,A,pw-alice\n"
+            b"b@example.com,bob,Bob,B,pw-bob\n"
+            b"a@example.com,alice2,Alice,A,pw-alice\n"
+            b"taken@example.com,someone,,,pw\n"
+            b",nobody,,,pw\n"
+        )
+
+        result = import_users(stream, fmt="csv", batch_size=2, workers=1)
+
+        self.assertEqual(result["created"], 2)
+        self.assertEqual(result["skipped"], 2)
+        self.assertEqual(result["errors"][0]["row"], 5)
+        alice = UserProfile.objects.get(email="a@example.com")
+        self.assertTrue(alice.check_password("pw-alice"))
+        self.assertEqual(alice.first_name, "Alice")
+
+    def test_import_ndjson_with_hashed_password(self):
+        """
+        Test that existing password hashes are stored without re-hashing.
+        """
+        hashed = UserProfile.objects.create_user(
+            email="tmp@example.com", username="tmp", password="kept"
+        ).password
+        UserProfile.objects.filter(email="tmp@example.com").delete()
+        stream = io.BytesIO(
+            json.dumps(
+                {"email": "c@example.com", "username": "carol", "password_hash": hashed}
+            ).encode()
+        )
+
+        result = import_users(stream, fmt="ndjson", workers=1)
+
+        self.assertEqual(result["created"], 1)
+        carol = UserProfile.objects.get(email="c@example.com")
+        self.assertEqual(carol.password, hashed)
+        self.assertTrue(carol.check_password("kept"))
+
+    def test_hash_like_password_is_hashed(self):
+        """
+        Test that a raw password looking like a hash is hashed, and bad hashes refused.
+        """
+        stream = io.BytesIO(
+            b"email,username,password,password_hash\n"
+            b"e@example.com,erin,md5$salt$abc,\n"
+            b"f@example.com,frank,,not-a-hash\n"
+        )
+
+        result = import_users(stream, fmt="csv", workers=1)
+
+        self.assertEqual(result["created"], 1)
+        self.assertEqual(result["errors"][0]["row"], 2)
+        erin = UserProfile.objects.get(email="e@example.com")
+        self.assertNotEqual(erin.password, "md5$salt$abc")
+        self.assertTrue(erin.check_password("md5$salt$abc"))
+
+    def test_conflicts_and_non_objects(self):
+        """
+        Test that rows lost to a concurrent insert are skipped, not counted as created.
+        """
+        stream = io.BytesIO(
+            b'["not", "an", "object"]\n'
+            b'{"email": "g@example.com", "username": "gina", "password": "pw"}\n'
+            b'{"email": "h@example.com", "username": "hank", "password": "pw"}\n'
+        )
+        original = UserImporter._clean
+
+        def clean_then_race(importer, batch, offset):
+            users = original(importer, batch, offset)
+            UserProfile.objects.create_user(email="h@example.com", username="h", password="pw")
+            return users
+
+        with mock.patch.object(UserImporter, "_clean", clean_then_race):
+            result = import_users(stream, fmt="ndjson", workers=1)
+
+        self.assertEqual((result["created"], result["skipped"]), (1, 1))
+        self.assertEqual(result["errors"], [{"row": 1, "error": "Expected an object."}])
+
+
+class UserProfileImportViewTestCase(TestCase):
+    """
+    Test cases for the admin user import endpoint.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = UserProfile.objects.create_user(
+            email="test@example.com", username="testuser", password="testpassword"
+        )
+        self.admin_user = UserProfile.objects.create_superuser(
+            email="admin@example.com", username="adminuser", password="adminpassword"
+        )
+        self.url = reverse("user-profile-import")
+        self.import_dir = tempfile.mkdtemp()
+        self.override = override_settings(USER_IMPORT_DIR=self.import_dir)
+        self.override.enable()
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.import_dir, ignore_errors=True)
+
+    def _upload(self):
+        return SimpleUploadedFile(
+            "users.ndjson",
+            b'{"email": "d@example.com", "username": "dave", "password": "pw"}\n',
+        )
+
+    def test_admin_can_import(self):
+        """
+        Test that an upload is queued and imported by the job worker.
+        """
+        token = RefreshToken.for_user(self.admin_user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        response = self.client.post(self.url, {"file": self._upload()})
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data["status"], Job.QUEUED)
+        self.assertEqual(response["Location"], response.data["url"])
+        self.assertFalse(UserProfile.objects.filter(username="dave").exists())
+
+        with self.settings(USER_IMPORT_WORKERS=1):
+            run_pending_jobs()
+        self.assertTrue(UserProfile.objects.filter(username="dave").exists())
+        self.assertEqual(os.listdir(self.import_dir), [])
+
+        response = self.client.get(response.data["url"])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["status"], Job.DONE)
+        self.assertEqual(response.data["result"]["created"], 1)
+
+    def test_unsupported_format(self):
+        """
+        Test that an upload in an unknown format is refused without queueing a job.
+        """
+        token = RefreshToken.for_user(self.admin_user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        response = self.client.post(self.url, {"file": self._upload(), "format": "xml"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Job.objects.exists())
+
+    def test_regular_user_is_forbidden(self):
+        """
+        Test that non-admin users cannot import.
+        """
+        token = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        response = self.client.post(self.url, {"file": self._upload()})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,92 @@
+"""
+Module docstring: This module contains test cases for the admin user search.
+"""
+
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.models import UserProfile
+
+
+class UserSearchTestCase(TestCase):
+    """
+    Test cases for filtering and paginating /user-profiles/.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse("user-profiles")
+        self.admin_user = UserProfile.objects.create_superuser(
+            email="admin@example.com", username="adminuser", password="adminpassword"
+        )
+        for email, username, first_name, last_name in [
+            ("ann.lee@example.com", "annlee", "Ann", "Lee"),
+            ("bob@example.com", "bobby", "Bob", "Annand"),
+            ("carol@sample.org", "carol", "Carol", "Smith"),
+        ]:
+            UserProfile.objects.create_user(
+                email=email,
+                username=username,
+                password="password",
+                first_name=first_name,
+                last_name=last_name,
+            )
+        UserProfile.objects.filter(username="carol").update(is_active=False)
+        token = RefreshToken.for_user(self.admin_user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def usernames(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [user["username"] for user in response.data["results"]]
+
+    def test_filters(self):
+        """
+        Test the prefix, substring and flag filters.
+        """
+        self.assertEqual(self.usernames(email="ANN"), ["annlee"])
+        self.assertEqual(self.usernames(name="ann"), ["annlee", "bobby"])
+        self.assertEqual(self.usernames(username="car"), ["carol"])
+        self.assertEqual(self.usernames(q="example"), ["adminuser", "annlee", "bobby"])
+        self.assertEqual(self.usernames(q="mit"), ["carol"])
+        self.assertEqual(self.usernames(is_active="false"), ["carol"])
+        self.assertEqual(self.usernames(is_admin="true", q="example"), ["adminuser"])
+        self.assertEqual(self.usernames(email="nobody"), [])
+
+    def test_invalid_filters(self):
+        """
+        Test that short substrings and bad flags are rejected.
+        """
+        response = self.client.get(self.url, {"q": "an"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(self.url, {"is_admin": "maybe"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(self.url, {"cursor": "%%%"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_keyset_pagination(self):
+        """
+        Test that following ``next`` walks every user once, in email order.
+        """
+        emails = []
+        response = self.client.get(self.url, {"page_size": 3})
+        while True:
+            emails += [user["email"] for user in response.data["results"]]
+            if response.data["next"] is None:
+                break
+            response = self.client.get(response.data["next"])
+        self.assertEqual(emails, sorted(UserProfile.objects.values_list("email", flat=True)))
+        self.assertEqual(len(emails), 4)
+
+    def test_regular_user_is_forbidden(self):
+        """
+        Test that non-admin users cannot search.
+        """
+        user = UserProfile.objects.get(username="annlee")
+        token = RefreshToken.for_user(user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        response = self.client.get(self.url, {"q": "example"})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -11,10 +11,13 @@ from django.contrib.auth import get_user_model
 from django.urls import reverse
 from rest_framework import status
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
 from uuid import uuid4  # Import UUID generator
+from rest_framework_simplejwt.tokens import RefreshToken
 
 
-from core.models import  Tag, Photo, Video
+from core.models import  Tag, Photo, Video, TagCooccurrence
 
 User = get_user_model()
 
@@ -70,6 +73,18 @@ class AuthenticationTests(TestCase):
         self.assertIn("refresh", response.data)
         self.assertIn("admin", response.data)
 
+    def test_user_profiles_batch_retrieve(self):
+        """
+        Test that admins can fetch user profiles by id.
+        """
+        token = RefreshToken.for_user(self.admin_user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        url = reverse("user-profiles")
+        response = self.client.get(url, {"ids": f"{self.user.id},{uuid4()}"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]["email"], "test@example.com")
+        self.assertEqual(response.data[1]["detail"], "Not found.")
+
     # Add more test cases for other authentication-related views...
 
 
@@ -106,6 +121,18 @@ class TagTests(TestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_tag_batch_retrieve(self):
+        """
+        Test fetching tags by id keeps the requested order.
+        """
+        other = Tag.objects.create(name="Other Tag")
+        url = reverse("tag-list-create")
+        response = self.client.get(url, {"ids": f"{other.id},{self.tag.id},999"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item.get("name") for item in response.data], ["Other Tag", "Test Tag", None]
+        )
+
     # Add more test cases for other Tag-related views and functionalities...
 
 
@@ -145,6 +172,35 @@ class PhotoTests(TestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_photo_batch_retrieve(self):
+        """
+        Test fetching several photos by id in one request and query set.
+        """
+        other = Photo.objects.create(title="Other Photo")
+        other.tags.add(Tag.objects.create(name="Batch Tag"))
+        missing = str(uuid4())
+        url = reverse("photo-list-create")
+        ids = ",".join([str(other.id), missing, str(self.photo.id), "not-a-uuid"])
+        # One query for the photos, their tags come from the snapshots.
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {"ids": ids})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item.get("title") for item in response.data],
+            ["Other Photo", None, "Test Photo", None],
+        )
+        self.assertEqual(response.data[1], {"id": missing, "detail": "Not found."})
+        self.assertEqual(len(response.data[0]["tags"]), 1)
+
+    def test_photo_batch_retrieve_limit(self):
+        """
+        Test that asking for more ids than allowed is rejected.
+        """
+        url = reverse("photo-list-create")
+        with self.settings(BATCH_FETCH_MAX_IDS=2):
+            response = self.client.get(url, {"ids": ",".join(str(uuid4()) for _ in range(3))})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     # Add more test cases for other Photo-related views and functionalities...
 
 
@@ -182,3 +238,145 @@ class VideoTests(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
     # Add more test cases for other Video-related views and functionalities...
+
+
+class BatchMutationTests(TestCase):
+    """
+    Test case class for the transactional batch mutation endpoint.
+    """
+
+    def setUp(self):
+        """
+        Set up an authenticated client and some media to change.
+        """
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email="test@example.com",
+            username="testuser",
+            password="testpassword",
+        )
+        token = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.url = reverse("batch")
+        self.red = Tag.objects.create(name="red")
+        self.blue = Tag.objects.create(name="blue")
+        self.photos = [Photo.objects.create(title=f"Photo {i}") for i in range(3)]
+        self.photos[0].tags.add(self.red)
+        self.video = Video.objects.create(title="Video")
+
+    def test_batch_applies_all_operations(self):
+        """
+        Test that creates, updates and deletes are applied in one request.
+        """
+        operations = [
+            {"op": "create", "model": "tag", "data": {"name": "green"}},
+            {
+                "op": "update",
+                "model": "photo",
+                "id": str(self.photos[0].id),
+                "data": {"title": "Renamed", "tags": [self.red.id, self.blue.id]},
+            },
+            {
+                "op": "update",
+                "model": "photo",
+                "id": str(self.photos[1].id),
+                "data": {"title": "Also renamed"},
+            },
+            {"op": "delete", "model": "video", "id": str(self.video.id)},
+        ]
+        response = self.client.post(self.url, {"operations": operations}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [result["status"] for result in response.data["results"]], [201, 200, 200, 204]
+        )
+        self.assertEqual(response.data["results"][1]["data"]["title"], "Renamed")
+        self.assertEqual(Tag.objects.get(name="green").description, "green")
+        self.assertEqual(
+            list(Photo.objects.order_by("title").values_list("title", flat=True)),
+            ["Also renamed", "Photo 2", "Renamed"],
+        )
+        self.assertEqual(
+            set(self.photos[0].tags.values_list("name", flat=True)), {"red", "blue"}
+        )
+        self.assertFalse(Video.objects.exists())
+        # Signal handlers still see the bulk tag write.
+        self.assertEqual(
+            TagCooccurrence.objects.get(tag=self.red, other=self.blue).count, 1
+        )
+
+    def test_batch_updates_are_grouped(self):
+        """
+        Test that updating many photos does not cost a query per photo.
+        """
+        def run(photos):
+            operations = [
+                {"op": "update", "model": "photo", "id": str(photo.id), "data": {"title": "x"}}
+                for photo in photos
+            ]
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.post(self.url, {"operations": operations}, format="json")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return len(context.captured_queries)
+
+        self.assertEqual(run(self.photos[:1]), run(self.photos))
+
+    def test_batch_rolls_back_on_invalid_operation(self):
+        """
+        Test that one invalid operation prevents every write.
+        """
+        operations = [
+            {"op": "create", "model": "tag", "data": {"name": "green"}},
+            {"op": "update", "model": "photo", "id": str(uuid4()), "data": {"title": "x"}},
+            {"op": "update", "model": "tag", "id": self.blue.id, "data": {"name": "red"}},
+        ]
+        response = self.client.post(self.url, {"operations": operations}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        results = response.data["results"]
+        self.assertNotIn("status", results[0])
+        self.assertEqual(results[1]["status"], 404)
+        self.assertIn("name", results[2]["errors"])
+        self.assertFalse(Tag.objects.filter(name="green").exists())
+
+    def test_batch_rolls_back_on_conflict(self):
+        """
+        Test that a conflict found while writing undoes the whole batch.
+        """
+        operations = [
+            {"op": "update", "model": "photo", "id": str(self.photos[1].id), "data": {"title": "x"}},
+            {"op": "create", "model": "tag", "data": {"name": "green"}},
+            {"op": "create", "model": "tag", "data": {"name": "green"}},
+        ]
+        response = self.client.post(self.url, {"operations": operations}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Tag.objects.filter(name="green").exists())
+        self.assertEqual(Photo.objects.get(id=self.photos[1].id).title, "Photo 1")
+
+    def test_batch_rejects_changes_to_deleted_objects(self):
+        """
+        Test that an object cannot be updated or deleted twice in a batch that deletes it.
+        """
+        operations = [
+            {"op": "update", "model": "tag", "id": self.red.id, "data": {"name": "crimson"}},
+            {"op": "delete", "model": "tag", "id": self.red.id},
+        ]
+        response = self.client.post(self.url, {"operations": operations}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("id", response.data["results"][0]["errors"])
+        self.assertTrue(Tag.objects.filter(name="red").exists())
+
+    def test_batch_body_must_be_an_object(self):
+        """
+        Test that a list body is refused rather than crashing.
+        """
+        response = self.client.post(self.url, [{"op": "delete"}], format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_batch_requires_authentication(self):
+        """
+        Test that anonymous clients cannot run a batch.
+        """
+        self.client.credentials()
+        operations = [{"op": "delete", "model": "video", "id": str(self.video.id)}]
+        response = self.client.post(self.url, {"operations": operations}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertTrue(Video.objects.exists())
@@ -0,0 +1,59 @@
+"""
+Module docstring: This module contains tests for the startup warm-up and import profiling.
+"""
+
+import sys
+
+from django.test import SimpleTestCase, TestCase
+
+from core.warmup import deferred_violations, parse_importtime, warm_up
+
+IMPORTTIME_OUTPUT = """\
+import time: self [us] | cumulative | imported package
+import time:       120 |        120 |     numpy.core
+import time:       300 |        420 |   numpy
+import time:        80 |        500 | core.related
+import time:        40 |         40 |   PIL._util
+import time:        90 |        130 | PIL.Image
+import time:        10 |         10 | json
+"""
+
+
+class ImportProfileTestCase(SimpleTestCase):
+    """
+    Test cases for parsing ``-X importtime`` output.
+    """
+
+    def test_parse_importtime(self):
+        records = {record.module: record for record in parse_importtime(
+            IMPORTTIME_OUTPUT.splitlines()
+        )}
+        self.assertEqual(len(records), 6)
+        self.assertEqual(records["numpy"].self_us, 300)
+        self.assertEqual(records["numpy"].cumulative_us, 420)
+        self.assertEqual(records["numpy"].parent, "core.related")
+        self.assertEqual(records["numpy.core"].parent, "numpy")
+        self.assertIsNone(records["core.related"].parent)
+
+    def test_deferred_violations(self):
+        records = parse_importtime(IMPORTTIME_OUTPUT.splitlines())
+        violations = deferred_violations(records, packages=["numpy", "PIL"])
+        self.assertEqual(
+            [(record.module, record.parent) for record in violations],
+            [("numpy", "core.related"), ("PIL.Image", None)],
+        )
+
+
+class WarmUpTestCase(TestCase):
+    """
+    Test cases for warming up a process before it serves requests.
+    """
+
+    def test_warm_up(self):
+        with self.settings(WARM_UP_IMPORTS=["core.related", "no_such_module"]):
+            with self.assertLogs("core.warmup", "WARNING"):
+                timings = warm_up(close_connections=False)
+        self.assertEqual(
+            set(timings), {"imports", "urls", "models", "serializers", "hashers"}
+        )
+        self.assertIn("core.related", sys.modules)
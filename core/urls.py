@@ -10,6 +10,8 @@ from .views import (
     RegisterView,
     LoginView,
     UserProfileListView,
+    UserProfileImportView,
+    UserProfileImportStatusView,
     UserProfileDetail,
     TagListCreateView,
     TagDetailUpdateDeleteView,
@@ -17,17 +19,41 @@ from .views import (
     PhotoDetailUpdateDeleteView,
     VideoListCreateView,
     VideoDetailUpdateDeleteView,
+    PhotoRelatedView,
+    VideoRelatedView,
+    TagRelatedView,
+    BatchMutationView,
+    QueryStatsView,
+    PhotoImageView,
+    PhotoDuplicatesView,
+    SyncView,
+    CatalogExportView,
+    CatalogImportView,
+    CatalogStatsView,
 )
 
 urlpatterns = [
+    path("batch/", BatchMutationView.as_view(), name="batch"),
+    path("sync/", SyncView.as_view(), name="sync"),
+    path("catalog/export/", CatalogExportView.as_view(), name="catalog-export"),
+    path("catalog/import/", CatalogImportView.as_view(), name="catalog-import"),
     path("register/", RegisterView.as_view(), name="register"),
     path("login/", LoginView.as_view(), name="login"),
     path("user-profiles/", UserProfileListView.as_view(), name="user-profiles"),
+    path("stats/", CatalogStatsView.as_view(), name="stats"),
+    path("stats/queries/", QueryStatsView.as_view(), name="query-stats"),
+    path("user-profiles/import/", UserProfileImportView.as_view(), name="user-profile-import"),
+    path("user-profiles/import/<int:pk>/", UserProfileImportStatusView.as_view(), name="user-profile-import-status"),
     re_path(r'^user-profile/(?P<pk>[0-9a-f-]+)/$', UserProfileDetail.as_view(), name="user-profile-detail"),
     path("tags/", TagListCreateView.as_view(), name="tag-list-create"),
     re_path(r'^tags/(?P<pk>[0-9a-f-]+)/$', TagDetailUpdateDeleteView.as_view(), name="tag-detail"),
+    re_path(r'^tags/(?P<pk>[0-9a-f-]+)/related/$', TagRelatedView.as_view(), name="tag-related"),
     path("photos/", PhotoListCreateView.as_view(), name="photo-list-create"),
     re_path(r'^photos/(?P<pk>[0-9a-f-]+)/$', PhotoDetailUpdateDeleteView.as_view(), name="photo-detail"),
+    re_path(r'^photos/(?P<pk>[0-9a-f-]+)/related/$', PhotoRelatedView.as_view(), name="photo-related"),
+    re_path(r'^photos/(?P<pk>[0-9a-f-]+)/image/$', PhotoImageView.as_view(), name="photo-image"),
+    re_path(r'^photos/(?P<pk>[0-9a-f-]+)/duplicates/$', PhotoDuplicatesView.as_view(), name="photo-duplicates"),
     path("videos/", VideoListCreateView.as_view(), name="video-list-create"),
     re_path(r'^videos/(?P<pk>[0-9a-f-]+)/$', VideoDetailUpdateDeleteView.as_view(), name="video-detail"),  # Use re_path with a regex pattern
+    re_path(r'^videos/(?P<pk>[0-9a-f-]+)/related/$', VideoRelatedView.as_view(), name="video-related"),
 ]
@@ -0,0 +1,236 @@
+"""
+Module docstring: This module contains the bulk user import pipeline.
+
+Records are read from CSV or NDJSON, passwords are hashed in parallel in a
+process pool and users are inserted in batches with ``bulk_create``.
+Uploads through the API are kept in USER_IMPORT_DIR and imported by the
+``users.import`` job (see core.tasks), outside the web workers.
+
+``password`` is always treated as a raw password. Existing hashes (e.g.
+from another Django site) go in the ``password_hash`` column instead and
+are stored as they are.
+"""
+
+import csv
+import io
+import json
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from uuid import uuid4
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.core.files.storage import FileSystemStorage
+from django.db.models import Q
+
+from .models import Job, UserProfile
+
+FORMATS = ("csv", "ndjson")
+
+
+def detect_format(filename, default="csv"):
+    """
+    Guess the import format ("csv" or "ndjson") from a file name.
+    """
+    name = (filename or "").lower()
+    if name.endswith((".ndjson", ".jsonl", ".json")):
+        return "ndjson"
+    if name.endswith(".csv"):
+        return "csv"
+    return default
+
+
+def read_records(stream, fmt):
+    """
+    Yield user records (dicts) from a binary or text stream.
+    """
+    if isinstance(stream.read(0), bytes):
+        stream = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+    if fmt == "ndjson":
+        for line in stream:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+    elif fmt == "csv":
+        yield from csv.DictReader(stream)
+    else:
+        raise ValueError(f"Unsupported import format: {fmt}")
+
+
+def _init_worker():
+    """
+    Make sure Django is configured in pool processes started with spawn.
+    """
+    if not apps.ready:
+        import django
+
+        django.setup()
+
+
+def _hash_passwords(passwords):
+    """
+    Hash a chunk of raw passwords. Runs inside a pool process.
+    """
+    return [make_password(password or None) for password in passwords]
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class UserImporter:
+    """
+    Import users in batches.
+
+    Each batch is validated, de-duplicated against the database with one
+    query, has its passwords hashed across ``workers`` processes and is
+    written with a single ``bulk_create``.
+    """
+
+    def __init__(self, batch_size=None, workers=None):
+        self.batch_size = batch_size or settings.USER_IMPORT_BATCH_SIZE
+        self.workers = workers or settings.USER_IMPORT_WORKERS
+        self.result = {"created": 0, "skipped": 0, "errors": []}
+        self._seen_emails = set()
+        self._seen_usernames = set()
+
+    def run(self, records):
+        """
+        Import an iterable of records and return a summary dict.
+        """
+        if self.workers > 1:
+            with ProcessPoolExecutor(
+                max_workers=self.workers, initializer=_init_worker
+            ) as pool:
+                self._run(records, pool.map)
+        else:
+            self._run(records, map)
+        return self.result
+
+    def _run(self, records, mapper):
+        for number, batch in enumerate(_batches(records, self.batch_size)):
+            offset = number * self.batch_size
+            users = self._clean(batch, offset)
+            if users:
+                self._hash(users, mapper)
+                UserProfile.objects.bulk_create(
+                    [user for user, _ in users], ignore_conflicts=True
+                )
+                # ignore_conflicts hands back every object; the ids are set
+                # client-side, so count the rows that made it in.
+                created = UserProfile.objects.filter(
+                    pk__in=[user.pk for user, _ in users]
+                ).count()
+                self.result["created"] += created
+                self.result["skipped"] += len(users) - created
+
+    def _clean(self, batch, offset):
+        """
+        Validate a batch and drop rows that already exist.
+        """
+        candidates = []
+        for index, record in enumerate(batch, start=offset + 1):
+            if not isinstance(record, dict):
+                self.result["errors"].append({"row": index, "error": "Expected an object."})
+                continue
+            email = UserProfile.objects.normalize_email(
+                (record.get("email") or "").strip()
+            )
+            username = (record.get("username") or "").strip()
+            if not email or not username:
+                self.result["errors"].append(
+                    {"row": index, "error": "email and username are required."}
+                )
+                continue
+            if email.lower() in self._seen_emails or username in self._seen_usernames:
+                self.result["skipped"] += 1
+                continue
+            password, password_hash = record.get("password"), record.get("password_hash")
+            if password and password_hash:
+                self.result["errors"].append(
+                    {"row": index, "error": "Give either password or password_hash, not both."}
+                )
+                continue
+            if password_hash:
+                try:
+                    identify_hasher(password_hash)
+                except ValueError:
+                    self.result["errors"].append(
+                        {"row": index, "error": "password_hash is not a known hash format."}
+                    )
+                    continue
+            self._seen_emails.add(email.lower())
+            self._seen_usernames.add(username)
+            user = UserProfile(
+                email=email,
+                username=username,
+                first_name=record.get("first_name") or None,
+                last_name=record.get("last_name") or None,
+                password=password_hash or "",
+            )
+            candidates.append((user, password))
+
+        if not candidates:
+            return []
+        existing = UserProfile.objects.filter(
+            Q(email__in=[user.email for user, _ in candidates])
+            | Q(username__in=[user.username for user, _ in candidates])
+        ).values_list("email", "username")
+        taken_emails, taken_usernames = set(), set()
+        for email, username in existing:
+            taken_emails.add(email)
+            taken_usernames.add(username)
+        users = [
+            (user, password)
+            for user, password in candidates
+            if user.email not in taken_emails and user.username not in taken_usernames
+        ]
+        self.result["skipped"] += len(candidates) - len(users)
+        return users
+
+    def _hash(self, users, mapper):
+        """
+        Fill in password hashes, spreading the raw passwords over the pool.
+        """
+        raw = [(user, password) for user, password in users if not user.password]
+        if not raw:
+            return
+        chunk_size = max(1, -(-len(raw) // self.workers))
+        chunks = [
+            [password for _, password in raw[start:start + chunk_size]]
+            for start in range(0, len(raw), chunk_size)
+        ]
+        hashes = [value for chunk in mapper(_hash_passwords, chunks) for value in chunk]
+        for (user, _), hashed in zip(raw, hashes):
+            user.password = hashed
+
+
+def import_users(stream, fmt="csv", batch_size=None, workers=None):
+    """
+    Import users from a CSV or NDJSON stream and return a summary dict.
+    """
+    return UserImporter(batch_size=batch_size, workers=workers).run(
+        read_records(stream, fmt)
+    )
+
+
+def import_storage():
+    """
+    Return the storage holding uploads until their import job runs.
+    """
+    return FileSystemStorage(location=settings.USER_IMPORT_DIR)
+
+
+def queue_import(upload, fmt):
+    """
+    Keep an uploaded file and queue the job importing it; return the Job.
+    """
+    name = import_storage().save(f"{uuid4().hex}.{fmt}", upload)
+    return Job.objects.enqueue("users.import", name=name, fmt=fmt)
+
@@ -0,0 +1,70 @@
+"""
+Module docstring: This module contains the filters of the admin user list.
+
+Every text filter compares the lower-cased column, ``LOWER(email) LIKE
+'ann%'``, so it can be answered from the functional ``LOWER(...)`` indexes
+on UserProfile instead of a scan:
+
+- ``email``, ``username``: prefix of the email or username.
+- ``name``: prefix of the first or last name.
+- ``q``: substring of any of the four, at least USER_SEARCH_MIN_SUBSTRING
+  characters. On PostgreSQL it uses the ``pg_trgm`` indexes added by
+  migration 0014; elsewhere it scans.
+- ``is_active``, ``is_admin``: ``true`` or ``false``.
+"""
+
+from django.conf import settings
+from django.db.models import Q
+from django.db.models.functions import Lower
+from rest_framework.exceptions import ValidationError
+
+SEARCH_FIELDS = ("email", "username", "first_name", "last_name")
+PREFIX_FILTERS = {
+    "email": ("email",),
+    "username": ("username",),
+    "name": ("first_name", "last_name"),
+}
+BOOLEAN_FILTERS = ("is_active", "is_admin")
+BOOLEAN_VALUES = {"true": True, "1": True, "false": False, "0": False}
+
+
+def lowered(field):
+    return f"{field}_lower"
+
+
+def any_field(fields, lookup, term):
+    condition = Q()
+    for field in fields:
+        condition |= Q(**{f"{lowered(field)}__{lookup}": term})
+    return condition
+
+
+def filter_users(queryset, params):
+    """
+    Apply the filters in ``params`` (a QueryDict) to a UserProfile queryset.
+
+    Raises:
+        ValidationError: If a filter value is invalid.
+    """
+    queryset = queryset.alias(**{lowered(field): Lower(field) for field in SEARCH_FIELDS})
+    for name, fields in PREFIX_FILTERS.items():
+        term = params.get(name, "").strip().lower()
+        if term:
+            queryset = queryset.filter(any_field(fields, "startswith", term))
+
+    term = params.get("q", "").strip().lower()
+    if term:
+        if len(term) < settings.USER_SEARCH_MIN_SUBSTRING:
+            raise ValidationError(
+                {"q": [f"Enter at least {settings.USER_SEARCH_MIN_SUBSTRING} characters."]}
+            )
+        queryset = queryset.filter(any_field(SEARCH_FIELDS, "contains", term))
+
+    for name in BOOLEAN_FILTERS:
+        value = params.get(name)
+        if value is None:
+            continue
+        if value.lower() not in BOOLEAN_VALUES:
+            raise ValidationError({name: ["Must be true or false."]})
+        queryset = queryset.filter(**{name: BOOLEAN_VALUES[value.lower()]})
+    return queryset
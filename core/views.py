@@ -2,9 +2,18 @@
 API views for user registration, login, user profile management, and authentication.
 """
 
+import os
+
 from rest_framework.generics import ListCreateAPIView, RetrieveUpdateDestroyAPIView
 from rest_framework.views import APIView
-from rest_framework.exceptions import PermissionDenied, AuthenticationFailed
+from rest_framework.parsers import MultiPartParser
+from rest_framework.exceptions import (
+    APIException,
+    PermissionDenied,
+    AuthenticationFailed,
+    NotFound,
+    ValidationError,
+)
 from rest_framework.response import Response
 from rest_framework import generics, status
 from rest_framework.permissions import (
@@ -13,8 +22,14 @@ from rest_framework.permissions import (
     IsAdminUser,
 )
 from rest_framework_simplejwt.tokens import RefreshToken
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.http import FileResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import patch_vary_headers
+from django.core.exceptions import ValidationError as DjangoValidationError
 from rest_framework_simplejwt.authentication import JWTAuthentication
-from .models import UserProfile, Tag, Photo, Video
+from .models import UserProfile, Tag, Photo, Video, TagCooccurrence, Job
 from .serializers import (
     TagSerializer,
     PhotoSerializer,
@@ -24,8 +39,98 @@ from .serializers import (
     AllUserProfileSerializer,
     UserProfileSerializer,
 )
+from .batch import BatchMutation
+from .catalog import CATALOG_MODELS, export_catalog, import_catalog
+from .coalesce import CoalescedGetMixin
+from .duplicates import near_duplicates
+from .image_validation import upload_too_large
+from .image_variants import (
+    FORMATS as IMAGE_FORMATS,
+    ensure_variant,
+    negotiate_format,
+)
+from .pagination import ApproximateCountPagination, KeysetPagination
+from .querylog import query_stats
+from .stats import catalog_stats
+from .sync import changes_since
+from .tag_snapshots import with_tags
+from .user_import import FORMATS as IMPORT_FORMATS, detect_format, queue_import
+from .user_search import filter_users
+
 
 
+def batch_retrieve(queryset, raw_ids, serialize):
+    """
+    Load the objects for a comma-separated list of ids with one query.
+
+    Returns serialized objects in the requested order; ids that are
+    malformed or do not exist get a ``{"id": ..., "detail": "Not found."}``
+    marker in their place.
+    """
+    ids = [item.strip() for item in raw_ids.split(",") if item.strip()]
+    if len(ids) > settings.BATCH_FETCH_MAX_IDS:
+        raise ValidationError(
+            {"ids": [f"At most {settings.BATCH_FETCH_MAX_IDS} ids can be requested."]}
+        )
+    pk_field = queryset.model._meta.pk
+    keys = {}
+    for item in ids:
+        try:
+            keys[item] = pk_field.to_python(item)
+        except DjangoValidationError:
+            continue
+    found = queryset.in_bulk(set(keys.values()))
+    data = iter(serialize([found[keys[item]] for item in ids if keys.get(item) in found]))
+    return [
+        next(data) if keys.get(item) in found else {"id": item, "detail": "Not found."}
+        for item in ids
+    ]
+
+
+class UploadTooLarge(APIException):
+    """
+    Raised when a request body is larger than any accepted upload.
+    """
+
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = "The upload is too large."
+    default_code = "upload_too_large"
+
+
+class TemporaryUploadMixin:
+    """
+    Mixin streaming uploaded files to temporary files instead of memory.
+
+    Uploads then reach core.image_validation as files on disk its decode
+    worker can read. Bodies that cannot hold an acceptable image are
+    refused from their Content-Length, before they are read.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        if upload_too_large(request):
+            raise UploadTooLarge()
+        # IdempotencyMiddleware may already have parsed the upload the same way.
+        if not hasattr(request._request, "_files"):
+            request._request.upload_handlers = [TemporaryFileUploadHandler(request._request)]
+        super().initial(request, *args, **kwargs)
+
+
+class BatchRetrieveMixin:
+    """
+    Mixin adding ``?ids=<id>,<id>,...`` batch retrieval to a list view.
+    """
+
+    def list(self, request, *args, **kwargs):
+        raw_ids = request.query_params.get("ids")
+        if raw_ids is None:
+            return super().list(request, *args, **kwargs)
+        data = batch_retrieve(
+            self.get_queryset(),
+            raw_ids,
+            lambda objects: self.get_serializer(objects, many=True).data,
+        )
+        return Response(data)
+
 
 class RegisterView(APIView):
     """
@@ -47,21 +152,16 @@ class RegisterView(APIView):
         """
         serializer = RegisterSerializer(data=request.data)
         if serializer.is_valid():
+            # Registered users are never admins (is_admin defaults to False),
+            # so the row written by the serializer is final.
             user = serializer.save()
-            if user:
-                user.is_admin = False  # Set is_admin to False for regular users
-                # Add any additional logic to determine if the user is an admin or not
-                if user.is_admin:
-                    user.is_admin = True  # Set is_admin to True for admin users
-                user.save()
-
-                token = RefreshToken.for_user(user)
-                response_data = {
-                    "refresh": str(token),
-                    "access": str(token.access_token),
-                    "admin": user.is_admin,
-                }
-                return Response(response_data, status=status.HTTP_201_CREATED)
+            token = RefreshToken.for_user(user)
+            response_data = {
+                "refresh": str(token),
+                "access": str(token.access_token),
+                "admin": user.is_admin,
+            }
+            return Response(response_data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
@@ -105,9 +205,12 @@ class UserProfileListView(APIView):
     List user profiles (admin-only).
 
     API endpoint to list user profiles. Only accessible to admin users.
+    Profiles are ordered by email and paginated by keyset (``?cursor=``,
+    ``?page_size=``), and can be filtered with ``email``, ``username``,
+    ``name``, ``q``, ``is_active`` and ``is_admin`` (see core.user_search).
 
     Returns:
-        Response: A JSON response with user profiles if authorized.
+        Response: A JSON response with a page of user profiles if authorized.
 
     Raises:
         PermissionDenied: If a non-admin user attempts to access this resource.
@@ -124,9 +227,20 @@ class UserProfileListView(APIView):
         if request.user.is_authenticated:
             if request.user.is_admin:
                 # Admin token
-                user_profiles = UserProfile.objects.all()
-                serializer = AllUserProfileSerializer(user_profiles, many=True)
-                return Response(serializer.data)
+                if "ids" in request.query_params:
+                    return Response(
+                        batch_retrieve(
+                            UserProfile.objects.all(),
+                            request.query_params["ids"],
+                            lambda users: AllUserProfileSerializer(users, many=True).data,
+                        )
+                    )
+                paginator = KeysetPagination(ordering="email")
+                page = paginator.paginate_queryset(
+                    filter_users(UserProfile.objects.all(), request.query_params), request
+                )
+                serializer = AllUserProfileSerializer(page, many=True)
+                return paginator.get_paginated_response(serializer.data)
             else:
                 # Regular user token, raise Forbidden error
                 raise PermissionDenied(
@@ -139,6 +253,246 @@ class UserProfileListView(APIView):
             raise AuthenticationFailed("Authentication credentials were not provided.")
 
 
+class QueryStatsView(APIView):
+    """
+    Report the most expensive SQL shapes seen by this process (admin-only).
+
+    ``?limit=`` caps the number of shapes (default 20) and ``?order=`` sorts
+    them by ``total`` (default), ``max`` or ``count`` time. DELETE resets
+    the statistics.
+
+    Raises:
+        PermissionDenied: If a non-admin user attempts to access this resource.
+    """
+
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        """
+        Return the top query shapes with their count, total, mean and max time.
+        """
+        if not request.user.is_admin:
+            raise PermissionDenied("You are not authorized to access this resource.")
+        try:
+            limit = max(int(request.query_params.get("limit", 20)), 1)
+        except ValueError:
+            limit = 20
+        order = request.query_params.get("order", "total")
+        if order not in ("total", "max", "count"):
+            order = "total"
+        return Response(query_stats.report(limit, order))
+
+    def delete(self, request):
+        """
+        Clear the collected statistics.
+        """
+        if not request.user.is_admin:
+            raise PermissionDenied("You are not authorized to access this resource.")
+        query_stats.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class CatalogStatsView(APIView):
+    """
+    Report catalog totals, daily uploads and tag usage (admin-only).
+
+    Answered from the summary tables maintained by core.stats, so the cost
+    does not grow with the catalog. ``?days=`` sets how many days of
+    uploads are listed (default STATS_DAYS) and ``?tags=`` how many of the
+    most used tags (default STATS_TOP_TAGS).
+
+    Returns:
+        Response: Photo and video counts and bytes in total and per day,
+        and the most used tags with their photo and video counts.
+
+    Raises:
+        PermissionDenied: If a non-admin user attempts to access this resource.
+    """
+
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        """
+        Return the catalog statistics (admin-only).
+        """
+        if not request.user.is_admin:
+            raise PermissionDenied("You are not authorized to access this resource.")
+        try:
+            days = int(request.query_params.get("days", settings.STATS_DAYS))
+            tags = int(request.query_params.get("tags", settings.STATS_TOP_TAGS))
+        except ValueError as exc:
+            raise ValidationError({"detail": "days and tags must be integers."}) from exc
+        days = min(max(days, 1), settings.STATS_MAX_DAYS)
+        tags = min(max(tags, 0), settings.STATS_MAX_TAGS)
+        return Response(catalog_stats(days, tags))
+
+
+class UserProfileImportView(APIView):
+    """
+    Bulk import user profiles (admin-only).
+
+    API endpoint accepting a CSV or NDJSON upload in the ``file`` field. The
+    format is taken from the ``format`` field or the file extension. The
+    import runs as a background job (see core.tasks); poll the returned
+    ``url`` for its outcome.
+
+    Returns:
+        Response: 202 with the id, status and status URL of the import job.
+
+    Raises:
+        PermissionDenied: If a non-admin user attempts to access this resource.
+    """
+
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAdminUser]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        """
+        Queue the import of the uploaded users (admin-only).
+        """
+        if not request.user.is_admin:
+            raise PermissionDenied("You are not authorized to access this resource.")
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response(
+                {"file": ["No file was submitted."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        fmt = request.data.get("format") or detect_format(upload.name)
+        if fmt not in IMPORT_FORMATS:
+            return Response(
+                {"detail": f"Unsupported import format: {fmt}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        job = queue_import(upload, fmt)
+        data = import_status(request, job)
+        return Response(data, status=status.HTTP_202_ACCEPTED, headers={"Location": data["url"]})
+
+
+class UserProfileImportStatusView(APIView):
+    """
+    Report the progress of a user import (admin-only).
+
+    Returns:
+        Response: The job status; once ``done``, ``result`` holds the
+            created/skipped counts and row errors.
+
+    Raises:
+        PermissionDenied: If a non-admin user attempts to access this resource.
+        NotFound: If there is no import with this id.
+    """
+
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, pk):
+        """
+        Return the status of the import job ``pk`` (admin-only).
+        """
+        if not request.user.is_admin:
+            raise PermissionDenied("You are not authorized to access this resource.")
+        job = Job.objects.filter(pk=pk, kind="users.import").first()
+        if job is None:
+            raise NotFound()
+        return Response(import_status(request, job))
+
+
+def import_status(request, job):
+    """
+    Describe a user import job for the import views.
+    """
+    return {
+        "id": job.pk,
+        "status": job.status,
+        "attempts": job.attempts,
+        "result": job.result,
+        "error": job.last_error or None,
+        "url": request.build_absolute_uri(
+            reverse("user-profile-import-status", args=[job.pk])
+        ),
+    }
+
+
+class CatalogExportView(APIView):
+    """
+    Stream the tag/photo/video catalog as NDJSON (admin-only).
+
+    API endpoint for backups and transfers between environments; see
+    core.catalog for the format. ``?models=tag,photo`` limits the export.
+    The response is generated while it is sent, so it is served by the
+    WSGI workers: Django 3.2 iterates streaming responses synchronously.
+
+    Returns:
+        StreamingHttpResponse: One JSON record per line.
+
+    Raises:
+        PermissionDenied: If a non-admin user attempts to access this resource.
+    """
+
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        """
+        Stream the catalog (admin-only).
+        """
+        if not request.user.is_admin:
+            raise PermissionDenied("You are not authorized to access this resource.")
+        models = request.query_params.get("models")
+        models = models.split(",") if models else list(CATALOG_MODELS)
+        unknown = sorted(set(models) - set(CATALOG_MODELS))
+        if unknown:
+            raise ValidationError({"models": [f"Unknown models: {', '.join(unknown)}"]})
+        response = StreamingHttpResponse(
+            export_catalog(models), content_type="application/x-ndjson"
+        )
+        response["Content-Disposition"] = 'attachment; filename="catalog.ndjson"'
+        return response
+
+
+class CatalogImportView(APIView):
+    """
+    Upsert an NDJSON catalog upload (admin-only).
+
+    API endpoint accepting the output of the catalog export in the ``file``
+    field. An interrupted import can be resumed by sending the ``line``
+    of its last summary as ``start``.
+
+    Returns:
+        Response: A JSON summary with created/updated counts, row errors,
+        the last line committed and the throughput in rows per second.
+
+    Raises:
+        PermissionDenied: If a non-admin user attempts to access this resource.
+    """
+
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAdminUser]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        """
+        Import the uploaded catalog (admin-only).
+        """
+        if not request.user.is_admin:
+            raise PermissionDenied("You are not authorized to access this resource.")
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response(
+                {"file": ["No file was submitted."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            start = int(request.data.get("start") or 0)
+        except ValueError as exc:
+            raise ValidationError({"start": ["A line number is required."]}) from exc
+        result = import_catalog(upload.file, start=start)
+        return Response(result, status=status.HTTP_200_OK)
+
+
 class IsAdminOrOwner(BasePermission):
     """
     Custom permission class to check if the user is an admin or the owner of an object.
@@ -203,33 +557,53 @@ class UserProfileDetail(generics.RetrieveUpdateDestroyAPIView):
         serializer.delete(instance)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
-class TagListCreateView(ListCreateAPIView):
+class TagListCreateView(CoalescedGetMixin, BatchRetrieveMixin, ListCreateAPIView):
     """
     List and create view for Tag objects.
+
+    ``?ids=`` returns the requested tags in order.
     """
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticatedOrReadOnly]
 
-class PhotoListCreateView(ListCreateAPIView):
+class PhotoListCreateView(
+    TemporaryUploadMixin, CoalescedGetMixin, BatchRetrieveMixin, ListCreateAPIView
+):
     """
     List and create view for Photo objects.
+
+    Lists are paginated newest first (see ApproximateCountPagination for
+    ``?count=``); ``?ids=`` returns the requested photos in order.
     """
-    queryset = Photo.objects.all()
+    queryset = Photo.objects.order_by("-created_at", "pk")
     serializer_class = PhotoSerializer
+    pagination_class = ApproximateCountPagination
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticatedOrReadOnly]
 
-class VideoListCreateView(ListCreateAPIView):
+    def get_queryset(self):
+        return with_tags(super().get_queryset())
+
+
+class VideoListCreateView(CoalescedGetMixin, BatchRetrieveMixin, ListCreateAPIView):
     """
     List and create view for Video objects.
+
+    Lists are paginated newest first (see ApproximateCountPagination for
+    ``?count=``); ``?ids=`` returns the requested videos in order.
     """
-    queryset = Video.objects.all()
+    queryset = Video.objects.order_by("-created_at", "pk")
     serializer_class = VideoSerializer
+    pagination_class = ApproximateCountPagination
     permission_classes = [IsAuthenticatedOrReadOnly]
 
-class TagDetailUpdateDeleteView(RetrieveUpdateDestroyAPIView):
+    def get_queryset(self):
+        return with_tags(super().get_queryset())
+
+
+class TagDetailUpdateDeleteView(CoalescedGetMixin, RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update, and delete view for Tag objects.
     """
@@ -237,7 +611,9 @@ class TagDetailUpdateDeleteView(RetrieveUpdateDestroyAPIView):
     serializer_class = TagSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
 
-class PhotoDetailUpdateDeleteView(RetrieveUpdateDestroyAPIView):
+class PhotoDetailUpdateDeleteView(
+    TemporaryUploadMixin, CoalescedGetMixin, RetrieveUpdateDestroyAPIView
+):
     """
     Retrieve, update, and delete view for Photo objects.
     """
@@ -245,11 +621,263 @@ class PhotoDetailUpdateDeleteView(RetrieveUpdateDestroyAPIView):
     serializer_class = PhotoSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
 
-class VideoDetailUpdateDeleteView(RetrieveUpdateDestroyAPIView):
+class VideoDetailUpdateDeleteView(CoalescedGetMixin, RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update, and delete view for Video objects.
     """
     queryset = Video.objects.all()
     serializer_class = VideoSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
-    
\ No newline at end of file
+    
+
+class RelatedMediaView(generics.GenericAPIView):
+    """
+    List the photos or videos most similar to one item by shared tags.
+
+    Answers from the precomputed lists in RelatedMedia. ``?limit=`` caps
+    the number of results.
+    """
+
+    media_type = None
+    permission_classes = [IsAuthenticatedOrReadOnly]
+
+    def get(self, request, *args, **kwargs):
+        """
+        Return the related items, most similar first.
+        """
+        from .related import get_related  # defers numpy/scipy
+
+        instance = self.get_object()
+        related = get_related(self.media_type, instance.pk)
+        try:
+            limit = int(request.query_params.get("limit", len(related)))
+        except ValueError:
+            limit = len(related)
+        ids = [item_id for item_id, _ in related[:max(limit, 0)]]
+        found = with_tags(self.get_queryset()).in_bulk(ids)
+        to_pk = self.queryset.model._meta.pk.to_python
+        # Items deleted since the list was computed are skipped.
+        items = [found[pk] for pk in map(to_pk, ids) if pk in found]
+        serializer = self.get_serializer(items, many=True)
+        return Response(serializer.data)
+
+
+class PhotoRelatedView(RelatedMediaView):
+    """
+    Related photos for a photo.
+    """
+    media_type = "photo"
+    queryset = Photo.objects.all()
+    serializer_class = PhotoSerializer
+
+
+class VideoRelatedView(RelatedMediaView):
+    """
+    Related videos for a video.
+    """
+    media_type = "video"
+    queryset = Video.objects.all()
+    serializer_class = VideoSerializer
+
+
+class PhotoImageView(generics.GenericAPIView):
+    """
+    Serve a photo's image in the best format the client accepts.
+
+    JPEG and PNG originals are sent as AVIF or WebP when the ``Accept``
+    header lists them (see core.image_variants); the variant is built on the
+    first request and reused afterwards. Originals that cannot be
+    transcoded are sent as they are.
+    """
+
+    queryset = Photo.objects.only("id", "image", "mime_type")
+    permission_classes = [IsAuthenticatedOrReadOnly]
+
+    def perform_content_negotiation(self, request, force=False):
+        # Accept names image types here, which no renderer produces.
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request, *args, **kwargs):
+        """
+        Return the image file, with ``Vary: Accept``.
+
+        Raises:
+            NotFound: If the photo does not exist or has no image.
+        """
+        photo = self.get_object()
+        if not photo.image:
+            raise NotFound("This photo has no image.")
+        storage = photo.image.storage
+        name = photo.image.name
+        content_type = photo.mime_type or None
+        fmt = negotiate_format(request.META.get("HTTP_ACCEPT"), photo.mime_type)
+        variant = ensure_variant(storage, name, fmt) if fmt is not None else None
+        if variant is not None:
+            name = variant
+            content_type = IMAGE_FORMATS[fmt][0]
+        etag = f'"{os.path.basename(name)}"'
+        if etag in request.META.get("HTTP_IF_NONE_MATCH", ""):
+            response = HttpResponseNotModified()
+        else:
+            response = FileResponse(storage.open(name, "rb"), content_type=content_type)
+        response["ETag"] = etag
+        patch_vary_headers(response, ["Accept"])
+        response["Cache-Control"] = f"max-age={settings.PHOTO_IMAGE_MAX_AGE}"
+        return response
+
+
+class PhotoDuplicatesView(generics.GenericAPIView):
+    """
+    List the near-duplicates of a photo by perceptual hash.
+
+    ``?distance=`` is the maximum Hamming distance between hashes (default
+    PHASH_DUPLICATE_DISTANCE, at most PHASH_MAX_DISTANCE).
+    """
+
+    queryset = Photo.objects.all()
+    serializer_class = PhotoSerializer
+    permission_classes = [IsAuthenticatedOrReadOnly]
+
+    def get(self, request, *args, **kwargs):
+        """
+        Return matching photos with their distance, nearest first.
+
+        Raises:
+            ValidationError: If ``distance`` is not an integer in range.
+        """
+        try:
+            distance = int(
+                request.query_params.get("distance", settings.PHASH_DUPLICATE_DISTANCE)
+            )
+        except ValueError as exc:
+            raise ValidationError({"distance": ["A valid integer is required."]}) from exc
+        if not 0 <= distance <= settings.PHASH_MAX_DISTANCE:
+            raise ValidationError(
+                {"distance": [f"Must be between 0 and {settings.PHASH_MAX_DISTANCE}."]}
+            )
+        photo = self.get_object()
+        matches = near_duplicates(
+            photo, distance, queryset=with_tags(Photo.objects.all())
+        )
+        data = [
+            dict(self.get_serializer(match).data, distance=match_distance)
+            for match, match_distance in matches
+        ]
+        return Response(data)
+
+
+class TagRelatedView(generics.GenericAPIView):
+    """
+    List the tags most often used together with a tag.
+
+    Answers from the TagCooccurrence index with a single query. ``?limit=``
+    caps the number of results (default 20).
+    """
+
+    queryset = Tag.objects.all()
+    serializer_class = TagSerializer
+    permission_classes = [IsAuthenticatedOrReadOnly]
+
+    def get(self, request, *args, **kwargs):
+        """
+        Return related tags with their co-occurrence counts, most frequent first.
+        """
+        try:
+            limit = max(int(request.query_params.get("limit", 20)), 0)
+        except ValueError:
+            limit = 20
+        try:
+            tag_id = int(self.kwargs["pk"])
+        except ValueError as exc:
+            raise NotFound() from exc
+        pairs = (
+            TagCooccurrence.objects.filter(tag_id=tag_id)
+            .select_related("other")
+            .order_by("-count")[:limit]
+        )
+        data = [
+            dict(self.get_serializer(pair.other).data, count=pair.count)
+            for pair in pairs
+        ]
+        return Response(data)
+
+
+class BatchMutationView(APIView):
+    """
+    Apply several create/update/delete operations in one transaction.
+
+    The body is ``{"operations": [{"op": ..., "model": ..., "id": ...,
+    "data": {...}}, ...]}`` with ``model`` one of tag, photo or video. Each
+    operation gets the permissions and validation of its own endpoint; if
+    any of them fails, nothing is written.
+    """
+
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    resources = {
+        "tag": (TagSerializer, TagListCreateView, TagDetailUpdateDeleteView),
+        "photo": (PhotoSerializer, PhotoListCreateView, PhotoDetailUpdateDeleteView),
+        "video": (VideoSerializer, VideoListCreateView, VideoDetailUpdateDeleteView),
+    }
+
+    def post(self, request):
+        """
+        Run a batch of operations.
+
+        Returns:
+            Response: One result per operation, in request order, with the
+                status and data (or errors) of each.
+
+        Raises:
+            ValidationError: If the body is not an object, or ``operations``
+                is missing, not a list or longer than
+                BATCH_MUTATION_MAX_OPERATIONS.
+        """
+        if not isinstance(request.data, dict):
+            raise ValidationError({"detail": ["The body must be a JSON object."]})
+        operations = request.data.get("operations")
+        if not isinstance(operations, list) or not operations:
+            raise ValidationError({"operations": ["A non-empty list is required."]})
+        if len(operations) > settings.BATCH_MUTATION_MAX_OPERATIONS:
+            raise ValidationError(
+                {
+                    "operations": [
+                        f"At most {settings.BATCH_MUTATION_MAX_OPERATIONS} "
+                        "operations can be sent in one batch."
+                    ]
+                }
+            )
+        status_code, body = BatchMutation(request, self.resources).run(operations)
+        return Response(body, status=status_code)
+
+
+class SyncView(APIView):
+    """
+    Return the tags, photos and videos changed since a cursor.
+
+    Clients start with ``?since=0``, then send back the ``cursor`` of each
+    response, fetching again straight away while ``has_more`` is true.
+    ``changed`` holds the current rows and ``deleted`` the ids of deleted
+    ones, per model. ``?limit=`` caps the log entries read per call.
+    """
+
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    serializers = {"tag": TagSerializer, "photo": PhotoSerializer, "video": VideoSerializer}
+
+    def get(self, request):
+        """
+        Return one page of changes.
+
+        Raises:
+            ValidationError: If ``since`` or ``limit`` is not a non-negative integer.
+        """
+        try:
+            since = int(request.query_params.get("since", 0))
+            limit = int(request.query_params.get("limit", settings.SYNC_PAGE_SIZE))
+        except ValueError as exc:
+            raise ValidationError({"detail": "since and limit must be integers."}) from exc
+        if since < 0 or limit < 1:
+            raise ValidationError({"detail": "since and limit must not be negative."})
+        limit = min(limit, settings.SYNC_MAX_PAGE_SIZE)
+        return Response(changes_since(since, limit, self.serializers))
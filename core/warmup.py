@@ -0,0 +1,182 @@
+"""
+Module docstring: This module contains the process warm-up run before serving requests.
+
+With gunicorn's ``preload_app`` (see gunicorn.conf.py) ``warm_up`` runs once
+in the master. Imports, the URL resolver, model metadata and serializer
+field construction are paid for there, before workers are forked, and the
+resulting memory is shared copy-on-write instead of being rebuilt by every
+worker on its first requests.
+
+``profile_imports`` measures what a plain startup imports (``python -X
+importtime``), so heavy, rarely used packages (DEFERRED_IMPORTS) can be kept
+out of it and imported inside the functions that need them instead.
+"""
+
+import gc
+import importlib
+import logging
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import namedtuple
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.hashers import get_hashers
+from django.db import DatabaseError, connections
+from django.urls import get_resolver
+
+logger = logging.getLogger(__name__)
+
+
+def _import_modules():
+    for name in settings.WARM_UP_IMPORTS:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            logger.warning("Warm-up could not import %s.", name)
+
+
+def _populate_urls():
+    resolver = get_resolver()
+    # Compiles every pattern and builds the reverse lookup tables.
+    len(resolver.reverse_dict)
+    for pattern in resolver.url_patterns:
+        pattern.pattern.regex  # pylint: disable=pointless-statement
+
+
+def _populate_models():
+    for model in apps.get_models():
+        model._meta.get_fields()
+        model._meta.related_objects  # pylint: disable=pointless-statement
+
+
+def _build_serializers():
+    from rest_framework import serializers
+    from rest_framework.settings import api_settings
+    from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+    from . import serializers as core_serializers
+
+    # Resolve DRF's and simplejwt's lazily imported settings classes.
+    api_settings.DEFAULT_RENDERER_CLASSES  # pylint: disable=pointless-statement
+    api_settings.DEFAULT_PARSER_CLASSES  # pylint: disable=pointless-statement
+    jwt_settings.AUTH_TOKEN_CLASSES  # pylint: disable=pointless-statement
+    for value in vars(core_serializers).values():
+        if (
+            isinstance(value, type)
+            and issubclass(value, serializers.Serializer)
+            and value.__module__ == core_serializers.__name__
+        ):
+            value().fields  # pylint: disable=expression-not-assigned
+
+
+STEPS = (
+    ("imports", _import_modules),
+    ("urls", _populate_urls),
+    ("models", _populate_models),
+    ("serializers", _build_serializers),
+    ("hashers", get_hashers),
+)
+
+
+def warm_up(close_connections=True, freeze=False):
+    """
+    Run the warm-up steps and return how long each took, in seconds.
+
+    Connections opened along the way are closed so a forking master never
+    hands a database socket to its workers. ``freeze`` moves everything
+    allocated so far out of the garbage collector's reach (``gc.freeze``),
+    so collections in the workers do not touch, and copy, shared pages.
+    """
+    timings = {}
+    for name, step in STEPS:
+        start = time.perf_counter()
+        step()
+        timings[name] = time.perf_counter() - start
+    if close_connections:
+        connections.close_all()
+    if freeze and hasattr(gc, "freeze"):
+        gc.collect()
+        gc.freeze()
+    logger.info(
+        "Warm-up finished: %s.",
+        ", ".join(f"{name} {seconds * 1000:.1f}ms" for name, seconds in timings.items()),
+    )
+    return timings
+
+
+def connect():
+    """
+    Open the database connections of a freshly started worker.
+    """
+    for connection in connections.all():
+        try:
+            connection.ensure_connection()
+        except DatabaseError:
+            logger.warning("Could not connect to database %r.", connection.alias)
+
+
+STARTUP_SCRIPT = (
+    "import ideal.wsgi\n"
+    "from django.urls import get_resolver\n"
+    "get_resolver().url_patterns\n"
+)
+
+ImportTime = namedtuple("ImportTime", "module self_us cumulative_us depth parent")
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def parse_importtime(lines):
+    """
+    Parse ``-X importtime`` output into ImportTime records.
+
+    Children are printed before the module that imported them, one level of
+    indentation deeper, so a module's parent is the next shallower line.
+    """
+    records = []
+    for line in lines:
+        match = IMPORTTIME_LINE.match(line.rstrip("\n"))
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            records.append([module, int(self_us), int(cumulative_us), len(indent) // 2, None])
+    for index, record in enumerate(records):
+        for later in records[index + 1:]:
+            if later[3] < record[3]:
+                record[4] = later[0]
+                break
+    return [ImportTime(*record) for record in records]
+
+
+def profile_imports(script=STARTUP_SCRIPT):
+    """
+    Run ``script`` in a fresh interpreter and return its import timings.
+    """
+    env = dict(os.environ)
+    env.setdefault("DJANGO_SETTINGS_MODULE", "ideal.settings")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", script],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if result.returncode:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return parse_importtime(result.stderr.splitlines())
+
+
+def deferred_violations(records, packages=None):
+    """
+    Return the startup imports of packages that should be imported lazily.
+    """
+    packages = settings.DEFERRED_IMPORTS if packages is None else packages
+    return [
+        record
+        for record in records
+        if record.module.split(".")[0] in packages
+        and (record.parent is None or record.parent.split(".")[0] != record.module.split(".")[0])
+    ]
@@ -0,0 +1,54 @@
+"""
+Gunicorn configuration for the ideal project.
+
+The application is loaded and warmed up once in the master (``preload_app``)
+so forked workers start with imports, URL patterns and serializer metadata
+already in shared copy-on-write memory. Each worker then opens its own
+database connections before accepting requests.
+
+The API is served over WSGI by threaded workers (``ideal.workers``), each
+running GUNICORN_THREADS requests at a time. The server-sent event stream
+(``/events/``, see core.events) needs an ASGI server and runs as a separate
+process, configured in gunicorn_events.conf.py.
+
+Run with ``gunicorn`` from the project root; every value can be overridden
+on the command line or through the environment variables below.
+"""
+
+import multiprocessing
+import os
+
+wsgi_app = "ideal.wsgi:application"
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "ideal.workers.ConnectedThreadWorker")
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+bind = os.environ.get("GUNICORN_BIND", f"0.0.0.0:{os.environ.get('PORT', '8000')}")
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") == "1"
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 1000))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 100))
+
+
+def when_ready(server):
+    """
+    Warm up the preloaded application in the master, before forking.
+    """
+    if not server.cfg.preload_app:
+        return
+    from core.warmup import warm_up
+
+    warm_up(freeze=True)
+
+
+def post_worker_init(worker):
+    """
+    Open the worker's database connections, and warm up unless preloaded.
+
+    Threaded workers serve requests from a thread pool whose threads open
+    their own connections as they start (see ideal.workers).
+    """
+    from core.warmup import connect, warm_up
+
+    if not worker.cfg.preload_app:
+        warm_up()
+    if not hasattr(worker, "tpool"):
+        connect()
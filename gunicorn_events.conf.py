@@ -0,0 +1,19 @@
+"""
+Gunicorn configuration for the server-sent event stream of the ideal project.
+
+Serves ``GET /events/`` (see core.events) with uvicorn's ASGI workers; every
+other path is answered 404 and belongs to the API process (gunicorn.conf.py).
+Route ``/events/`` to this process at the reverse proxy.
+
+Writes happen in the API process, so set EVENTS_BRIDGE for them to wake
+the broker of each worker here instead of waiting for EVENTS_POLL_SECONDS.
+
+Run with ``gunicorn -c gunicorn_events.conf.py`` from the project root.
+"""
+
+import os
+
+wsgi_app = "ideal.asgi:events_application"
+worker_class = "uvicorn.workers.UvicornWorker"
+bind = os.environ.get("EVENTS_BIND", "0.0.0.0:8001")
+workers = int(os.environ.get("EVENTS_WORKERS", 1))
@@ -2,6 +2,11 @@
 ASGI config for ideal project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Requests for the server-sent event stream (see core.events) are handled
+outside Django's request cycle; everything else goes to Django.
+
+In production the API is served over WSGI (gunicorn.conf.py) and only the
+event stream over ASGI, by ``events_application`` (gunicorn_events.conf.py).
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
@@ -9,8 +14,63 @@ https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ideal.settings')
 
-application = get_asgi_application()
+
+class ThreadedStreamingASGIHandler(ASGIHandler):
+    """
+    ASGIHandler that reads streaming responses in the request's thread.
+
+    Django 3.2 iterates streaming content on the event loop, where the
+    queries of a streamed export raise SynchronousOnlyOperation.
+    """
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            await super().send_response(response, send)
+            return
+        parts = iter(response.streaming_content)
+        response.streaming_content = ()
+        read = sync_to_async(next, thread_sensitive=True)
+
+        async def relay(message):
+            # Send the parts before Django's closing message.
+            if message["type"] == "http.response.body" and not message.get("more_body"):
+                while True:
+                    part = await read(parts, None)
+                    if part is None:
+                        break
+                    await send({"type": "http.response.body", "body": part, "more_body": True})
+            await send(message)
+
+        await super().send_response(response, relay)
+
+
+django.setup(set_prefix=False)
+django_application = ThreadedStreamingASGIHandler()
+
+from core.events import EVENT_STREAM_PATH, event_stream, send_error  # noqa: E402  pylint: disable=wrong-import-position
+
+
+async def application(scope, receive, send):
+    """
+    Route the event stream to core.events and every other request to Django.
+    """
+    if scope["type"] == "http" and scope["path"] == EVENT_STREAM_PATH:
+        await event_stream(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
+
+
+async def events_application(scope, receive, send):
+    """
+    Serve only the event stream; the API runs in the WSGI process.
+    """
+    if scope["type"] == "http" and scope["path"] == EVENT_STREAM_PATH:
+        await event_stream(scope, receive, send)
+    elif scope["type"] == "http":
+        await send_error(send, 404, b"Not found.")
@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 from pathlib import Path
 from datetime import timedelta
 import os
+import tempfile
 import dj_database_url
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -51,6 +52,10 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "core.middleware.RequestProfilerMiddleware",
+    "core.middleware.SlowQueryMiddleware",
+    "core.middleware.ReplicaRoutingMiddleware",
+    "core.middleware.IdempotencyMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -93,6 +98,47 @@ DATABASES = {
     ),
 }
 
+# Read replicas
+# DATABASE_REPLICA_URLS is a comma-separated list of database URLs and
+# DATABASE_REPLICA_WEIGHTS an optional matching list of integer weights, e.g.
+# DATABASE_REPLICA_URLS=sqlite:///replica.sqlite3 for local testing.
+
+DATABASE_REPLICAS = {}
+_replica_weights = os.environ.get("DATABASE_REPLICA_WEIGHTS", "").split(",")
+for _index, _url in enumerate(
+    filter(None, os.environ.get("DATABASE_REPLICA_URLS", "").split(","))
+):
+    _alias = f"replica{_index + 1}"
+    DATABASES[_alias] = dj_database_url.parse(
+        _url, conn_max_age=600, conn_health_checks=True
+    )
+    DATABASES[_alias]["TEST"] = {"MIRROR": "default"}
+    _weight = _replica_weights[_index] if _index < len(_replica_weights) else ""
+    DATABASE_REPLICAS[_alias] = int(_weight or 1)
+
+DATABASE_ROUTERS = ["core.db_router.ReplicaRouter"]
+
+# Seconds a client stays on the primary after a write (read-your-writes).
+REPLICA_PIN_SECONDS = int(os.environ.get("REPLICA_PIN_SECONDS", 5))
+# Seconds an unreachable replica is left out of rotation.
+REPLICA_HEALTH_COOLDOWN = int(os.environ.get("REPLICA_HEALTH_COOLDOWN", 30))
+
+# Cache
+# Shared by every worker process when CACHE_BACKEND names a shared backend,
+# e.g. django.core.cache.backends.memcached.PyMemcacheCache with
+# CACHE_LOCATION=127.0.0.1:11211, or FileBasedCache with a directory for
+# workers on one host. Required with read replicas: the primary pins of
+# bearer-token clients live in it (see core.middleware).
+
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.environ.get("CACHE_LOCATION", ""),
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -130,6 +176,11 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 
+# Uploaded media (photos and videos)
+
+MEDIA_URL = "media/"
+MEDIA_ROOT = os.environ.get("MEDIA_ROOT", BASE_DIR / "media")
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -170,3 +221,168 @@ SIMPLE_JWT = {
     "SLIDING_TOKEN_OBTAIN_SERIALIZER": "rest_framework_simplejwt.serializers.TokenObtainSlidingSerializer",
     "SLIDING_TOKEN_REFRESH_SERIALIZER": "rest_framework_simplejwt.serializers.TokenRefreshSlidingSerializer",
 }
+
+
+# Bulk user import
+# Rows per INSERT and number of processes used to hash passwords.
+
+USER_IMPORT_BATCH_SIZE = int(os.environ.get("USER_IMPORT_BATCH_SIZE", 1000))
+USER_IMPORT_WORKERS = int(os.environ.get("USER_IMPORT_WORKERS", os.cpu_count() or 1))
+# Uploads waiting for the job workers (run_workers); shared with them, never served.
+USER_IMPORT_DIR = os.environ.get("USER_IMPORT_DIR", BASE_DIR / "imports")
+
+
+# Background jobs
+# Attempts before a job is marked failed, backoff between attempts and how
+# long a running job may be held before it is handed to another worker.
+
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", 5))
+JOB_RETRY_BASE_DELAY = int(os.environ.get("JOB_RETRY_BASE_DELAY", 10))
+JOB_RETRY_MAX_DELAY = int(os.environ.get("JOB_RETRY_MAX_DELAY", 3600))
+JOB_LOCK_TIMEOUT = int(os.environ.get("JOB_LOCK_TIMEOUT", 600))
+
+
+# Related media recommendations
+# Items kept per list, "jaccard" or "cosine", the age (seconds) after which
+# a stored list is queued for recomputation when read, and how many of the
+# most recently tagged items of each tag a single-item refresh compares.
+
+RELATED_MEDIA_TOP_K = int(os.environ.get("RELATED_MEDIA_TOP_K", 20))
+RELATED_MEDIA_METRIC = os.environ.get("RELATED_MEDIA_METRIC", "jaccard")
+RELATED_MEDIA_MAX_AGE = int(os.environ.get("RELATED_MEDIA_MAX_AGE", 24 * 3600))
+RELATED_MEDIA_CANDIDATES_PER_TAG = int(os.environ.get("RELATED_MEDIA_CANDIDATES_PER_TAG", 2000))
+
+
+# Batch retrieval (?ids= on list endpoints)
+
+BATCH_FETCH_MAX_IDS = int(os.environ.get("BATCH_FETCH_MAX_IDS", 100))
+
+# Transactional batch mutations (/batch/)
+
+BATCH_MUTATION_MAX_OPERATIONS = int(os.environ.get("BATCH_MUTATION_MAX_OPERATIONS", 100))
+
+# Photo/video list pagination and counts (see core.pagination)
+
+LIST_PAGE_SIZE = int(os.environ.get("LIST_PAGE_SIZE", 50))
+LIST_MAX_PAGE_SIZE = int(os.environ.get("LIST_MAX_PAGE_SIZE", 200))
+# "estimate", "exact" or "none"; clients can override with ?count=
+LIST_COUNT_MODE = os.environ.get("LIST_COUNT_MODE", "estimate")
+LIST_EXACT_COUNT_CAP = int(os.environ.get("LIST_EXACT_COUNT_CAP", 10000))
+LIST_COUNT_CACHE_SECONDS = int(os.environ.get("LIST_COUNT_CACHE_SECONDS", 60))
+
+# Startup (see core.warmup and gunicorn.conf.py)
+
+# Heavy packages only imported inside the functions that use them.
+DEFERRED_IMPORTS = ["PIL", "numpy", "scipy"]
+# Imported by the preloading gunicorn master so workers share them.
+WARM_UP_IMPORTS = ["PIL.Image", "core.related"]
+
+# Admin request profiling (X-Profile header, see core.middleware)
+
+REQUEST_PROFILE_DIR = os.environ.get("REQUEST_PROFILE_DIR", BASE_DIR / "profiles")
+REQUEST_PROFILE_TOP_FUNCTIONS = int(os.environ.get("REQUEST_PROFILE_TOP_FUNCTIONS", 30))
+
+# Slow query log and SQL shape statistics (see core.querylog)
+
+# Fraction of requests whose queries feed the per-shape statistics (0
+# disables them). Slow queries are logged from every request.
+SLOW_QUERY_SAMPLE_RATE = float(os.environ.get("SLOW_QUERY_SAMPLE_RATE", 0.05))
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get("SLOW_QUERY_THRESHOLD_MS", 200))
+SLOW_QUERY_MAX_SHAPES = int(os.environ.get("SLOW_QUERY_MAX_SHAPES", 1000))
+
+# Photo delivery formats (see core.image_variants)
+
+# Preferred first; formats the installed Pillow cannot write are skipped.
+PHOTO_IMAGE_FORMATS = os.environ.get("PHOTO_IMAGE_FORMATS", "avif,webp").split(",")
+PHOTO_WEBP_QUALITY = int(os.environ.get("PHOTO_WEBP_QUALITY", 80))
+PHOTO_AVIF_QUALITY = int(os.environ.get("PHOTO_AVIF_QUALITY", 60))
+PHOTO_IMAGE_MAX_AGE = int(os.environ.get("PHOTO_IMAGE_MAX_AGE", 3600))
+
+# Near-duplicate photos (Hamming distance between 64-bit perceptual hashes)
+
+PHASH_DUPLICATE_DISTANCE = int(os.environ.get("PHASH_DUPLICATE_DISTANCE", 6))
+# Above 11 the band lookup would exceed SQLite's 999 query parameters.
+PHASH_MAX_DISTANCE = int(os.environ.get("PHASH_MAX_DISTANCE", 10))
+
+# Incremental sync (/sync/, see core.sync)
+
+SYNC_PAGE_SIZE = int(os.environ.get("SYNC_PAGE_SIZE", 500))
+SYNC_MAX_PAGE_SIZE = int(os.environ.get("SYNC_MAX_PAGE_SIZE", 1000))
+# Changes younger than this are held back until concurrent writes commit.
+SYNC_SETTLE_SECONDS = float(os.environ.get("SYNC_SETTLE_SECONDS", 2))
+
+# Server-sent change events (/events/ through ideal.asgi, see core.events)
+
+# Events a slow client may have pending before it is disconnected.
+EVENTS_QUEUE_SIZE = int(os.environ.get("EVENTS_QUEUE_SIZE", 100))
+EVENTS_BATCH_SIZE = int(os.environ.get("EVENTS_BATCH_SIZE", 500))
+# A client further behind than this is told to catch up with /sync/.
+EVENTS_REPLAY_LIMIT = int(os.environ.get("EVENTS_REPLAY_LIMIT", 1000))
+EVENTS_HEARTBEAT_SECONDS = float(os.environ.get("EVENTS_HEARTBEAT_SECONDS", 15))
+EVENTS_RETRY_SECONDS = float(os.environ.get("EVENTS_RETRY_SECONDS", 3))
+# How other processes' writes are noticed: "" (polling only), "socket", "postgres"
+EVENTS_BRIDGE = os.environ.get("EVENTS_BRIDGE", "")
+EVENTS_POLL_SECONDS = float(os.environ.get("EVENTS_POLL_SECONDS", 5))
+EVENTS_SOCKET_DIR = os.environ.get(
+    "EVENTS_SOCKET_DIR", os.path.join(tempfile.gettempdir(), "ideal-events")
+)
+
+# NDJSON catalog export/import (see core.catalog)
+
+# Rows per export query and per import transaction.
+CATALOG_BATCH_SIZE = int(os.environ.get("CATALOG_BATCH_SIZE", 1000))
+
+# Pre-aggregated catalog statistics (/stats/, see core.stats)
+
+STATS_DAYS = int(os.environ.get("STATS_DAYS", 30))
+STATS_MAX_DAYS = int(os.environ.get("STATS_MAX_DAYS", 366))
+STATS_TOP_TAGS = int(os.environ.get("STATS_TOP_TAGS", 20))
+STATS_MAX_TAGS = int(os.environ.get("STATS_MAX_TAGS", 200))
+
+# Coalescing of identical concurrent GETs (see core.coalesce)
+
+COALESCE_REQUESTS = os.environ.get("COALESCE_REQUESTS", "1") == "1"
+# Longest a request waits for an identical one before running itself.
+COALESCE_TIMEOUT = float(os.environ.get("COALESCE_TIMEOUT", 5))
+# "" coalesces within a worker; "file" also across workers on this host.
+COALESCE_BACKEND = os.environ.get("COALESCE_BACKEND", "")
+COALESCE_LOCK_DIR = os.environ.get(
+    "COALESCE_LOCK_DIR", os.path.join(tempfile.gettempdir(), "ideal-coalesce")
+)
+COALESCE_LOCK_SLOTS = int(os.environ.get("COALESCE_LOCK_SLOTS", 256))
+
+# Idempotency-Key support for retried POSTs (see core.idempotency)
+
+IDEMPOTENCY_URL_NAMES = ["photo-list-create", "video-list-create", "register"]
+# How long a successful response is replayed.
+IDEMPOTENCY_TTL = int(os.environ.get("IDEMPOTENCY_TTL", 24 * 60 * 60))
+# Longest a duplicate waits for the first request to finish.
+IDEMPOTENCY_LOCK_TIMEOUT = float(os.environ.get("IDEMPOTENCY_LOCK_TIMEOUT", 10))
+# After this a request still in progress is presumed dead and its key freed.
+IDEMPOTENCY_PENDING_SECONDS = int(os.environ.get("IDEMPOTENCY_PENDING_SECONDS", 300))
+IDEMPOTENCY_PRUNE_INTERVAL = int(os.environ.get("IDEMPOTENCY_PRUNE_INTERVAL", 300))
+IDEMPOTENCY_PRUNE_BATCH_SIZE = int(os.environ.get("IDEMPOTENCY_PRUNE_BATCH_SIZE", 1000))
+IDEMPOTENCY_MAX_KEY_LENGTH = 255
+
+# Denormalized tag snapshots on photos and videos (see core.tag_snapshots)
+
+# Render tags from the snapshot column instead of prefetching them.
+TAG_SNAPSHOTS = os.environ.get("TAG_SNAPSHOTS", "1") == "1"
+TAG_SNAPSHOT_BATCH_SIZE = int(os.environ.get("TAG_SNAPSHOT_BATCH_SIZE", 1000))
+
+# Admin user search (/user-profiles/, see core.user_search)
+
+# Shortest ``q`` substring; shorter ones cannot use the trigram indexes.
+USER_SEARCH_MIN_SUBSTRING = int(os.environ.get("USER_SEARCH_MIN_SUBSTRING", 3))
+
+# Bounded validation of image uploads (see core.image_validation)
+
+IMAGE_UPLOAD_MAX_BYTES = int(os.environ.get("IMAGE_UPLOAD_MAX_BYTES", 25 * 1024 * 1024))
+IMAGE_UPLOAD_MAX_PIXELS = int(os.environ.get("IMAGE_UPLOAD_MAX_PIXELS", 50_000_000))
+# Fully decode uploads in a worker process, after the header checks pass.
+IMAGE_UPLOAD_FULL_DECODE = os.environ.get("IMAGE_UPLOAD_FULL_DECODE", "1") == "1"
+IMAGE_DECODE_TIMEOUT = float(os.environ.get("IMAGE_DECODE_TIMEOUT", 5))
+IMAGE_DECODE_WORKERS = int(os.environ.get("IMAGE_DECODE_WORKERS", 2))
+# Address space limit of each decode worker (0: unlimited).
+IMAGE_DECODE_MEMORY_MB = int(os.environ.get("IMAGE_DECODE_MEMORY_MB", 1024))
+IMAGE_DECODE_MAX_TASKS = int(os.environ.get("IMAGE_DECODE_MAX_TASKS", 100))
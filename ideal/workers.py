@@ -0,0 +1,24 @@
+"""
+Gunicorn worker classes for the ideal project.
+
+Used by gunicorn.conf.py; gunicorn only needs to be installed where the
+application is served.
+"""
+
+from concurrent import futures
+
+from gunicorn.workers.gthread import ThreadWorker
+
+
+class ConnectedThreadWorker(ThreadWorker):
+    """
+    Threaded worker whose request threads open their database connections on start.
+
+    Django connections belong to the thread that opened them, so those of
+    the worker's main thread would never serve a request.
+    """
+
+    def get_thread_pool(self):
+        from core.warmup import connect
+
+        return futures.ThreadPoolExecutor(max_workers=self.cfg.threads, initializer=connect)